@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Сравнение скорости сохранения большого количества сегментов: через срезы pydub.AudioSegment и VAD.write_wav() (как в версиях до 1.4)
+и напрямую из исходного буфера через VAD.write_segments() и VAD.write_concatenated_segments().
+
+Использование: python3 benchmarks/bench_export.py <количество сегментов, по умолчанию 2000>
+'''
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+from pydub import AudioSegment
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from webrtcvad_wrapper import VAD
+
+
+SAMPLE_RATE = 16000
+SEGMENT_DURATION_S = 0.5
+
+
+def generate_audio_and_segments(number_of_segments):
+    random_state = np.random.RandomState(0)
+    audio_data = (random_state.randn(int(number_of_segments * 2 * SEGMENT_DURATION_S * SAMPLE_RATE)) * 3000).astype(np.int16)
+    audio = AudioSegment(data=audio_data.tobytes(), sample_width=2, frame_rate=SAMPLE_RATE, channels=1)
+    filtered_segments = [[round(i * SEGMENT_DURATION_S, 2), round((i + 1) * SEGMENT_DURATION_S, 2), i % 2 == 0] for i in range(number_of_segments * 2)]
+    return audio, filtered_segments
+
+
+def export_pydub(vad, audio, filtered_segments, output_dir):
+    segments_with_voice = [[filtered_segment[0], filtered_segment[1]] for filtered_segment in filtered_segments if filtered_segment[-1]]
+    for i, segment in enumerate(segments_with_voice):
+        vad.write_wav(os.path.join(output_dir, 'segment_%i.wav' % (i + 1)), audio[segment[0]*1000:segment[1]*1000])
+
+
+def export_pydub_concatenated(vad, audio, filtered_segments, output_dir):
+    segments_with_voice = [[filtered_segment[0], filtered_segment[1]] for filtered_segment in filtered_segments if filtered_segment[-1]]
+    audio_without_silence = audio[segments_with_voice[0][0]*1000:segments_with_voice[0][1]*1000]
+    for segment in segments_with_voice[1:]:
+        audio_without_silence += audio[segment[0]*1000:segment[1]*1000]
+    vad.write_wav(os.path.join(output_dir, 'without_silence.wav'), audio_without_silence)
+
+
+def main():
+    number_of_segments = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    vad = VAD()
+    audio, filtered_segments = generate_audio_and_segments(number_of_segments)
+    print('Сегментов с речью: %i, длина аудиозаписи: %.0f сек\n' % (number_of_segments, len(audio) / 1000))
+
+    methods = [
+        ('pydub, по файлу на сегмент', lambda output_dir: export_pydub(vad, audio, filtered_segments, output_dir)),
+        ('write_segments()', lambda output_dir: vad.write_segments(os.path.join(output_dir, 'segment'), audio, filtered_segments)),
+        ('pydub, одним файлом', lambda output_dir: export_pydub_concatenated(vad, audio, filtered_segments, output_dir)),
+        ('write_concatenated_segments()', lambda output_dir: vad.write_concatenated_segments(os.path.join(output_dir, 'without_silence.wav'),
+                                                                                               audio, filtered_segments))
+    ]
+    for name, function in methods:
+        output_dir = tempfile.mkdtemp()
+        try:
+            start_time = time.perf_counter()
+            function(output_dir)
+            print('%-32s %8.2f сек' % (name, time.perf_counter() - start_time))
+        finally:
+            shutil.rmtree(output_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Сравнение времени холодного запуска: импорт webrtcvad_wrapper и первый вызов VAD.filter() для байтовой строки в новом процессе Python,
+с отложенной загрузкой pydub и кэша результатов (sqlite3) и с их загрузкой при импорте (как в версиях до 1.4). Каждый вариант
+запускается в отдельном процессе несколько раз, выводится медиана.
+
+Использование: python3 benchmarks/bench_import.py <количество запусков, по умолчанию 15>
+'''
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HEAVY_MODULES = ['pydub', 'sqlite3', 'hashlib', 'concurrent.futures', 'librosa', 'scipy', 'numba']
+
+# Загрузка при импорте, как в версиях до 1.4: pydub и модуль кэша импортируются вместе с webrtcvad_wrapper
+EAGER_IMPORTS = 'import pydub; import webrtcvad_wrapper.cache; '
+
+MEASURE_CODE = '''
+import sys, time, json
+sys.path.insert(0, %r)
+start_time = time.perf_counter()
+%simport webrtcvad_wrapper
+import_time = time.perf_counter() - start_time
+webrtcvad_wrapper.VAD(3).filter(b'\\0' * 32000, 10, 16000)
+first_filter_time = time.perf_counter() - start_time
+print(json.dumps({'import': import_time, 'first_filter': first_filter_time, 'loaded': [name for name in %r if name in sys.modules]}))
+'''
+
+
+def measure(eager_imports, number_of_runs):
+    ''' Запустить number_of_runs новых процессов и вернуть словарь с медианами времени импорта и первого вызова filter() и списком
+    загруженных тяжёлых модулей. '''
+
+    code = MEASURE_CODE % (PACKAGE_DIR, eager_imports, HEAVY_MODULES)
+    results = []
+    for _ in range(number_of_runs):
+        output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+        results.append(json.loads(output.decode('utf-8')))
+    return {'import': statistics.median(result['import'] for result in results),
+            'first_filter': statistics.median(result['first_filter'] for result in results),
+            'loaded': results[-1]['loaded']}
+
+
+def main():
+    number_of_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+
+    # Один пробный запуск, что бы файлы модулей и .pyc были в кэше файловой системы
+    measure('', 1)
+    measure(EAGER_IMPORTS, 1)
+
+    print('Запусков: %i (медиана)\n' % number_of_runs)
+    print('%-30s %12s %20s   %s' % ('', 'импорт, мс', 'импорт + filter(), мс', 'загруженные модули'))
+    for name, eager_imports in [('загрузка при импорте', EAGER_IMPORTS), ('отложенная загрузка', '')]:
+        result = measure(eager_imports, number_of_runs)
+        print('%-30s %12.1f %20.1f   %s' % (name, result['import'] * 1000, result['first_filter'] * 1000, ', '.join(result['loaded']) or '-'))
+
+
+if __name__ == '__main__':
+    main()
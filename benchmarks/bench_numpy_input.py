@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Сравнение скорости и используемой памяти VAD.filter() для аудиоданных в виде массива NumPy: передача массива напрямую и через
+байтовую строку (tobytes(), для float32 - после приведения к int16 через astype(), как было нужно до поддержки массивов NumPy).
+Пиковый объём выделенной памяти не включает сам исходный массив.
+
+Использование: python3 benchmarks/bench_numpy_input.py <длина аудиозаписи в секундах, по умолчанию 1800>
+'''
+
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from webrtcvad_wrapper import VAD
+
+
+SAMPLE_RATE = 16000
+
+
+def generate_audio(duration_s):
+    random_state = np.random.RandomState(0)
+    time_s = np.arange(int(SAMPLE_RATE * duration_s)) / SAMPLE_RATE
+    # Речеподобные участки по 1 секунде, чередующиеся с тишиной
+    envelope = (np.floor(time_s) % 2 == 0) * 6000 + 30
+    audio_data = np.sin(2 * np.pi * 220 * time_s) * envelope + random_state.randn(len(time_s)) * 30
+    return np.clip(audio_data, -32768, 32767).astype(np.int16)
+
+
+def measure(function):
+    ''' Выполнить function() и вернуть кортеж (время выполнения в секундах, пиковый объём выделенной памяти в МБ). Время и память
+    измеряются в разных запусках, так как tracemalloc замедляет выполнение. '''
+
+    start_time = time.perf_counter()
+    function()
+    elapsed_time = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_time, peak_memory / 1024 / 1024
+
+
+def float_to_bytes(audio_data):
+    return np.clip(np.rint(audio_data * 32768), -32768, 32767).astype(np.int16).tobytes()
+
+
+def main():
+    duration_s = float(sys.argv[1]) if len(sys.argv) > 1 else 1800.0
+    audio_int16 = generate_audio(duration_s)
+    audio_float32 = (audio_int16 / 32768).astype(np.float32)
+    print('Длина аудиозаписи: %.0f сек (int16: %.1f МБ, float32: %.1f МБ)\n' % (duration_s, audio_int16.nbytes / 1024 / 1024,
+                                                                              audio_float32.nbytes / 1024 / 1024))
+    print('%-6s %-8s %-10s %10s %10s' % ('режим', 'тип', 'способ', 'время, с', 'память, МБ'))
+
+    for sensitivity_mode in [3, 4]:
+        vad = VAD(sensitivity_mode)
+        results = [
+            ('int16', 'tobytes', measure(lambda: vad.filter(audio_int16.tobytes(), sample_rate=SAMPLE_RATE))),
+            ('int16', 'массив', measure(lambda: vad.filter(audio_int16, sample_rate=SAMPLE_RATE))),
+            ('float32', 'tobytes', measure(lambda: vad.filter(float_to_bytes(audio_float32), sample_rate=SAMPLE_RATE))),
+            ('float32', 'массив', measure(lambda: vad.filter(audio_float32, sample_rate=SAMPLE_RATE)))
+        ]
+        for dtype_name, method, (elapsed_time, peak_memory) in results:
+            print('%-6i %-8s %-10s %10.2f %10.1f' % (sensitivity_mode, dtype_name, method, elapsed_time, peak_memory))
+
+
+if __name__ == '__main__':
+    main()
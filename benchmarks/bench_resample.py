@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Сравнение скорости и используемой памяти при приведении частоты дискретизации к поддерживаемой WebRTC VAD:
+pydub AudioSegment.set_frame_rate() (вся аудиозапись за один раз) и webrtcvad_wrapper.resampler.Resampler (блоками).
+
+Использование: python3 benchmarks/bench_resample.py <длина аудиозаписи в секундах, по умолчанию 600>
+'''
+
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+from pydub import AudioSegment
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from webrtcvad_wrapper.resampler import Resampler, get_polyphase_filter
+
+
+BLOCK_SIZE = 44100
+
+
+def generate_audio(sample_rate, duration_s):
+    random_state = np.random.RandomState(0)
+    time_s = np.arange(int(sample_rate * duration_s)) / sample_rate
+    audio_data = np.sin(2 * np.pi * 220 * time_s) * 6000 + random_state.randn(len(time_s)) * 500
+    return np.clip(audio_data, -32768, 32767).astype(np.int16)
+
+
+def measure(function):
+    ''' Выполнить function() и вернуть кортеж (время выполнения в секундах, пиковый объём выделенной памяти в МБ). Время и память
+    измеряются в разных запусках, так как tracemalloc замедляет выполнение. '''
+
+    start_time = time.perf_counter()
+    function()
+    elapsed_time = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_time, peak_memory / 1024 / 1024
+
+
+def resample_pydub(audio_bytes, source_sample_rate, target_sample_rate):
+    audio = AudioSegment(data=audio_bytes, sample_width=2, frame_rate=source_sample_rate, channels=1)
+    return audio.set_frame_rate(target_sample_rate).raw_data
+
+
+def resample_blocks(audio_bytes, source_sample_rate, target_sample_rate):
+    # Аудиоданные передаются блоками, как при чтении через WavReader.iter_blocks(), результат не накапливается
+    resampler = Resampler(source_sample_rate, target_sample_rate)
+    audio_data = np.frombuffer(audio_bytes, dtype=np.int16)
+    num_output_samples = 0
+    for start in range(0, len(audio_data), BLOCK_SIZE):
+        num_output_samples += len(resampler.process(audio_data[start:start + BLOCK_SIZE]))
+    return num_output_samples + len(resampler.flush())
+
+
+def main():
+    duration_s = float(sys.argv[1]) if len(sys.argv) > 1 else 600.0
+    print('Длина аудиозаписи: %.0f сек\n' % duration_s)
+    print('%-14s %-10s %10s %10s %8s' % ('частоты', 'способ', 'время, с', 'память, МБ', 'RTF'))
+
+    for source_sample_rate, target_sample_rate in [(44100, 32000), (22050, 16000), (11025, 8000)]:
+        audio_bytes = generate_audio(source_sample_rate, duration_s).tobytes()
+        get_polyphase_filter(source_sample_rate, target_sample_rate)
+
+        results = [
+            ('pydub', measure(lambda: resample_pydub(audio_bytes, source_sample_rate, target_sample_rate))),
+            ('polyphase', measure(lambda: resample_blocks(audio_bytes, source_sample_rate, target_sample_rate)))
+        ]
+        for method, (elapsed_time, peak_memory) in results:
+            print('%-14s %-10s %10.2f %10.1f %8.4f' % ('%i->%i' % (source_sample_rate, target_sample_rate), method, elapsed_time, peak_memory,
+                                                      elapsed_time / duration_s))
+
+
+if __name__ == '__main__':
+    main()
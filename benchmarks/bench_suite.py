@@ -0,0 +1,259 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Набор тестов производительности: генерация детерминированных синтетических аудиозаписей (чередование речеподобных участков и тишины)
+заданной длины и частоты дискретизации и измерение времени каждой стадии обработки по отдельности: read_wav(), приведение частоты
+дискретизации, разбиение на фреймы, вызовы WebRTC VAD, сглаживание, вычисление RMS/ZCR (sensitivity_mode=4) и сохранение сегментов.
+
+Для каждой стадии выводятся время, RTF (real-time factor, отношение времени обработки к длине аудиозаписи), количество фреймов в секунду
+и пиковое значение RSS процесса. Результаты сохраняются в JSON и могут сравниваться с ранее сохранёнными (код возврата 1, если какая-либо
+стадия стала медленнее или требует больше памяти, чем допускает --tolerance).
+
+Использование: python3 benchmarks/bench_suite.py <--durations=60,10m,1h> <--rates=8000,16000,44100> <--modes=0,3,4> <--repeat=3>
+                                                 <--output=results.json> <--baseline=baseline.json> <--tolerance=0.25>
+    --durations - длины аудиозаписей в секундах (допускаются суффиксы m и h), по умолчанию 60
+    --rates - частоты дискретизации, по умолчанию 8000,16000,22050,32000,44100,48000
+    --modes - уровни чувствительности, по умолчанию 0,1,2,3,4
+    --repeat - количество повторов каждой стадии (берётся наименьшее время), по умолчанию 1
+    --output - имя .json файла для сохранения результатов
+    --baseline - имя .json файла с ранее сохранёнными результатами для сравнения
+    --tolerance - допустимое относительное ухудшение времени и памяти, по умолчанию 0.25 (25%)
+
+ВНИМАНИЕ! Аудиозапись генерируется в .wav файл блоками, но read_wav() и остальные стадии загружают её в память целиком (10 часов
+с частотой 48кГц - 3.5 ГБ).
+'''
+
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import platform
+import resource
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from webrtcvad_wrapper import VAD
+from webrtcvad_wrapper.cli import parse_args
+from webrtcvad_wrapper.features import frame_rms, frame_zcr
+from webrtcvad_wrapper.resampler import resample
+
+
+FRAME_DURATION_MS = 10
+PADDING_DURATION_MS = 50
+THRESHOLD_VOICE_FRAMES = 0.9
+# Разница во времени меньше этого значения не считается ухудшением (погрешность измерения очень быстрых стадий)
+MIN_TIME_DIFFERENCE_S = 0.002
+
+
+def parse_duration(duration):
+    ''' Перевести длину аудиозаписи вида '90', '10m' или '2h' в секунды. '''
+
+    multipliers = {'s': 1, 'm': 60, 'h': 3600}
+    if duration[-1] in multipliers:
+        return float(duration[:-1]) * multipliers[duration[-1]]
+    return float(duration)
+
+
+def generate_wav(f_name_wav, duration_s, sample_rate, seed=0):
+    ''' Сгенерировать детерминированную синтетическую аудиозапись и сохранить её в .wav (PCM 16 бит, моно) блоками, не создавая её в
+    памяти целиком. Речеподобные участки (0.3-3 сек): сумма гармоник основного тона 100-250 Гц с вибрато и слоговой амплитудной
+    модуляцией 3-6 Гц и шум. Участки тишины (0.2-2 сек): слабый шум. '''
+
+    random_state = np.random.RandomState(seed)
+    num_samples = int(duration_s * sample_rate)
+    is_speech = False
+    with wave.open(f_name_wav, 'wb') as f_wav:
+        f_wav.setnchannels(1)
+        f_wav.setsampwidth(2)
+        f_wav.setframerate(sample_rate)
+        written_samples = 0
+        while written_samples < num_samples:
+            is_speech = not is_speech
+            part_duration_s = random_state.uniform(0.3, 3.0) if is_speech else random_state.uniform(0.2, 2.0)
+            part_num_samples = min(int(part_duration_s * sample_rate), num_samples - written_samples)
+            time_s = np.arange(part_num_samples) / sample_rate
+            if is_speech:
+                f0 = random_state.uniform(100, 250) * (1 + 0.05 * np.sin(2 * np.pi * 5 * time_s))
+                phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+                part = sum(np.sin(phase * harmonic) / harmonic for harmonic in range(1, 8) if f0.max() * harmonic < sample_rate / 2)
+                envelope = 0.5 + 0.5 * np.abs(np.sin(np.pi * random_state.uniform(3, 6) * time_s))
+                part = part * envelope * random_state.uniform(3000, 9000) + random_state.randn(part_num_samples) * 300
+            else:
+                part = random_state.randn(part_num_samples) * 30
+            f_wav.writeframes(np.clip(part, -32768, 32767).astype('<i2').tobytes())
+            written_samples += part_num_samples
+
+
+def reset_peak_rss():
+    ''' Сбросить пиковое значение RSS процесса до текущего (только Linux 4.0 и выше). Возвращает True, если удалось. '''
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as f_clear_refs:
+            f_clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def get_peak_rss_mb():
+    ''' Получить пиковое значение RSS процесса в МБ (после последнего reset_peak_rss(), если он поддерживается). '''
+
+    try:
+        with open('/proc/self/status') as f_status:
+            for line in f_status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss - в КБ на Linux и в байтах на macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 1024 / 1024 if platform.system() == 'Darwin' else max_rss / 1024
+
+
+def measure(function, repeat=1):
+    ''' Выполнить function() repeat раз и вернуть кортеж (результат, наименьшее время выполнения в секундах, пиковое значение RSS в МБ). '''
+
+    reset_peak_rss()
+    best_time = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        elapsed_time = time.perf_counter() - start_time
+        best_time = elapsed_time if best_time is None else min(best_time, elapsed_time)
+    return result, best_time, get_peak_rss_mb()
+
+
+def run_case(vad, f_name_wav, duration_s, sample_rate, modes, repeat, output_dir):
+    ''' Измерить все стадии для одной аудиозаписи. Возвращает список словарей с результатами (по одному на стадию). '''
+
+    results = []
+
+    def add_result(stage, mode, elapsed_time, peak_rss_mb, num_frames=None):
+        results.append({'duration_s': duration_s, 'sample_rate': sample_rate, 'mode': mode, 'stage': stage, 'seconds': elapsed_time,
+                        'rtf': elapsed_time / duration_s, 'frames_per_s': num_frames / elapsed_time if num_frames and elapsed_time > 0 else None,
+                        'peak_rss_mb': peak_rss_mb})
+
+    audio, elapsed_time, peak_rss_mb = measure(lambda: vad.read_wav(f_name_wav), repeat)
+    add_result('read_wav', None, elapsed_time, peak_rss_mb)
+
+    audio_bytes = audio.raw_data
+    vad_sample_rate = sample_rate
+    if sample_rate not in [8000, 16000, 32000, 48000]:
+        vad_sample_rate = vad._VAD__align_sample_rate(sample_rate)
+        audio_data = np.frombuffer(audio_bytes, dtype=np.int16)
+        audio_bytes, elapsed_time, peak_rss_mb = measure(lambda: resample(audio_data, sample_rate, vad_sample_rate).tobytes(), repeat)
+        add_result('resample', None, elapsed_time, peak_rss_mb)
+
+    frames, elapsed_time, peak_rss_mb = measure(lambda: vad._VAD__get_frames(audio_bytes, FRAME_DURATION_MS, vad_sample_rate), repeat)
+    add_result('get_frames', None, elapsed_time, peak_rss_mb, len(frames))
+
+    for mode in modes:
+        vad.set_mode(mode)
+        if mode < 4:
+            decisions, elapsed_time, peak_rss_mb = measure(lambda: vad._VAD__classify_frames(frames), repeat)
+            add_result('is_speech', mode, elapsed_time, peak_rss_mb, len(frames))
+
+            filtered_segments, elapsed_time, peak_rss_mb = measure(lambda: vad.smooth(decisions, FRAME_DURATION_MS, PADDING_DURATION_MS,
+                                                                                      THRESHOLD_VOICE_FRAMES), repeat)
+            add_result('smooth', mode, elapsed_time, peak_rss_mb, len(frames))
+        else:
+            audio_data = np.frombuffer(audio.raw_data, dtype=np.int16)
+            frame_len = int(FRAME_DURATION_MS * sample_rate / 1000)
+            frame_shift = int(FRAME_DURATION_MS / 2 * sample_rate / 1000)
+            features, elapsed_time, peak_rss_mb = measure(lambda: (frame_rms(audio_data, frame_len, frame_shift),
+                                                                   frame_zcr(audio_data, frame_len, frame_shift)), repeat)
+            add_result('rough_features', mode, elapsed_time, peak_rss_mb, len(features[0]))
+
+        filtered_segments, elapsed_time, peak_rss_mb = measure(lambda: vad.filter(audio, FRAME_DURATION_MS, None, PADDING_DURATION_MS,
+                                                                                  THRESHOLD_VOICE_FRAMES), repeat)
+        add_result('filter', mode, elapsed_time, peak_rss_mb, len(frames))
+
+        f_name_template = os.path.join(output_dir, 'segment')
+        _, elapsed_time, peak_rss_mb = measure(lambda: vad.write_segments(f_name_template, audio, filtered_segments), repeat)
+        add_result('write_segments', mode, elapsed_time, peak_rss_mb)
+        for f_name in os.listdir(output_dir):
+            os.remove(os.path.join(output_dir, f_name))
+
+        f_name_output = os.path.join(output_dir, 'without_silence.wav')
+        _, elapsed_time, peak_rss_mb = measure(lambda: vad.write_concatenated_segments(f_name_output, audio, filtered_segments), repeat)
+        add_result('write_concatenated_segments', mode, elapsed_time, peak_rss_mb)
+        os.remove(f_name_output)
+    return results
+
+
+def get_result_key(result):
+    return '%g|%i|%s|%s' % (result['duration_s'], result['sample_rate'], result['mode'], result['stage'])
+
+
+def compare_with_baseline(results, baseline_results, tolerance):
+    ''' Сравнить результаты с ранее сохранёнными и вывести стадии, время или память которых ухудшились больше чем на tolerance.
+    Возвращает количество таких стадий. '''
+
+    baseline_results = {get_result_key(result): result for result in baseline_results}
+    number_of_regressions = 0
+    print('\nСравнение с базовыми результатами (допустимое ухудшение %.0f%%):' % (tolerance * 100))
+    for result in results:
+        baseline_result = baseline_results.get(get_result_key(result))
+        if baseline_result is None:
+            continue
+        time_ratio = result['seconds'] / max(baseline_result['seconds'], 1e-9)
+        rss_ratio = result['peak_rss_mb'] / max(baseline_result['peak_rss_mb'], 1e-9)
+        time_difference = result['seconds'] - baseline_result['seconds']
+        if (time_ratio > 1 + tolerance and time_difference > MIN_TIME_DIFFERENCE_S) or rss_ratio > 1 + tolerance:
+            number_of_regressions += 1
+            print('\t[W] %-60s время x%.2f, память x%.2f' % (get_result_key(result), time_ratio, rss_ratio))
+    if number_of_regressions == 0:
+        print('\tухудшений нет')
+    return number_of_regressions
+
+
+def main():
+    options, _ = parse_args(sys.argv[1:])
+    durations = [parse_duration(duration) for duration in options.get('durations', '60').split(',')]
+    sample_rates = [int(sample_rate) for sample_rate in options.get('rates', '8000,16000,22050,32000,44100,48000').split(',')]
+    modes = [int(mode) for mode in options.get('modes', '0,1,2,3,4').split(',')]
+    repeat = int(options.get('repeat', 1))
+    tolerance = float(options.get('tolerance', 0.25))
+
+    vad = VAD()
+    results = []
+    work_dir = tempfile.mkdtemp()
+    output_dir = os.path.join(work_dir, 'segments')
+    os.makedirs(output_dir)
+    print('%-8s %-6s %-4s %-28s %9s %9s %13s %9s' % ('длина', 'Гц', 'mode', 'стадия', 'сек', 'RTF', 'фреймов/сек', 'RSS, МБ'))
+    try:
+        for duration_s in durations:
+            for sample_rate in sample_rates:
+                f_name_wav = os.path.join(work_dir, 'synthetic_%g_%i.wav' % (duration_s, sample_rate))
+                generate_wav(f_name_wav, duration_s, sample_rate)
+                case_results = run_case(vad, f_name_wav, duration_s, sample_rate, modes, repeat, output_dir)
+                os.remove(f_name_wav)
+                for result in case_results:
+                    print('%-8g %-6i %-4s %-28s %9.3f %9.5f %13s %9.1f' % (result['duration_s'], result['sample_rate'],
+                          '-' if result['mode'] is None else result['mode'], result['stage'], result['seconds'], result['rtf'],
+                          '-' if result['frames_per_s'] is None else '%.0f' % result['frames_per_s'], result['peak_rss_mb']))
+                results += case_results
+    finally:
+        shutil.rmtree(work_dir)
+
+    if options.get('output'):
+        metadata = {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                    'peak_rss_per_stage': reset_peak_rss(), 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+        with open(options['output'], 'w') as f_output:
+            json.dump({'metadata': metadata, 'results': results}, f_output, indent=2)
+        print('\nРезультаты сохранены в %s' % options['output'])
+
+    if options.get('baseline'):
+        with open(options['baseline']) as f_baseline:
+            baseline_results = json.load(f_baseline)['results']
+        if compare_with_baseline(results, baseline_results, tolerance) > 0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 #       OS : GNU/Linux Ubuntu 16.04 or 18.04
-# LANGUAGE : Python 3.5.2 or later
+# LANGUAGE : Python 3.7 or later
 #   AUTHOR : Klim V. O.
 #     DATE : 14.10.2019
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -21,7 +21,7 @@ with open(os.path.join(os.path.abspath(os.path.dirname(__file__)), 'README.md'),
 install_requires = [
     'pydub>=0.23.1',
     'webrtcvad==2.0.10',
-    'librosa>=0.7.1'
+    'numpy>=1.13.3'
 ]
 
 
@@ -37,13 +37,16 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: Apache Software License',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Topic :: Software Development :: Libraries',
     ],
     version=__version__,
     install_requires=install_requires,
+    python_requires='>=3.7',
     description='WebRTCVAD-Wrapper is a simple wrapper to simplify working with WebRTCVAD',
     long_description=long_description,
     long_description_content_type='text/markdown',
@@ -6,10 +6,22 @@
 Тесты для WebRTCVAD_Wrapper.
 '''
 
+import io
 import os
+import json
+import asyncio
 import platform
 import signal
-from webrtcvad_wrapper import VAD
+import tempfile
+import threading
+import numpy as np
+from pydub import AudioSegment
+from webrtcvad_wrapper import VAD, StreamingVAD, Resampler
+from webrtcvad_wrapper.resampler import resample
+from webrtcvad_wrapper.async_vad import AsyncVAD
+from webrtcvad_wrapper.server import start_server, request_segments
+from webrtcvad_wrapper.manifest import process_manifest
+from webrtcvad_wrapper.pipe import filter_stream
 
 
 def main():
@@ -49,6 +61,23 @@ def main():
     else:
         result_tests.append(False)
 
+    # Тест сохранения сегментов напрямую из исходного буфера: результат должен совпадать с сохранением через pydub
+    f_name_segment = 'segment_without_silence_direct.wav'
+    vad.write_concatenated_segments(f_name_segment, audio, filtered_segments)
+    with open(f_name_segment, 'rb') as f_direct, open('segment_without_silence.wav', 'rb') as f_pydub:
+        if f_direct.read() == f_pydub.read():
+            result_tests.append(True)
+            print('OK')
+        else:
+            result_tests.append(False)
+
+    # Тест дополнительного агрессивного режима на аудиозаписи без звука: вся аудиозапись должна быть одним сегментом с тишиной
+    if vad.filter(b'\x00' * 32000, sample_rate=16000) == [[0.00, 1.00, False]]:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
     # Тест корректности работы WebRTC VAD
     f_name_audio = 'test_audio/test_vad_2.wav'
     vad.set_mode(3)
@@ -65,11 +94,315 @@ def main():
         print('OK')
     else:
         result_tests.append(False)
-    
+
+    # Тест раздельных стадий: classify_frames() + smooth() должны совпадать с filter()
+    decisions = vad.classify_frames(audio)
+    if vad.smooth(decisions) == filtered_segments:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест таблицы сегментов: границы в семплах должны совпадать с filter(), а сегменты - покрывать всю аудиозапись
+    segment_table = vad.filter(audio, as_table=True)
+    if segment_table.to_list() == filtered_segments and sum(len(segment) for segment in segment_table.iter_slices(audio)) == len(audio.raw_data):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест чтения и фильтрации .wav аудиозаписи блоками без загрузки в память
+    if vad.filter_wav(f_name_audio) == filtered_segments:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест потокового режима: результат должен совпадать с VAD.filter()
+    stream_vad = StreamingVAD(3, sample_rate=audio.frame_rate)
+    streamed_segments = []
+    for i in range(0, len(audio.raw_data), 1234):
+        streamed_segments += stream_vad.push(audio.raw_data[i:i+1234])
+    streamed_segments += stream_vad.flush()
+    if streamed_segments == filtered_segments:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест асинхронного интерфейса: результаты одновременных вызовов должны совпадать с VAD.filter()
+    async_vad = AsyncVAD(3, max_workers=2)
+    async_results = asyncio.run(filter_async(async_vad, [audio] * 4))
+    async_vad.close()
+    if all(async_result == filtered_segments for async_result in async_results):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест асинхронного интерфейса с пулом процессов: настройки объекта VAD (энергетический порог и resample_method) используются в процессах
+    audio_44k = vad.read_wav('test_audio/test_vad_1.wav')
+    async_vad = AsyncVAD(3, max_workers=1, executor_type='process')
+    async_vad.vad.set_energy_gate(-30)
+    async_vad.vad.resample_method = 'polyphase'
+    async_results = asyncio.run(filter_async(async_vad, [audio_44k]))
+    async_vad.close()
+    if async_results[0] == async_vad.vad.filter(audio_44k) != VAD(3).filter(audio_44k):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест сервера потокового VAD: сегменты, полученные через сокет, должны совпадать с VAD.filter()
+    loop = asyncio.new_event_loop()
+    server, server_async_vad = loop.run_until_complete(start_server(port=0, max_workers=2))
+    server_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    server_thread.start()
+    port = server.sockets[0].getsockname()[1]
+    if request_segments(audio.raw_data, audio.frame_rate, port=port, chunk_size=1234) == filtered_segments:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+    loop.call_soon_threadsafe(loop.stop)
+    server_thread.join()
+    server.close()
+    server_async_vad.close()
+    loop.close()
+
+    # Тест потокового изменения частоты дискретизации: результат не должен зависеть от разбиения на блоки
+    audio = vad.read_wav('test_audio/test_vad_1.wav')
+    audio_data = audio.raw_data
+    resampler = Resampler(audio.frame_rate, 32000)
+    resampled_blocks = [resampler.process(audio_data[i:i+1234]) for i in range(0, len(audio_data), 1234)] + [resampler.flush()]
+    if b''.join(block.tobytes() for block in resampled_blocks) == resample(audio_data, audio.frame_rate, 32000).tobytes():
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест способа приведения частоты дискретизации по умолчанию: результат для 44.1кГц совпадает с pydub (как в версиях до 1.4)
+    expected_segments = [
+        [[0.0, 1.07, True], [1.07, 1.3, False], [1.3, 4.6, True]],
+        [[0.0, 1.07, True], [1.07, 1.31, False], [1.31, 2.51, True], [2.51, 2.61, False], [2.61, 4.6, True]],
+        [[0.0, 1.02, True], [1.02, 1.32, False], [1.32, 2.46, True], [2.46, 2.73, False], [2.73, 4.6, True]],
+        [[0.0, 0.98, True], [0.98, 1.34, False], [1.34, 2.41, True], [2.41, 2.73, False], [2.73, 4.6, True]]
+    ]
+    if VAD.resample_method == 'pydub' and all(VAD(sensitivity_mode).filter(audio) == VAD(sensitivity_mode).filter_wav('test_audio/test_vad_1.wav') ==
+                                              expected_segments[sensitivity_mode] for sensitivity_mode in range(4)):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест параллельной фильтрации одной аудиозаписи: при exact=True результат совпадает с filter() при любом workers, при exact=False
+    # сегменты покрывают всю аудиозапись
+    audio = vad.read_wav('test_audio/test_vad_2.wav')
+    segment_table = vad.filter_parallel('test_audio/test_vad_2.wav', workers=3, as_table=True, exact=False)
+    if all(VAD(sensitivity_mode).filter_parallel('test_audio/test_vad_2.wav', workers=3) == VAD(sensitivity_mode).filter_parallel(audio, workers=3) ==
+           VAD(sensitivity_mode).filter(audio) for sensitivity_mode in range(4)) and segment_table.starts[0] == 0 and \
+       segment_table.ends[-1] == len(audio.raw_data) // 2 and (segment_table.starts[1:] == segment_table.ends[:-1]).all():
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест статистики filter(): сегменты совпадают с обычным вызовом, все фреймы учтены
+    filtered_segments, stats = vad.filter(audio, with_stats=True)
+    if filtered_segments == vad.filter(audio) and stats.num_frames == -(-len(audio.raw_data) // 320) and 'is_speech' in stats.durations:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест кэша результатов: повторные вызовы возвращают тот же результат из кэша
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cached_vad = VAD(3)
+        cached_vad.set_cache(os.path.join(cache_dir, 'cache.sqlite'))
+        results = [cached_vad.filter_wav('test_audio/test_vad_2.wav') for _ in range(2)] + [cached_vad.filter(audio) for _ in range(2)]
+        number_of_cached_results = len(cached_vad.cache)
+        cached_vad.cache.close()
+    if all(result == vad.filter(audio) for result in results) and number_of_cached_results == 2:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест ограничения размера кэша: вместе с вытесненными результатами удаляются хэши файлов, на которые они ссылались
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cached_vad = VAD(3)
+        cached_vad.set_cache(os.path.join(cache_dir, 'cache.sqlite'), max_size_mb=0.0002)
+        audio_bytes = audio.raw_data[:16000]
+        for i in range(30):
+            f_name_wav = os.path.join(cache_dir, '%i.wav' % i)
+            vad.write_wav(f_name_wav, audio_bytes[i * 2:] + audio_bytes[:i * 2], audio.frame_rate)
+            cached_vad.filter_wav(f_name_wav)
+        number_of_cached_results, number_of_cached_files = len(cached_vad.cache), cached_vad.cache.number_of_files
+        cached_vad.cache.close()
+    if number_of_cached_results < 30 and number_of_cached_files <= number_of_cached_results:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест перебора параметров: результат для каждой комбинации совпадает с filter()
+    sweep_results = vad.sweep(audio, [1, 3, 4], padding_durations_ms=[30, 150], thresholds_voice_frames=[0.5, 0.9], thresholds_rms=[0.1, 0.2])
+    if all(result['filtered_segments'] == VAD(result['sensitivity_mode']).filter(audio, padding_duration_ms=result['padding_duration_ms'] or 50,
+           threshold_voice_frames=result['threshold_voice_frames'] or 0.9, threshold_rms=result['threshold_rms'] or 0.1) for result in sweep_results):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест энергетического порога: тихие фреймы пропускаются, решения для тестовой аудиозаписи совпадают с решениями без порога
+    gated_vad = VAD(3)
+    gated_vad.set_energy_gate(-60)
+    filtered_segments, stats = gated_vad.filter(audio + AudioSegment.silent(1000, audio.frame_rate), with_stats=True)
+    if (gated_vad.classify_frames(audio) == vad.classify_frames(audio)).all() and stats.num_skipped_frames > 0 and not filtered_segments[-1][2]:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест пакетной обработки с энергетическим порогом и другим методом передискретизации: настройки передаются в процессы filter_many()
+    gated_vad.set_energy_gate(-30)
+    gated_vad.resample_method = 'polyphase'
+    if [result[1] for result in gated_vad.filter_many(['test_audio/test_vad_1.wav'], workers=1)] == \
+            [gated_vad.filter_wav('test_audio/test_vad_1.wav')] != [VAD(3).filter_wav('test_audio/test_vad_1.wav')]:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест обработки по манифесту: результаты совпадают с filter_wav(), повторный запуск пропускает уже обработанные аудиозаписи
+    with tempfile.TemporaryDirectory() as manifest_dir:
+        f_name_manifest = os.path.join(manifest_dir, 'manifest.jsonl')
+        f_name_output = os.path.join(manifest_dir, 'results.jsonl')
+        with open(f_name_manifest, 'w') as f_manifest:
+            f_manifest.write('{"path": "%s"}\n"%s"\n' % (os.path.abspath('test_audio/test_vad_1.wav'), os.path.abspath('test_audio/test_vad_2.wav')))
+        records = list(process_manifest(f_name_manifest, f_name_output, workers=1, shard=(1, 2)))
+        records += list(process_manifest(f_name_manifest, f_name_output, workers=1))
+        records_on_resume = list(process_manifest(f_name_manifest, f_name_output, workers=1))
+    if [record['index'] for record in records] == [1, 0] and not records_on_resume and \
+       all(record['segments'] == vad.filter_wav(record['path']) for record in records):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест повторной обработки по манифесту аудиозаписи, при обработке которой была ошибка
+    with tempfile.TemporaryDirectory() as manifest_dir:
+        f_name_manifest = os.path.join(manifest_dir, 'manifest.jsonl')
+        f_name_output = os.path.join(manifest_dir, 'results.jsonl')
+        with open(f_name_manifest, 'w') as f_manifest:
+            f_manifest.write('"missing.wav"\n')
+        records = list(process_manifest(f_name_manifest, f_name_output, workers=1))
+        with open('test_audio/test_vad_2.wav', 'rb') as f_wav, open(os.path.join(manifest_dir, 'missing.wav'), 'wb') as f_missing:
+            f_missing.write(f_wav.read())
+        records += list(process_manifest(f_name_manifest, f_name_output, workers=1))
+        records_on_resume = list(process_manifest(f_name_manifest, f_name_output, workers=1))
+    if [record['error'] is None for record in records] == [False, True] and not records_on_resume and \
+       records[1]['segments'] == vad.filter_wav('test_audio/test_vad_2.wav'):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест многоканальной фильтрации: результат для каждого канала совпадает с filter() для этого канала
+    stereo_audio = AudioSegment.from_mono_audiosegments(audio, audio.reverse())
+    segment_tables = vad.filter_channels(stereo_audio)
+    if [segment_table.to_list() for segment_table in segment_tables] == [vad.filter(audio, as_table=True).to_list(),
+                                                                        vad.filter(audio.reverse(), as_table=True).to_list()]:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест потоковой обработки (режим pipe): события совпадают с filter(), аудиоданные с речью/звуком - с сегментами filter(as_table=True)
+    vad = VAD(3)
+    audio_bytes = vad.read_wav('test_audio/test_vad_2.wav').raw_data
+    events_stream = io.BytesIO()
+    filter_stream(io.BytesIO(audio_bytes), events_stream, 16000, 3)
+    events = [json.loads(line) for line in events_stream.getvalue().splitlines()]
+    speech_stream = io.BytesIO()
+    filter_stream(io.BytesIO(audio_bytes), speech_stream, 16000, 3, speech_only_pcm=True)
+    speech_bytes = b''.join(vad.filter(audio_bytes, sample_rate=16000, as_table=True).speech().iter_slices(audio_bytes))
+    if [[event['start'], event['end'], event['is_speech']] for event in events[:-1]] == vad.filter(audio_bytes, sample_rate=16000) and \
+       events[-1] == {'event': 'end'} and speech_stream.getvalue() == speech_bytes:
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест потоковой обработки .wav с обрезанным блоком fmt: ошибка ValueError, как и для остальных некорректных заголовков
+    try:
+        filter_stream(io.BytesIO(b'RIFF\x00\x00\x00\x00WAVEfmt \x08\x00\x00\x00\x01\x00\x01\x00\x80\x3e\x00\x00'), io.BytesIO())
+        result_tests.append(False)
+    except ValueError:
+        result_tests.append(True)
+        print('OK')
+
+    # Тест обработки растущей аудиозаписи: при разогреве WebRTC VAD на всех предшествующих аудиоданных результат совпадает с filter_wav()
+    with tempfile.TemporaryDirectory() as follow_dir:
+        f_name_growing = os.path.join(follow_dir, 'growing.wav')
+        with open('test_audio/test_vad_2.wav', 'rb') as f_wav:
+            wav_bytes = f_wav.read()
+        with open(f_name_growing, 'wb') as f_growing:
+            f_growing.write(wav_bytes[:len(wav_bytes) // 2 + 1])
+        filtered_segments = vad.follow_wav(f_name_growing, warmup_duration_ms=60000)
+        with open(f_name_growing, 'ab') as f_growing:
+            f_growing.write(wav_bytes[len(wav_bytes) // 2 + 1:])
+        filtered_segments += vad.follow_wav(f_name_growing, warmup_duration_ms=60000, finish=True)
+        if filtered_segments == vad.filter_wav('test_audio/test_vad_2.wav') and not vad.follow_wav(f_name_growing, warmup_duration_ms=60000):
+            result_tests.append(True)
+            print('OK')
+        else:
+            result_tests.append(False)
+
+    # Тест обработки растущей аудиозаписи, в заголовке которой размер блока data равен 0 или 0xFFFFFFFF (аудиозапись ещё записывается)
+    data_offset = wav_bytes.index(b'data') + 8
+    results_unknown_size = []
+    for data_size in [0, 0xFFFFFFFF]:
+        with tempfile.TemporaryDirectory() as follow_dir:
+            f_name_growing = os.path.join(follow_dir, 'growing.wav')
+            with open(f_name_growing, 'wb') as f_growing:
+                f_growing.write(wav_bytes[:data_offset - 4] + data_size.to_bytes(4, 'little') + wav_bytes[data_offset:len(wav_bytes) // 2 + 1])
+            filtered_segments = vad.follow_wav(f_name_growing, warmup_duration_ms=60000)
+            with open(f_name_growing, 'ab') as f_growing:
+                f_growing.write(wav_bytes[len(wav_bytes) // 2 + 1:])
+            filtered_segments += vad.follow_wav(f_name_growing, warmup_duration_ms=60000, finish=True)
+            results_unknown_size.append(filtered_segments == vad.filter_wav('test_audio/test_vad_2.wav'))
+    if all(results_unknown_size):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест массивов NumPy на входе: результат для int16 и float32 совпадает с результатом для байтовой строки при всех уровнях чувствительности
+    samples = np.frombuffer(audio_bytes, dtype=np.int16)
+    if all(VAD(sensitivity_mode).filter(samples, sample_rate=16000) == VAD(sensitivity_mode).filter(audio_bytes, sample_rate=16000) ==
+           VAD(sensitivity_mode).filter((samples / 32768).astype(np.float32), sample_rate=16000) for sensitivity_mode in range(5)):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
+    # Тест учёта копирования аудиоданных: приведение float32 к int16 учитывается в FilterStats.bytes_copied, int16 не копируется
+    if all(VAD(sensitivity_mode).filter((samples / 32768).astype(np.float32), sample_rate=16000, with_stats=True)[1].bytes_copied ==
+           VAD(sensitivity_mode).filter(samples, sample_rate=16000, with_stats=True)[1].bytes_copied + samples.nbytes for sensitivity_mode in [3, 4]):
+        result_tests.append(True)
+        print('OK')
+    else:
+        result_tests.append(False)
+
     if all(result_tests):
         print('\nALL OK')
 
 
+async def filter_async(async_vad, audios):
+    return await asyncio.gather(*[async_vad.filter(audio) for audio in audios])
+
+
 def on_stop(*args):
     print('\n[i] Остановлено')
     os._exit(0)
@@ -6,9 +6,14 @@
 Предназначен для удаления тишины/извлечения фрагментов с речью (или другими звуками) из wav аудиозаписи.
 Для работы используется py-webrtcvad (https://github.com/wiseman/py-webrtcvad).
 
-Содержит класс VAD. Подробнее в https://github.com/Desklop/WebRTCVAD_Wrapper.
+Содержит классы VAD, StreamingVAD, WavReader, Resampler, SegmentTable и FilterStats. Подробнее в https://github.com/Desklop/WebRTCVAD_Wrapper.
 
-Зависимости: pydub, librosa, webrtcvad.
+Зависимости: pydub, numpy, webrtcvad.
 '''
 
 from .webrtcvad_wrapper import VAD
+from .streaming import StreamingVAD
+from .wav_reader import WavReader
+from .resampler import Resampler
+from .segments import SegmentTable
+from .stats import FilterStats
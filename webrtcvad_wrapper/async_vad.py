@@ -0,0 +1,202 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Асинхронный (asyncio) интерфейс для VAD: фильтрация выполняется в пуле потоков или процессов и не блокирует цикл событий.
+
+Содержит класс AsyncVAD. Требует Python 3.7 и выше (асинхронные генераторы, asyncio.get_running_loop()).
+'''
+
+import os
+import asyncio
+import functools
+import concurrent.futures
+
+from .webrtcvad_wrapper import VAD
+from .streaming import StreamingVAD
+
+
+# Объект VAD в каждом процессе пула (при executor_type='process') и настройки, с которыми он создан
+_worker_vad = None
+_worker_settings = None
+
+
+def _apply_worker_settings(vad_settings):
+    ''' Создать объект VAD процесса пула с настройками vad_settings (подробнее в AsyncVAD.get_vad_settings()), если они отличаются от
+    настроек текущего объекта. '''
+
+    global _worker_vad, _worker_settings
+    if vad_settings == _worker_settings:
+        return
+    _worker_vad = VAD(vad_settings['sensitivity_mode'])
+    _worker_vad.resample_method = vad_settings['resample_method']
+    _worker_vad.set_energy_gate(vad_settings['energy_gate_dbfs'], vad_settings['energy_gate_guard_ms'])
+    if vad_settings['cache_args'] is not None:
+        _worker_vad.set_cache(*vad_settings['cache_args'])
+    _worker_settings = vad_settings
+
+
+def _init_worker(vad_settings):
+    _apply_worker_settings(vad_settings)
+
+
+def _call_worker_vad(vad_settings, method_name, *args, **kwargs):
+    _apply_worker_settings(vad_settings)
+    return getattr(_worker_vad, method_name)(*args, **kwargs)
+
+
+class AsyncVAD:
+    ''' Асинхронная версия VAD для использования из цикла событий asyncio (например, в aiohttp). Разбиение на фреймы, вызовы WebRTC VAD
+    и вычисление RMS/ZCR (sensitivity_mode=4) выполняются в пуле потоков или процессов, цикл событий при этом не блокируется.
+
+    Количество одновременно выполняемых в пуле задач ограничено max_concurrency: остальные вызовы ждут своей очереди (не создавая задач
+    в пуле), что обеспечивает обратное давление при перегрузке пула. Количество ожидающих вызовов доступно в поле pending (например,
+    для отказа в обработке новых запросов при слишком длинной очереди).
+
+    WebRTC VAD не освобождает GIL, поэтому в пуле потоков цикл событий может получать управление с задержкой в несколько переключений
+    потоков (единицы-десятки миллисекунд при большом количестве одновременных задач). Если это критично - используйте пул процессов.
+
+    Настройки объекта VAD в поле vad (уровень чувствительности, resample_method, set_energy_gate(), set_cache()) используются и в пуле
+    процессов: они передаются в каждый процесс при его создании и с каждой задачей (объект VAD процесса пересоздаётся, только если они
+    изменились), поэтому результат не зависит от executor_type и совпадает с vad.filter().
+
+    1. sensitivity_mode - целое число от 0 до 4, подробнее в VAD.set_mode()
+    2. max_workers - количество потоков/процессов в пуле (если None - по количеству ядер процессора)
+    3. max_concurrency - максимальное количество одновременно выполняемых задач (если None - равно max_workers)
+    4. executor_type - 'thread' (пул потоков) или 'process' (пул процессов, для аудиозаписей целиком; потоковая обработка через
+       stream() всегда выполняется в пуле потоков, так как состояние StreamingVAD хранится в текущем процессе)
+
+    Пример использования:
+        async with AsyncVAD(3, max_workers=4) as async_vad:
+            filtered_segments = await async_vad.filter(audio)
+            async for segment in async_vad.stream(chunks, sample_rate=16000):
+                print(segment) '''
+
+    # Части аудиоданных в stream() не длиннее этого значения (в миллисекундах) обрабатываются прямо в цикле событий: их обработка
+    # (несколько вызовов WebRTC VAD, единицы микросекунд на фрейм) быстрее передачи задачи в пул потоков
+    max_inline_chunk_ms = 100
+    def __init__(self, sensitivity_mode=3, max_workers=None, max_concurrency=None, executor_type='thread'):
+        if executor_type not in ['thread', 'process']:
+            raise ValueError("[E] 'executor_type' может быть только 'thread' или 'process'")
+
+        self.sensitivity_mode = sensitivity_mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.max_workers
+        self.executor_type = executor_type
+        self.vad = VAD(sensitivity_mode)
+        self.pending = 0
+
+        self.thread_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        if executor_type == 'process':
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                                                   initargs=(self.get_vad_settings(),))
+        else:
+            self.executor = self.thread_executor
+        # asyncio.Semaphore создаётся при первом вызове, внутри работающего цикла событий
+        self.semaphore = None
+
+
+    def get_vad_settings(self):
+        ''' Получить настройки объекта VAD в поле vad для передачи в процессы пула.
+        1. возвращает словарь с полями sensitivity_mode, resample_method, energy_gate_dbfs, energy_gate_guard_ms и cache_args (кортеж
+           (f_name_db, max_size_mb) для VAD.set_cache() или None) '''
+
+        cache_args = None
+        if self.vad.cache is not None:
+            cache_args = (self.vad.cache.f_name_db, self.vad.cache.max_size / 1024 / 1024)
+        return {'sensitivity_mode': self.vad.sensitivity_mode, 'resample_method': self.vad.resample_method,
+                'energy_gate_dbfs': self.vad.energy_gate_dbfs, 'energy_gate_guard_ms': self.vad.energy_gate_guard_ms, 'cache_args': cache_args}
+
+
+    async def filter(self, audio, frame_duration_ms=10, sample_rate=None, padding_duration_ms=50, threshold_voice_frames=0.9, threshold_rms=0.1,
+                     threshold_zcr=0.5, as_table=False):
+        ''' Асинхронная версия VAD.filter(), аргументы и возвращаемое значение аналогичны. '''
+
+        return await self.__run('filter', audio, frame_duration_ms, sample_rate, padding_duration_ms, threshold_voice_frames, threshold_rms,
+                                threshold_zcr, as_table)
+
+
+    async def filter_wav(self, f_name_wav, frame_duration_ms=10, padding_duration_ms=50, threshold_voice_frames=0.9, threshold_rms=0.1,
+                         threshold_zcr=0.5):
+        ''' Асинхронная версия VAD.filter_wav(), аргументы и возвращаемое значение аналогичны. '''
+
+        return await self.__run('filter_wav', f_name_wav, frame_duration_ms, padding_duration_ms, threshold_voice_frames, threshold_rms,
+                                threshold_zcr)
+
+
+    async def classify_frames(self, audio, frame_duration_ms=10, sample_rate=None):
+        ''' Асинхронная версия VAD.classify_frames(), аргументы и возвращаемое значение аналогичны. '''
+
+        return await self.__run('classify_frames', audio, frame_duration_ms, sample_rate)
+
+
+    async def stream(self, chunks, sample_rate=16000, frame_duration_ms=10, padding_duration_ms=50, threshold_voice_frames=0.9, sensitivity_mode=None):
+        ''' Потоковая фильтрация: асинхронный генератор сегментов по мере их закрытия (через StreamingVAD). Следующая часть аудиоданных
+        берётся из chunks только после обработки предыдущей, поэтому источник не может опередить обработку.
+        1. chunks - асинхронный итерируемый объект (или обычный итерируемый объект) с частями аудиоданных (байтовые строки без заголовков wav)
+        2. остальные аргументы аналогичны StreamingVAD
+        3. sensitivity_mode - уровень чувствительности для этого потока (если None - как у AsyncVAD)
+        4. возвращает асинхронный генератор сегментов [0.00, 1.23, True/False] '''
+
+        if sensitivity_mode is None:
+            sensitivity_mode = self.sensitivity_mode
+        stream_vad = StreamingVAD(sensitivity_mode, sample_rate, frame_duration_ms, padding_duration_ms, threshold_voice_frames)
+        max_inline_chunk_size = int(sample_rate * self.max_inline_chunk_ms / 1000) * stream_vad.sample_width
+        if hasattr(chunks, '__aiter__'):
+            async for chunk in chunks:
+                for segment in await self.__push_chunk(stream_vad, chunk, max_inline_chunk_size):
+                    yield segment
+        else:
+            for chunk in chunks:
+                for segment in await self.__push_chunk(stream_vad, chunk, max_inline_chunk_size):
+                    yield segment
+
+        for segment in stream_vad.flush():
+            yield segment
+
+
+    async def __push_chunk(self, stream_vad, chunk, max_inline_chunk_size):
+        if len(chunk) <= max_inline_chunk_size:
+            return stream_vad.push(chunk)
+        return await self.__run_in_executor(self.thread_executor, stream_vad.push, chunk)
+
+
+    async def __run(self, method_name, *args):
+        if self.executor_type == 'process':
+            return await self.__run_in_executor(self.executor, _call_worker_vad, self.get_vad_settings(), method_name, *args)
+        return await self.__run_in_executor(self.executor, getattr(self.vad, method_name), *args)
+
+
+    async def __run_in_executor(self, executor, function, *args):
+        ''' Выполнить function(*args) в пуле, не более max_concurrency задач одновременно. '''
+
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self.pending += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.pending -= 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(function, *args))
+        finally:
+            self.semaphore.release()
+
+
+    def close(self):
+        ''' Остановить пулы потоков/процессов (после завершения выполняемых задач). '''
+
+        self.executor.shutdown()
+        if self.thread_executor is not self.executor:
+            self.thread_executor.shutdown()
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        self.close()
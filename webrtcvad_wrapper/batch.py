@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Параллельная обработка большого количества .wav аудиозаписей в пуле процессов.
+
+Содержит функцию filter_many() (используется в VAD.filter_many() и в интерфейсе командной строки) и функции find_wav_files() и
+get_output_templates().
+'''
+
+import os
+import glob
+import concurrent.futures
+
+from .webrtcvad_wrapper import VAD
+
+
+# Объект VAD, который создаётся один раз в каждом процессе пула и используется для всех его аудиозаписей
+_worker_vad = None
+
+
+def _init_worker(sensitivity_mode, cache_args=None, vad_settings=None):
+    global _worker_vad
+    _worker_vad = VAD(sensitivity_mode)
+    if vad_settings is not None:
+        _worker_vad.resample_method = vad_settings['resample_method']
+        _worker_vad.set_energy_gate(vad_settings['energy_gate_dbfs'], vad_settings['energy_gate_guard_ms'])
+    if cache_args is not None:
+        _worker_vad.set_cache(*cache_args)
+
+
+def _filter_file(f_name_wav, filter_kwargs, f_name_output_template=None, concatenate_segments=False):
+    ''' Обработать одну аудиозапись в процессе пула. Ошибка не прерывает обработку остальных аудиозаписей, а возвращается вместе с результатом.
+    1. f_name_wav - имя .wav аудиозаписи
+    2. filter_kwargs - аргументы для VAD.filter()
+    3. f_name_output_template - шаблонное имя для сохранения фрагментов с речью/звуком в формате f_name_output_template_%i.wav (если None - не сохранять)
+    4. concatenate_segments - True: сохранить фрагменты с речью/звуком одной аудиозаписью f_name_output_template.wav
+    5. возвращает кортеж (f_name_wav, filtered_segments, error), где error - None или текст ошибки '''
+
+    try:
+        if f_name_output_template is None:
+            return f_name_wav, _worker_vad.filter_wav(f_name_wav, **filter_kwargs), None
+
+        audio = _worker_vad.read_wav(f_name_wav)
+        filtered_segments = _worker_vad.filter(audio, **filter_kwargs)
+        if os.path.dirname(f_name_output_template):
+            os.makedirs(os.path.dirname(f_name_output_template), exist_ok=True)
+        if concatenate_segments:
+            _worker_vad.write_concatenated_segments(f_name_output_template + '.wav', audio, filtered_segments)
+        else:
+            _worker_vad.write_segments(f_name_output_template, audio, filtered_segments)
+        return f_name_wav, filtered_segments, None
+    except Exception as e:
+        return f_name_wav, None, '%s: %s' % (type(e).__name__, e)
+
+
+def filter_many(f_names_wav, sensitivity_mode=3, workers=None, f_names_output_templates=None, concatenate_segments=False, cache_args=None,
+                vad_settings=None, **filter_kwargs):
+    ''' Обработать много .wav аудиозаписей в пуле процессов. В каждом процессе создаётся один объект VAD, который используется для всех
+    обрабатываемых им аудиозаписей (зависимости импортируются один раз на процесс, а не на каждую аудиозапись).
+
+    Результаты возвращаются по мере готовности (в порядке завершения обработки, а не в порядке f_names_wav). Ошибка при обработке одной
+    аудиозаписи не прерывает обработку остальных.
+
+    1. f_names_wav - список (или любой итерируемый объект) с именами .wav аудиозаписей
+    2. sensitivity_mode - целое число от 0 до 4, подробнее в VAD.set_mode()
+    3. workers - количество процессов (если None - по количеству ядер процессора, если 1 - обработка в текущем процессе без пула)
+    4. f_names_output_templates - список шаблонных имён для сохранения найденных фрагментов с речью/звуком в формате template_%i.wav,
+       по одному для каждой аудиозаписи (если None - фрагменты не сохраняются)
+    5. concatenate_segments - True: сохранять фрагменты с речью/звуком каждой аудиозаписи одной аудиозаписью template.wav
+    6. cache_args - кортеж (f_name_db, max_size_mb) для VAD.set_cache() в каждом процессе (если None - без кэша)
+    7. vad_settings - словарь с настройками объекта VAD в каждом процессе: resample_method, energy_gate_dbfs и energy_gate_guard_ms
+       (подробнее в VAD.set_energy_gate(), если None - настройки по умолчанию)
+    8. filter_kwargs - аргументы для VAD.filter() (frame_duration_ms, padding_duration_ms и т.д.)
+    9. возвращает генератор кортежей (f_name_wav, filtered_segments, error), где:
+        f_name_wav - имя аудиозаписи
+        filtered_segments - результат VAD.filter() или None при ошибке
+        error - None или текст ошибки '''
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("[E] 'workers' должно быть больше 0")
+
+    if f_names_output_templates is None:
+        tasks = ((f_name_wav, None) for f_name_wav in f_names_wav)
+    else:
+        tasks = zip(f_names_wav, f_names_output_templates)
+
+    if workers == 1:
+        _init_worker(sensitivity_mode, cache_args, vad_settings)
+        for f_name_wav, f_name_output_template in tasks:
+            yield _filter_file(f_name_wav, filter_kwargs, f_name_output_template, concatenate_segments)
+        return
+
+    # Количество одновременно отправленных в пул задач ограничено, что бы не создавать сразу все задачи для сотен тысяч аудиозаписей
+    max_pending = workers * 4
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(sensitivity_mode, cache_args, vad_settings)) as executor:
+        pending = set()
+        for f_name_wav, f_name_output_template in tasks:
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(_filter_file, f_name_wav, filter_kwargs, f_name_output_template, concatenate_segments))
+
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+
+def find_wav_files(path):
+    ''' Найти .wav аудиозаписи по имени папки (поиск во всех вложенных папках) или шаблону glob (например, 'data/*/*.wav').
+    1. path - имя папки или шаблон glob
+    2. возвращает отсортированный список имён .wav аудиозаписей '''
+
+    if os.path.isdir(path):
+        f_names_wav = []
+        for root, _, f_names in os.walk(path):
+            f_names_wav += [os.path.join(root, f_name) for f_name in f_names if f_name.lower().endswith('.wav')]
+    else:
+        f_names_wav = [f_name for f_name in glob.glob(path, recursive=True) if os.path.isfile(f_name) and f_name.lower().endswith('.wav')]
+    return sorted(f_names_wav)
+
+
+def get_output_templates(f_names_wav, output_dir):
+    ''' Получить шаблонные имена для сохранения фрагментов с речью/звуком в output_dir с сохранением структуры вложенных папок относительно
+    общей папки всех аудиозаписей (папки создаются в filter_many() при сохранении фрагментов).
+    1. f_names_wav - список имён .wav аудиозаписей
+    2. output_dir - папка для сохранения фрагментов
+    3. возвращает список шаблонных имён (без расширения), по одному для каждой аудиозаписи '''
+
+    base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(f_name_wav)) for f_name_wav in f_names_wav])
+    f_names_output_templates = []
+    for f_name_wav in f_names_wav:
+        f_names_output_templates.append(os.path.join(output_dir, os.path.splitext(os.path.relpath(os.path.abspath(f_name_wav), base_dir))[0]))
+    return f_names_output_templates
@@ -0,0 +1,241 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Постоянный кэш результатов фильтрации в базе SQLite. Ключ результата - хэш аудиоданных (BLAKE2b), название метода, все параметры
+фильтрации и версия библиотеки, поэтому результат для тех же аудиоданных и параметров берётся из кэша, а изменение параметров или
+обновление библиотеки приводит к повторной фильтрации.
+
+Для .wav аудиозаписей хэш содержимого файла запоминается вместе с путём, размером и временем изменения файла: если они не изменились,
+файл повторно не читается и не хэшируется.
+
+Размер кэша ограничен: при превышении удаляются результаты, которые дольше всего не запрашивались (LRU), вместе с сохранёнными хэшами
+файлов, на которые больше не ссылается ни один результат.
+
+Содержит класс ResultCache.
+'''
+
+import os
+import time
+import struct
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+from .segments import SegmentTable, SEGMENT_DTYPE
+
+
+# Заголовок сохранённого результата: тип (b'L' - список сегментов, b'T' - SegmentTable), частота дискретизации (для SegmentTable),
+# количество сегментов
+_RESULT_HEADER = struct.Struct('<cII')
+_LIST_DTYPE = np.dtype([('start', '<f8'), ('end', '<f8'), ('is_speech', '?')])
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def get_content_hash(*buffers):
+    ''' Получить хэш аудиоданных.
+    1. buffers - байтовые строки (или любые объекты с поддержкой buffer protocol)
+    2. возвращает хэш в виде шестнадцатеричной строки '''
+
+    content_hash = hashlib.blake2b(digest_size=20)
+    for buffer in buffers:
+        content_hash.update(buffer)
+    return content_hash.hexdigest()
+
+
+def get_file_hash(f_name):
+    ''' Получить хэш содержимого файла, читая его блоками. '''
+
+    content_hash = hashlib.blake2b(digest_size=20)
+    with open(f_name, 'rb') as f_in:
+        for block in iter(lambda: f_in.read(_HASH_BLOCK_SIZE), b''):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+def _encode_result(filtered_segments):
+    if isinstance(filtered_segments, SegmentTable):
+        return _RESULT_HEADER.pack(b'T', filtered_segments.sample_rate, len(filtered_segments)) + filtered_segments.data.astype(
+            SEGMENT_DTYPE.newbyteorder('<')).tobytes()
+
+    data = np.zeros(len(filtered_segments), dtype=_LIST_DTYPE)
+    if len(filtered_segments) > 0:
+        data['start'], data['end'], data['is_speech'] = zip(*filtered_segments)
+    return _RESULT_HEADER.pack(b'L', 0, len(data)) + data.tobytes()
+
+
+def _decode_result(value):
+    kind, sample_rate, number_of_segments = _RESULT_HEADER.unpack_from(value)
+    if kind == b'T':
+        data = np.frombuffer(value, dtype=SEGMENT_DTYPE.newbyteorder('<'), count=number_of_segments, offset=_RESULT_HEADER.size)
+        return SegmentTable(data.astype(SEGMENT_DTYPE), sample_rate)
+
+    data = np.frombuffer(value, dtype=_LIST_DTYPE, count=number_of_segments, offset=_RESULT_HEADER.size)
+    return [list(segment) for segment in zip(data['start'].tolist(), data['end'].tolist(), data['is_speech'].tolist())]
+
+
+class ResultCache:
+    ''' Постоянный кэш результатов VAD.filter() и VAD.filter_wav() в базе SQLite (используется через VAD.set_cache()).
+
+    Одну базу могут одновременно использовать несколько потоков и процессов (например, в VAD.filter_many()).
+
+    1. f_name_db - имя файла базы SQLite (создаётся, если не существует)
+    2. max_size_mb - максимальный суммарный размер сохранённых результатов в МБ, при превышении удаляются результаты, которые дольше
+       всего не запрашивались
+
+    Пример использования:
+        vad = VAD(3)
+        vad.set_cache('vad_cache.sqlite')
+        filtered_segments = vad.filter_wav('test.wav')  # при повторном вызове результат берётся из кэша '''
+
+    def __init__(self, f_name_db, max_size_mb=1024):
+        self.f_name_db = f_name_db
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(f_name_db, timeout=60, check_same_thread=False)
+        with self.lock, self.connection:
+            # WAL и synchronous=NORMAL: чтение не блокируется записью, и обновление времени последнего запроса не вызывает fsync()
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                                    'last_access REAL NOT NULL, content_hash TEXT)')
+            # В базах, созданных до появления колонки content_hash, она добавляется (другой процесс может добавить её одновременно)
+            if 'content_hash' not in [row[1] for row in self.connection.execute('PRAGMA table_info(results)')]:
+                try:
+                    self.connection.execute('ALTER TABLE results ADD COLUMN content_hash TEXT')
+                except sqlite3.OperationalError:
+                    pass
+            self.connection.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS results_content_hash ON results (content_hash)')
+            # Суммарный размер результатов поддерживается триггерами, что бы не вычислять его по всей таблице при каждом сохранении
+            self.connection.execute('CREATE TABLE IF NOT EXISTS total_size (size INTEGER NOT NULL)')
+            self.connection.execute('INSERT INTO total_size (size) SELECT COALESCE(SUM(size), 0) FROM results WHERE NOT EXISTS '
+                                    '(SELECT 1 FROM total_size)')
+            self.connection.execute('CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN '
+                                    'UPDATE total_size SET size = size + NEW.size; END')
+            self.connection.execute('CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN '
+                                    'UPDATE total_size SET size = size - OLD.size; END')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, '
+                                    'content_hash TEXT NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash)')
+
+
+    @staticmethod
+    def get_key(content_hash, method_name, params):
+        ''' Получить ключ результата.
+        1. content_hash - хэш аудиоданных (get_content_hash() или get_file_hash())
+        2. method_name - название метода, результат которого сохраняется
+        3. params - кортеж со всеми параметрами фильтрации (включая версию библиотеки)
+        4. возвращает ключ в виде шестнадцатеричной строки '''
+
+        return get_content_hash(('%s|%s|%r' % (content_hash, method_name, params)).encode('utf-8'))
+
+
+    def get_file_hash(self, f_name):
+        ''' Получить хэш содержимого файла. Если путь, размер и время изменения файла совпадают с сохранёнными ранее - хэш берётся из базы
+        без чтения файла. '''
+
+        f_name = os.path.abspath(f_name)
+        stat = os.stat(f_name)
+        with self.lock:
+            row = self.connection.execute('SELECT size, mtime_ns, content_hash FROM files WHERE path = ?', (f_name,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        content_hash = get_file_hash(f_name)
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)',
+                                    (f_name, stat.st_size, stat.st_mtime_ns, content_hash))
+        return content_hash
+
+
+    def get(self, key):
+        ''' Получить результат по ключу (список сегментов или SegmentTable) или None, если его нет в кэше. '''
+
+        with self.lock, self.connection:
+            row = self.connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+        return _decode_result(row[0])
+
+
+    def put(self, key, filtered_segments, content_hash=None):
+        ''' Сохранить результат и удалить давно не запрашиваемые результаты при превышении размера кэша.
+        1. key - ключ результата (get_key())
+        2. filtered_segments - список сегментов или SegmentTable
+        3. content_hash - хэш аудиоданных, для которых получен результат: пока на хэш файла ссылается хотя бы один результат, он хранится
+           в базе (если None - хэши файлов для этого результата не учитываются) '''
+
+        value = _encode_result(filtered_segments)
+        with self.lock, self.connection:
+            # DELETE + INSERT вместо INSERT OR REPLACE: при замене строки через REPLACE триггер удаления не вызывается
+            self.connection.execute('DELETE FROM results WHERE key = ?', (key,))
+            self.connection.execute('INSERT INTO results (key, value, size, last_access, content_hash) VALUES (?, ?, ?, ?, ?)',
+                                    (key, value, len(value), time.time(), content_hash))
+            total_size = self.connection.execute('SELECT size FROM total_size').fetchone()[0]
+            if total_size > self.max_size:
+                self.__evict(total_size - self.max_size)
+
+
+    def __evict(self, size_to_free):
+        ''' Удалить результаты, которые дольше всего не запрашивались, суммарным размером не меньше size_to_free байт, и хэши файлов,
+        на которые после этого не ссылается ни один результат (иначе таблица files растёт с каждым новым путём). '''
+
+        freed_size = 0
+        keys = []
+        content_hashes = set()
+        for key, size, content_hash in self.connection.execute('SELECT key, size, content_hash FROM results ORDER BY last_access'):
+            keys.append((key,))
+            if content_hash is not None:
+                content_hashes.add((content_hash,))
+            freed_size += size
+            if freed_size >= size_to_free:
+                break
+        self.connection.executemany('DELETE FROM results WHERE key = ?', keys)
+        self.connection.executemany('DELETE FROM files WHERE content_hash = ?1 AND NOT EXISTS (SELECT 1 FROM results WHERE content_hash = ?1)',
+                                    content_hashes)
+
+
+    @property
+    def size(self):
+        ''' Суммарный размер сохранённых результатов в байтах. '''
+
+        with self.lock:
+            return self.connection.execute('SELECT size FROM total_size').fetchone()[0]
+
+
+    @property
+    def number_of_files(self):
+        ''' Количество файлов, хэши которых сохранены в базе. '''
+
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+
+    def clear(self):
+        ''' Удалить все сохранённые результаты и хэши файлов. '''
+
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM results')
+            self.connection.execute('DELETE FROM files')
+
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
@@ -12,45 +12,235 @@ from webrtcvad_wrapper import VAD
 
 
 def print_help():
-    print('\nИспользование: webrtcvad_wrapper.py <--mode=3> input.wav output.wav')
+    print('\nИспользование: webrtcvad_wrapper.py <--mode=3> <--workers=N> <--concat=1> input.wav output.wav')
     print('\t--mode=3 - режим чувствительности, целое число от 0 до 4 (по умолчанию 3)')
-    print('\tinput.wav - имя исходного .wav аудиофайла')
-    print('\toutput.wav - шаблонное имя для .wav аудиофайлов, в которые будут сохранены найденные фрагменты с речью/звуком в формате output_%i.wav\n')
+    print('\t--concat=1 - сохранить все фрагменты с речью/звуком одной аудиозаписью output.wav (аудиозапись без тишины)')
+    print('\t--workers=N - количество процессов для обработки многих аудиозаписей (по умолчанию по количеству ядер процессора)')
+    print('\tinput.wav - имя исходного .wav аудиофайла, папки с .wav аудиофайлами или шаблон glob (например, "data/*.wav")')
+    print('\toutput.wav - шаблонное имя для .wav аудиофайлов, в которые будут сохранены найденные фрагменты с речью/звуком в формате output_%i.wav')
+    print('\t             (если input.wav - папка или шаблон glob, то имя папки, в которую будут сохранены фрагменты в формате <имя исходного файла>_%i.wav)\n')
+    print('Режим сервера: webrtcvad_wrapper.py serve <--host=127.0.0.1> <--port=8765> <--unix=/tmp/vad.sock> <--workers=N>')
+    print('\t--host, --port - адрес TCP сокета (по умолчанию 127.0.0.1:8765)')
+    print('\t--unix - путь к Unix сокету (если задан - используется вместо TCP)')
+    print('\t--workers=N - количество потоков для обработки аудиоданных (по умолчанию по количеству ядер процессора)')
+    print('\tПротокол описан в webrtcvad_wrapper/server.py\n')
+    print('Обработка по манифесту: webrtcvad_wrapper.py manifest <--mode=3> <--workers=N> <--shard=i/N> <--output_dir=dir> <--concat=1> <--column=path> '
+          'manifest.jsonl results.jsonl')
+    print('\tmanifest.jsonl - манифест JSONL (JSON объект с путём к .wav аудиофайлу в поле column или JSON строка с путём на строку) или .csv '
+          '(с заголовком)')
+    print('\tresults.jsonl - выходной файл, в который дописываются найденные сегменты (по одной строке на аудиофайл). Уже обработанные '
+          'аудиофайлы')
+    print('\t                при повторном запуске пропускаются, аудиофайлы с ошибкой обрабатываются повторно')
+    print('\t--shard=i/N - обработать только часть i из N (аудиофайлы с номером в манифесте index % N == i, i от 0)')
+    print('\t--output_dir=dir - папка, в которую будут сохранены фрагменты с речью/звуком (если не задана - фрагменты не сохраняются)')
+    print('\t--column=path - название поля/колонки манифеста с путём к .wav аудиофайлу (по умолчанию path)\n')
+    print('Потоковая обработка: webrtcvad_wrapper.py pipe <--rate=16000> <--mode=3> <--frame=10> <--padding=50> <--pcm=1> < input.pcm > output')
+    print('\tаудиоданные PCM 16 бит, моно (без заголовков или .wav) читаются из stdin, найденные сегменты записываются в stdout по мере их закрытия,')
+    print('\tпо одному JSON объекту на строку: {"event": "segment", "start": 0.0, "end": 1.23, "is_speech": true}, в конце {"event": "end"}')
+    print('\t--rate=16000 - частота дискретизации аудиоданных без заголовков (для .wav берётся из заголовка)')
+    print('\t--mode=3 - режим чувствительности, целое число от 0 до 3 (по умолчанию 3)')
+    print('\t--frame=10 - длина фрейма в миллисекундах: 10, 20 или 30 (по умолчанию 10)')
+    print('\t--padding=50 - длина окна сглаживания в миллисекундах (по умолчанию 50)')
+    print('\t--pcm=1 - записывать в stdout вместо сегментов только аудиоданные с речью/звуком (PCM 16 бит без заголовков)\n')
+    print('Обработка растущей аудиозаписи: webrtcvad_wrapper.py follow <--mode=3> <--state=recording.wav.vad.json> <--interval=60> <--finish=1> '
+          'recording.wav <segments.jsonl>')
+    print('\tобрабатываются только аудиоданные, дописанные после предыдущего запуска, новые сегменты дописываются в segments.jsonl (или выводятся')
+    print('\tв stdout) по одному JSON объекту на строку: {"start": 0.0, "end": 1.23, "is_speech": true}')
+    print('\t--mode=3 - режим чувствительности, целое число от 0 до 3 (по умолчанию 3)')
+    print('\t--state=path - файл состояния между запусками (по умолчанию <имя аудиофайла>.vad.json)')
+    print('\t--interval=60 - повторять обработку каждые 60 секунд до остановки (по умолчанию однократно)')
+    print('\t--finish=1 - аудиофайл завершён: закрыть последний сегмент\n')
     os._exit(0)
 
 
-def cli():
-    if len(sys.argv) > 2 and sys.argv[1].rfind('.wav') != -1 and os.path.exists(sys.argv[1]):
-        vad = VAD()
-        audio = vad.read_wav(sys.argv[1])
-        filtered_segments = vad.filter(audio)
-        segments_with_voice = [[filtered_segment[0], filtered_segment[1]] for filtered_segment in filtered_segments if filtered_segment[-1]]
-        for i, segment in enumerate(segments_with_voice):
-            if sys.argv[2].rfind('.wav') != -1:
-                f_name_segment = sys.argv[2][:sys.argv[2].rfind('.wav')] + '_%i.wav' % (i + 1)
-            else:
-                f_name_segment = sys.argv[2] + '_%i.wav' % (i + 1)
-            print('Сохранение %s' % (f_name_segment))
-            vad.write_wav(f_name_segment, audio[segment[0]*1000:segment[1]*1000])
-    elif len(sys.argv) > 1 and sys.argv[1].find('--mode') != -1:
-        sensitivity_mode = int(sys.argv[1][sys.argv[1].find('--mode=')+7:])
-        if len(sys.argv) > 3 and sys.argv[2].rfind('.wav') != -1 and os.path.exists(sys.argv[2]):
-            vad = VAD(sensitivity_mode)
-            audio = vad.read_wav(sys.argv[2])
-            filtered_segments = vad.filter(audio)
-            segments_with_voice = [[filtered_segment[0], filtered_segment[1]] for filtered_segment in filtered_segments if filtered_segment[-1]]
-            for i, segment in enumerate(segments_with_voice):
-                if sys.argv[3].rfind('.wav') != -1:
-                    f_name_segment = sys.argv[3][:sys.argv[3].rfind('.wav')] + '_%i.wav' % (i + 1)
-                else:
-                    f_name_segment = sys.argv[3] + '_%i.wav' % (i + 1)
-                print('Сохранение %s' % (f_name_segment))
-                vad.write_wav(f_name_segment, audio[segment[0]*1000:segment[1]*1000])
+def parse_args(argv):
+    ''' Разбор аргументов командной строки.
+    1. argv - список аргументов (без имени программы)
+    2. возвращает кортеж (options, args), где options - словарь из аргументов вида --key=value, args - список остальных аргументов '''
+
+    options = {}
+    args = []
+    for arg in argv:
+        if arg.startswith('--') and arg.find('=') != -1:
+            options[arg[2:arg.find('=')]] = arg[arg.find('=')+1:]
+        else:
+            args.append(arg)
+    return options, args
+
+
+def is_glob_pattern(path):
+    return any(symbol in path for symbol in '*?[')
+
+
+def filter_file(vad, f_name_wav, f_name_output, concatenate=False):
+    audio = vad.read_wav(f_name_wav)
+    filtered_segments = vad.filter(audio)
+    if concatenate:
+        if f_name_output.rfind('.wav') == -1:
+            f_name_output += '.wav'
+        print('Сохранение %s' % (f_name_output))
+        vad.write_concatenated_segments(f_name_output, audio, filtered_segments)
+        return
+
+    for f_name_segment in vad.write_segments(f_name_output, audio, filtered_segments):
+        print('Сохранение %s' % (f_name_segment))
+
+
+def filter_files(vad, f_names_wav, output_dir, workers=None, concatenate=False):
+    ''' Обработать много аудиозаписей в пуле процессов и сохранить найденные фрагменты с речью/звуком в output_dir с сохранением структуры
+    вложенных папок (если concatenate=True - одной аудиозаписью без тишины на каждую исходную). '''
+
+    from webrtcvad_wrapper.batch import filter_many, get_output_templates
+
+    f_names_output_templates = get_output_templates(f_names_wav, output_dir)
+    number_of_errors = 0
+    for f_name_wav, filtered_segments, error in filter_many(f_names_wav, vad.sensitivity_mode, workers, f_names_output_templates,
+                                                           concatenate_segments=concatenate):
+        if error is None:
+            print('Обработано %s: найдено фрагментов с речью/звуком: %i' % (f_name_wav, len([segment for segment in filtered_segments if segment[-1]])))
+        else:
+            number_of_errors += 1
+            print('[E] Ошибка при обработке %s: %s' % (f_name_wav, error))
+    print('\nОбработано аудиозаписей: %i, из них с ошибками: %i' % (len(f_names_wav), number_of_errors))
+
+
+def run_server(options):
+    from webrtcvad_wrapper.server import serve
+
+    try:
+        sensitivity_mode = int(options.get('mode', 3))
+        port = int(options.get('port', 8765))
+        workers = int(options['workers']) if 'workers' in options else None
+    except ValueError:
+        print_help()
+
+    try:
+        serve(options.get('host', '127.0.0.1'), port, options.get('unix'), sensitivity_mode, workers)
+    except KeyboardInterrupt:
+        pass
+
+
+def run_manifest(options, args):
+    from webrtcvad_wrapper.manifest import process_manifest, parse_shard
+
+    if len(args) < 2:
+        print_help()
+    try:
+        sensitivity_mode = int(options.get('mode', 3))
+        workers = int(options['workers']) if 'workers' in options else None
+        concatenate = bool(int(options.get('concat', 0)))
+        shard = parse_shard(options.get('shard', '0/1'))
+    except ValueError:
+        print_help()
+
+    number_of_files = 0
+    number_of_errors = 0
+    for record in process_manifest(args[0], args[1], sensitivity_mode, workers, shard, options.get('output_dir'), concatenate,
+                                   options.get('column', 'path')):
+        number_of_files += 1
+        if record['error'] is None:
+            print('Обработано %s: найдено фрагментов с речью/звуком: %i' % (record['path'], len([segment for segment in record['segments']
+                                                                                                if segment[-1]])))
         else:
-            print_help()
+            number_of_errors += 1
+            print('[E] Ошибка при обработке %s: %s' % (record['path'], record['error']))
+    print('\nОбработано аудиозаписей: %i, из них с ошибками: %i' % (number_of_files, number_of_errors))
+
+
+def run_pipe(options):
+    from webrtcvad_wrapper.pipe import filter_stream
+
+    try:
+        sample_rate = int(options.get('rate', 16000))
+        sensitivity_mode = int(options.get('mode', 3))
+        frame_duration_ms = int(options.get('frame', 10))
+        padding_duration_ms = int(options.get('padding', 50))
+        speech_only_pcm = bool(int(options.get('pcm', 0)))
+    except ValueError:
+        print_help()
+
+    try:
+        filter_stream(sys.stdin.buffer, sys.stdout.buffer, sample_rate, sensitivity_mode, frame_duration_ms, padding_duration_ms,
+                      speech_only_pcm=speech_only_pcm)
+    except ValueError as e:
+        sys.stderr.write('%s\n' % e)
+        sys.exit(1)
+    except BrokenPipeError:
+        # Следующая программа в конвейере закрыла свой stdin (например, head): оставшийся вывод отбрасывается
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_follow(options, args):
+    import time
+    import json
+
+    if len(args) < 1:
+        print_help()
+    try:
+        sensitivity_mode = int(options.get('mode', 3))
+        interval = float(options['interval']) if 'interval' in options else None
+        finish = bool(int(options.get('finish', 0)))
+    except ValueError:
+        print_help()
+
+    vad = VAD(sensitivity_mode)
+    f_name_output = args[1] if len(args) > 1 else None
+    try:
+        while True:
+            filtered_segments = vad.follow_wav(args[0], options.get('state'), f_name_output, finish=finish)
+            if f_name_output is None:
+                for segment in filtered_segments:
+                    print(json.dumps({'start': segment[0], 'end': segment[1], 'is_speech': segment[2]}), flush=True)
+            if interval is None:
+                return
+            time.sleep(interval)
+    except ValueError as e:
+        sys.stderr.write('%s\n' % e)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+def cli():
+    options, args = parse_args(sys.argv[1:])
+    if args[:1] == ['serve']:
+        run_server(options)
+        return
+    if args[:1] == ['manifest']:
+        run_manifest(options, args[1:])
+        return
+    if args[:1] == ['pipe']:
+        run_pipe(options)
+        return
+    if args[:1] == ['follow']:
+        run_follow(options, args[1:])
+        return
+    if len(args) < 2:
+        print_help()
+
+    try:
+        sensitivity_mode = int(options.get('mode', 3))
+        workers = int(options['workers']) if 'workers' in options else None
+        concatenate = bool(int(options.get('concat', 0)))
+    except ValueError:
+        print_help()
+
+    if args[0].rfind('.wav') != -1 and os.path.isfile(args[0]):
+        vad = VAD(sensitivity_mode)
+        filter_file(vad, args[0], args[1], concatenate)
+    elif os.path.isdir(args[0]) or is_glob_pattern(args[0]):
+        from webrtcvad_wrapper.batch import find_wav_files
+        f_names_wav = find_wav_files(args[0])
+        if not f_names_wav:
+            print('[E] Не найдено ни одного .wav аудиофайла по пути %s' % args[0])
+            return
+        vad = VAD(sensitivity_mode)
+        filter_files(vad, f_names_wav, args[1], workers, concatenate)
     else:
         print_help()
 
 
 if __name__ == '__main__':
-    cli()
\ No newline at end of file
+    cli()
@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Сохранение найденных сегментов в .wav аудиозаписи напрямую из исходного буфера с аудиоданными, без создания pydub.AudioSegment на
+каждый сегмент: аудиоданные сегментов берутся через memoryview без копирования, заголовок wav формируется по заранее собранному
+шаблону, и каждый файл записывается одним вызовом os.writev().
+
+Содержит функции get_wav_header(), get_segment_offsets(), write_segments() и write_concatenated_segments().
+'''
+
+import os
+import struct
+import numpy as np
+
+from .segments import SegmentTable
+
+
+# Заголовок .wav аудиозаписи PCM: RIFF/WAVE, блок fmt (16 байт) и начало блока data. Совпадает с заголовком, который создаёт модуль wave
+# (используется в pydub при сохранении в wav)
+_WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+# Максимальное количество буферов в одном вызове os.writev()
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+
+def get_wav_header(data_size, sample_rate, channels=1, sample_width=2):
+    ''' Сформировать 44-байтный заголовок .wav аудиозаписи PCM.
+    1. data_size - размер аудиоданных в байтах
+    2. sample_rate - частота дискретизации
+    3. channels - количество каналов
+    4. sample_width - ширина семпла в байтах
+    5. возвращает байтовую строку с заголовком '''
+
+    block_align = channels * sample_width
+    return _WAV_HEADER.pack(b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, 1, channels, sample_rate, sample_rate * block_align, block_align,
+                            sample_width * 8, b'data', data_size)
+
+
+def get_segment_offsets(filtered_segments, sample_rate, num_samples, speech_only=True):
+    ''' Получить границы сегментов в семплах.
+    1. filtered_segments - объект webrtcvad_wrapper.SegmentTable или список сегментов [[0.00, 1.23, True/False], ...] (результат VAD.filter())
+    2. sample_rate - частота дискретизации аудиозаписи
+    3. num_samples - количество семплов в аудиозаписи
+    4. speech_only - True: только сегменты с речью/звуком
+    5. возвращает кортеж из двух массивов NumPy (int64) с номерами первых семплов сегментов и номерами семплов после последних
+
+    Границы из списка в секундах переводятся в семплы так же, как при получении среза pydub.AudioSegment (audio[start*1000:end*1000]),
+    поэтому сохранённые аудиоданные совпадают с аудиоданными этого среза. '''
+
+    if isinstance(filtered_segments, SegmentTable):
+        if speech_only:
+            filtered_segments = filtered_segments.speech()
+        return np.minimum(filtered_segments.starts, num_samples), np.minimum(filtered_segments.ends, num_samples)
+
+    if speech_only:
+        filtered_segments = [segment for segment in filtered_segments if segment[-1]]
+    if len(filtered_segments) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    borders = np.array([[segment[0], segment[1]] for segment in filtered_segments], dtype=np.float64) * 1000
+    # Длина аудиозаписи в миллисекундах, как len(pydub.AudioSegment)
+    len_audio_ms = round(1000 * num_samples / sample_rate)
+    offsets = (np.minimum(borders, len_audio_ms) * (sample_rate / 1000.0)).astype(np.int64)
+    offsets = np.minimum(offsets, num_samples)
+    return offsets[:, 0], offsets[:, 1]
+
+
+def write_segments(f_name_template, audio, filtered_segments, sample_rate=None, speech_only=True, sample_width=2, channels=1):
+    ''' Сохранить каждый сегмент в отдельную .wav аудиозапись с именем f_name_template_%i.wav (нумерация с 1).
+    1. f_name_template - шаблонное имя (если оканчивается на .wav - расширение отбрасывается)
+    2. audio - объект pydub.AudioSegment с аудиозаписью или байтовая строка (или любой объект с поддержкой buffer protocol) с аудиоданными
+    3. filtered_segments - объект webrtcvad_wrapper.SegmentTable или список сегментов (результат VAD.filter())
+    4. sample_rate - частота дискретизации (если audio - pydub.AudioSegment, берётся из него)
+    5. speech_only - True: сохранять только сегменты с речью/звуком
+    6. sample_width - ширина семпла в байтах (если audio - pydub.AudioSegment, берётся из него)
+    7. channels - количество каналов (если audio - pydub.AudioSegment, берётся из него)
+    8. возвращает список имён сохранённых .wav аудиозаписей '''
+
+    audio_bytes, sample_rate, sample_width, channels = _get_audio_bytes(audio, sample_rate, sample_width, channels)
+    frame_width = sample_width * channels
+    starts, ends = get_segment_offsets(filtered_segments, sample_rate, len(audio_bytes) // frame_width, speech_only)
+
+    if f_name_template.endswith('.wav'):
+        f_name_template = f_name_template[:-len('.wav')]
+
+    f_names_wav = []
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        f_name_wav = f_name_template + '_%i.wav' % (i + 1)
+        data = audio_bytes[start * frame_width:end * frame_width]
+        _write_file(f_name_wav, [get_wav_header(len(data), sample_rate, channels, sample_width), data])
+        f_names_wav.append(f_name_wav)
+    return f_names_wav
+
+
+def write_concatenated_segments(f_name_wav, audio, filtered_segments, sample_rate=None, speech_only=True, sample_width=2, channels=1):
+    ''' Сохранить сегменты, объединённые в одну .wav аудиозапись (например, аудиозапись без тишины). Аудиоданные сегментов не копируются
+    и не объединяются в памяти: файл записывается из memoryview на исходные аудиоданные.
+    1. f_name_wav - имя .wav аудиозаписи
+    2. остальные аргументы аналогичны write_segments()
+    3. возвращает длительность сохранённой аудиозаписи в секундах '''
+
+    audio_bytes, sample_rate, sample_width, channels = _get_audio_bytes(audio, sample_rate, sample_width, channels)
+    frame_width = sample_width * channels
+    starts, ends = get_segment_offsets(filtered_segments, sample_rate, len(audio_bytes) // frame_width, speech_only)
+
+    data_size = int(np.sum(ends - starts)) * frame_width
+    buffers = [get_wav_header(data_size, sample_rate, channels, sample_width)]
+    buffers += [audio_bytes[start * frame_width:end * frame_width] for start, end in zip(starts.tolist(), ends.tolist())]
+    _write_file(f_name_wav, buffers)
+    return data_size / frame_width / sample_rate
+
+
+def _get_audio_bytes(audio, sample_rate, sample_width, channels):
+    # У pydub.AudioSegment аудиоданные и их параметры хранятся в полях raw_data, frame_rate, sample_width и channels
+    if hasattr(audio, 'raw_data'):
+        return memoryview(audio.raw_data).cast('B'), audio.frame_rate, audio.sample_width, audio.channels
+
+    if sample_rate is None:
+        raise ValueError("[E] Когда audio - байтовая строка, 'sample_rate' не может быть None")
+    return memoryview(audio).cast('B'), sample_rate, sample_width, channels
+
+
+def _write_file(f_name, buffers):
+    ''' Записать буферы в файл одним системным вызовом (при большом количестве буферов - группами по _IOV_MAX). '''
+
+    buffers = [buffer for buffer in buffers if len(buffer) > 0]
+    if not hasattr(os, 'writev'):
+        with open(f_name, 'wb') as f_out:
+            for buffer in buffers:
+                f_out.write(buffer)
+        return
+
+    fd = os.open(f_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        for i in range(0, len(buffers), _IOV_MAX):
+            group = buffers[i:i + _IOV_MAX]
+            # os.writev() может записать не всё, тогда запись продолжается с первого незаписанного байта
+            while group:
+                written = os.writev(fd, group)
+                while group and written >= len(group[0]):
+                    written -= len(group[0])
+                    group.pop(0)
+                if group:
+                    group[0] = memoryview(group[0])[written:]
+    finally:
+        os.close(fd)
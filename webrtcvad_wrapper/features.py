@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Вычисление признаков для дополнительного режима VAD (sensitivity_mode=4): RMS (root-mean-square, мощность звуковой волны) и ZCR
+(zero-crossing rate, частота пересечения нуля) для каждого фрейма. Также средняя мощность фреймов WebRTC VAD для энергетического
+порога (VAD.set_energy_gate()).
+
+Результаты совпадают с librosa.feature.rms() и librosa.feature.zero_crossing_rate(threshold=0) с центрированием фреймов (center=True),
+но вычисляются блоками фиксированного размера по исходным данным int16 или float32, без создания полноразмерных копий в float64.
+Для длинных аудиозаписей признаки можно получать по блокам (frame_rms_max() и iter_frame_features()), не храня их для всей аудиозаписи.
+'''
+
+import numpy as np
+
+
+def get_number_of_frames(len_audio, frame_length, hop_length):
+    ''' Количество центрированных фреймов (как в librosa при center=True).
+    1. len_audio - количество семплов
+    2. frame_length - длина фрейма в семплах
+    3. hop_length - шаг между фреймами в семплах
+    4. возвращает количество фреймов '''
+
+    if frame_length < 1 or hop_length < 1:
+        raise ValueError("[E] 'frame_length' и 'hop_length' должны быть больше 0")
+
+    num_frames = 1 + (len_audio + 2 * (frame_length // 2) - frame_length) // hop_length
+    if num_frames < 1:
+        raise ValueError('[E] Аудиозапись слишком короткая: %i семплов при длине фрейма %i семплов' % (len_audio, frame_length))
+    return num_frames
+
+
+def frame_rms(audio_data, frame_length, hop_length, frames_per_block=8192):
+    ''' Вычислить RMS для каждого фрейма. Аудиозапись дополняется нулями на половину фрейма с обеих сторон.
+    1. audio_data - одномерный массив NumPy (int16, float32 или любой другой числовой тип, в т.ч. np.memmap)
+    2. frame_length - длина фрейма в семплах
+    3. hop_length - шаг между фреймами в семплах
+    4. frames_per_block - количество фреймов, обрабатываемых за один раз (определяет размер используемой памяти)
+    5. возвращает массив NumPy (float64) со значениями RMS '''
+
+    num_frames = get_number_of_frames(len(audio_data), frame_length, hop_length)
+    rms = np.empty(num_frames, dtype=np.float64)
+    for first_frame, last_frame, block in _iterate_blocks(audio_data, frame_length, hop_length, num_frames, frames_per_block, 'constant'):
+        rms[first_frame:last_frame] = _block_rms(block, last_frame - first_frame, frame_length, hop_length)
+    return rms
+
+
+def frame_zcr(audio_data, frame_length, hop_length, frames_per_block=8192):
+    ''' Вычислить долю пересечений нуля для каждого фрейма (ноль считается положительным значением). Аудиозапись дополняется крайними
+    значениями на половину фрейма с обеих сторон.
+    1. audio_data - одномерный массив NumPy (int16, float32 или любой другой числовой тип, в т.ч. np.memmap)
+    2. frame_length - длина фрейма в семплах
+    3. hop_length - шаг между фреймами в семплах
+    4. frames_per_block - количество фреймов, обрабатываемых за один раз (определяет размер используемой памяти)
+    5. возвращает массив NumPy (float64) со значениями ZCR '''
+
+    num_frames = get_number_of_frames(len(audio_data), frame_length, hop_length)
+    zcr = np.empty(num_frames, dtype=np.float64)
+    for first_frame, last_frame, block in _iterate_blocks(audio_data, frame_length, hop_length, num_frames, frames_per_block, 'edge'):
+        zcr[first_frame:last_frame] = _block_zcr(block, last_frame - first_frame, frame_length, hop_length)
+    return zcr
+
+
+def frame_rms_max(audio_data, frame_length, hop_length, frames_per_block=8192):
+    ''' Вычислить максимальное значение RMS фреймов (первый проход при обработке по блокам: значения RMS не сохраняются). Аргументы
+    аналогичны frame_rms().
+    1. возвращает максимальное значение RMS (совпадает с frame_rms(...).max()) '''
+
+    num_frames = get_number_of_frames(len(audio_data), frame_length, hop_length)
+    rms_max = 0.0
+    for first_frame, last_frame, block in _iterate_blocks(audio_data, frame_length, hop_length, num_frames, frames_per_block, 'constant'):
+        rms_max = max(rms_max, _block_rms(block, last_frame - first_frame, frame_length, hop_length).max())
+    return rms_max
+
+
+def iter_frame_features(audio_data, frame_length, hop_length, frames_per_block=8192):
+    ''' Вычислить RMS и ZCR фреймов по блокам из frames_per_block фреймов (используемая память определяется размером блока и не зависит
+    от длины аудиозаписи). Значения совпадают с frame_rms() и frame_zcr(), аргументы аналогичны им.
+    1. возвращает генератор кортежей (номер первого фрейма блока, массив RMS, массив ZCR) '''
+
+    num_frames = get_number_of_frames(len(audio_data), frame_length, hop_length)
+    blocks_rms = _iterate_blocks(audio_data, frame_length, hop_length, num_frames, frames_per_block, 'constant')
+    blocks_zcr = _iterate_blocks(audio_data, frame_length, hop_length, num_frames, frames_per_block, 'edge')
+    for (first_frame, last_frame, block_rms), (_, _, block_zcr) in zip(blocks_rms, blocks_zcr):
+        yield (first_frame, _block_rms(block_rms, last_frame - first_frame, frame_length, hop_length),
+               _block_zcr(block_zcr, last_frame - first_frame, frame_length, hop_length))
+
+
+def _block_rms(block, num_frames, frame_length, hop_length):
+    ''' Вычислить RMS num_frames фреймов блока (блок содержит все семплы своих фреймов, подробнее в _iterate_blocks()). '''
+
+    # Для целочисленных данных сумма квадратов считается точно в int64
+    accumulator_dtype = np.int64 if np.issubdtype(block.dtype, np.integer) else np.float64
+    block = block.astype(accumulator_dtype)
+    cumsum_squares = np.zeros(len(block) + 1, dtype=accumulator_dtype)
+    np.cumsum(block * block, out=cumsum_squares[1:])
+
+    starts = np.arange(num_frames) * hop_length
+    power = (cumsum_squares[starts + frame_length] - cumsum_squares[starts]) / frame_length
+    return np.sqrt(power)
+
+
+def _block_zcr(block, num_frames, frame_length, hop_length):
+    ''' Вычислить ZCR num_frames фреймов блока (блок содержит все семплы своих фреймов, подробнее в _iterate_blocks()). '''
+
+    negative = block < 0
+    cumsum_crossings = np.zeros(len(block), dtype=np.int64)
+    np.cumsum(negative[1:] != negative[:-1], out=cumsum_crossings[1:])
+
+    starts = np.arange(num_frames) * hop_length
+    crossings = cumsum_crossings[starts + frame_length - 1] - cumsum_crossings[starts]
+    return crossings / frame_length
+
+
+def frame_power(frames_data, frames_per_block=8192):
+    ''' Вычислить среднюю мощность (среднее значение квадратов семплов) каждого фрейма без центрирования и дополнения.
+    1. frames_data - двумерный массив NumPy (фреймы x семплы), например FrameTable.samples()
+    2. frames_per_block - количество фреймов, обрабатываемых за один раз (определяет размер используемой памяти)
+    3. возвращает массив NumPy (float64) со значениями мощности '''
+
+    power = np.empty(len(frames_data), dtype=np.float64)
+    accumulator_dtype = np.int64 if np.issubdtype(frames_data.dtype, np.integer) else np.float64
+    for first_frame in range(0, len(frames_data), frames_per_block):
+        block = frames_data[first_frame:first_frame + frames_per_block].astype(accumulator_dtype)
+        power[first_frame:first_frame + len(block)] = np.einsum('ij,ij->i', block, block) / frames_data.shape[1]
+    return power
+
+
+def _iterate_blocks(audio_data, frame_length, hop_length, num_frames, frames_per_block, pad_mode):
+    ''' Разбить аудиозапись на блоки из frames_per_block центрированных фреймов. Каждый блок содержит все семплы своих фреймов, с
+    дополнением на краях аудиозаписи (pad_mode - 'constant' или 'edge'). Копируется только текущий блок.
+    1. возвращает генератор кортежей (номер первого фрейма блока, номер фрейма после последнего, массив NumPy с семплами блока) '''
+
+    padding = frame_length // 2
+    len_audio = len(audio_data)
+    for first_frame in range(0, num_frames, frames_per_block):
+        last_frame = min(first_frame + frames_per_block, num_frames)
+        # Границы блока в координатах исходной аудиозаписи (могут выходить за её пределы на краях)
+        start = first_frame * hop_length - padding
+        end = (last_frame - 1) * hop_length + frame_length - padding
+
+        block = np.asarray(audio_data[max(start, 0):min(end, len_audio)])
+        if start < 0 or end > len_audio:
+            block = np.pad(block, (max(-start, 0), max(end - len_audio, 0)), mode=pad_mode)
+        yield first_frame, last_frame, block
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Инкрементальная фильтрация растущей .wav аудиозаписи (режим follow интерфейса командной строки), например, аудиозаписи, которая ещё
+записывается: при каждом запуске обрабатываются только аудиоданные, дописанные после предыдущего запуска, поэтому время работы зависит
+от длины новых аудиоданных, а не от длины всей аудиозаписи.
+
+Между запусками в файле состояния (JSON, по умолчанию <имя аудиозаписи>.vad.json) хранятся номер первого необработанного байта
+аудиоданных, состояние триггерного алгоритма сглаживания (TriggerState: флаг триггерного состояния, окно, открытый сегмент) и параметры
+фильтрации. Неполный последний фрейм не обрабатывается до следующего запуска. Если параметры изменились или аудиозапись стала короче
+(например, была перезаписана), обработка начинается с начала. Размер блока data в заголовке не обязан быть актуальным: 0 или 0xFFFFFFFF
+(как его записывают многие программы до завершения записи) означает, что аудиоданные продолжаются до конца файла.
+
+Внутреннее адаптивное состояние WebRTC VAD нельзя сохранить, поэтому перед новыми аудиоданными новому объекту webrtcvad.Vad передаются
+warmup_duration_ms предшествующих аудиоданных (их решения отбрасываются, как в VAD.filter_parallel()). Из-за этого после каждого
+запуска часть решений может немного отличаться от VAD.filter() для всей аудиозаписи.
+
+Содержит функции follow_wav() и get_state_path().
+'''
+
+import os
+import json
+import webrtcvad
+
+from .wav_reader import WavReader
+from .smoothing import TriggerState, frames_to_seconds
+
+
+STATE_VERSION = 1
+
+
+def get_state_path(f_name_wav):
+    ''' Получить имя файла состояния по умолчанию для аудиозаписи: <имя аудиозаписи>.vad.json. '''
+
+    return f_name_wav + '.vad.json'
+
+
+def _read_state(f_name_state):
+    if not os.path.exists(f_name_state):
+        return None
+    with open(f_name_state, 'r', encoding='utf-8') as f_state:
+        try:
+            state = json.load(f_state)
+        except ValueError:
+            raise ValueError('[E] Некорректный файл состояния %s' % f_name_state)
+    if state.get('version') != STATE_VERSION:
+        return None
+    return state
+
+
+def _write_state(f_name_state, state):
+    ''' Сохранить состояние через временный файл, что бы при прерывании во время записи сохранилось предыдущее состояние. '''
+
+    f_name_temp = f_name_state + '.tmp'
+    with open(f_name_temp, 'w', encoding='utf-8') as f_state:
+        json.dump(state, f_state)
+    os.replace(f_name_temp, f_name_state)
+
+
+def _append_segments(f_name_output, output_size, filtered_segments):
+    ''' Дописать сегменты в выходной JSONL файл, предварительно удалив всё, что было записано после последнего сохранённого состояния
+    (если предыдущий запуск был прерван между записью сегментов и сохранением состояния).
+    1. возвращает новый размер выходного файла '''
+
+    with open(f_name_output, 'ab') as f_output:
+        f_output.truncate(output_size)
+        for segment in filtered_segments:
+            f_output.write(json.dumps({'start': segment[0], 'end': segment[1], 'is_speech': segment[2]}).encode('utf-8') + b'\n')
+        f_output.flush()
+        os.fsync(f_output.fileno())
+        return f_output.tell()
+
+
+def follow_wav(f_name_wav, f_name_state=None, f_name_output=None, sensitivity_mode=3, frame_duration_ms=10, padding_duration_ms=50,
+               threshold_voice_frames=0.9, warmup_duration_ms=3000, finish=False, frames_per_block=1000):
+    ''' Обработать аудиоданные, дописанные в .wav аудиозапись после предыдущего вызова, и вернуть закрытые за это время сегменты.
+    Последний (открытый) сегмент возвращается только после его закрытия или при finish=True.
+
+    Поддерживаются только .wav аудиозаписи PCM 16 бит, моно с частотой дискретизации 8, 16, 32 или 48кГц.
+
+    1. f_name_wav - имя .wav аудиозаписи
+    2. f_name_state - имя файла состояния (если None - <имя аудиозаписи>.vad.json)
+    3. f_name_output - имя выходного JSONL файла, в который дописываются новые сегменты, по одному JSON объекту на строку:
+       {"start": 0.0, "end": 1.23, "is_speech": true} (если None - сегменты только возвращаются)
+    4. sensitivity_mode - целое число от 0 до 3, чем больше - тем выше чувствительность
+    5. frame_duration_ms - длина фрейма в миллисекундах (поддерживается только 10, 20 и 30 мс)
+    6. padding_duration_ms - длина дополняемых спереди и сзади частей в миллисекундах
+    7. threshold_voice_frames - порог количества фреймов со звуком в окне
+    8. warmup_duration_ms - длина аудиоданных перед новыми аудиоданными, передаваемых WebRTC VAD для "разогрева", в миллисекундах
+    9. finish - True: аудиозапись завершена, дополнить неполный последний фрейм нулями и закрыть последний сегмент (после этого новые
+       вызовы не возвращают сегментов, пока аудиозапись не будет перезаписана)
+    10. frames_per_block - количество фреймов, читаемых из файла за один раз
+    11. возвращает список новых сегментов в формате VAD.filter() (границы в секундах от начала аудиозаписи) '''
+
+    if sensitivity_mode not in [0, 1, 2, 3]:
+        raise ValueError("[E] 'sensitivity_mode' для follow_wav() может быть только 0, 1, 2 и 3")
+
+    if frame_duration_ms not in [10, 20, 30]:
+        raise ValueError("[E] 'frame_duration_ms' может быть только 10, 20 и 30 миллисекунд")
+
+    if f_name_state is None:
+        f_name_state = get_state_path(f_name_wav)
+
+    with WavReader(f_name_wav) as wav_reader:
+        sample_rate, channels, data_offset, data_size = wav_reader.sample_rate, wav_reader.channels, wav_reader.data_offset, wav_reader.data_size
+    if channels != 1 or sample_rate not in [8000, 16000, 32000, 48000]:
+        raise ValueError("[E] follow_wav() поддерживает только моно .wav аудиозаписи с частотой дискретизации 8000, 16000, 32000 и 48000 Гц, "
+                         "'%s' имеет %i каналов и частоту дискретизации %i Гц" % (f_name_wav, channels, sample_rate))
+
+    params = {'sample_rate': sample_rate, 'data_offset': data_offset, 'sensitivity_mode': sensitivity_mode, 'frame_duration_ms': frame_duration_ms,
+              'padding_duration_ms': padding_duration_ms, 'threshold_voice_frames': threshold_voice_frames}
+    trigger_state = TriggerState(int(padding_duration_ms / frame_duration_ms), threshold_voice_frames)
+    state = _read_state(f_name_state)
+    if state is None or state['params'] != params or state['processed_bytes'] > data_size:
+        state = {'version': STATE_VERSION, 'params': params, 'processed_bytes': 0, 'finished': False, 'output_size': 0,
+                 'trigger_state': trigger_state.get_state()}
+    elif state['finished']:
+        return []
+    trigger_state.set_state(state['trigger_state'])
+
+    frame_width = int(sample_rate * frame_duration_ms / 1000) * 2
+    processed_bytes = state['processed_bytes']
+    end_byte = data_size if finish else data_size // frame_width * frame_width
+
+    vad = webrtcvad.Vad(sensitivity_mode)
+    filtered_segments = []
+    with open(f_name_wav, 'rb') as f_wav:
+        warmup_size = min(processed_bytes, int(warmup_duration_ms / frame_duration_ms) * frame_width)
+        f_wav.seek(data_offset + processed_bytes - warmup_size)
+        warmup_data = memoryview(f_wav.read(warmup_size))
+        for offset in range(0, len(warmup_data) - frame_width + 1, frame_width):
+            vad.is_speech(warmup_data[offset:offset + frame_width], sample_rate)
+
+        while processed_bytes < end_byte:
+            block = f_wav.read(min(frame_width * frames_per_block, end_byte - processed_bytes))
+            if not block:
+                break
+            if finish and len(block) % frame_width:
+                block += b'\x00' * (frame_width - len(block) % frame_width)
+            block = memoryview(block)
+            for offset in range(0, len(block) - frame_width + 1, frame_width):
+                segment = trigger_state.push(vad.is_speech(block[offset:offset + frame_width], sample_rate))
+                if segment is not None:
+                    filtered_segments.append(frames_to_seconds(segment, frame_duration_ms))
+            processed_bytes += len(block)
+
+    if finish:
+        segment = trigger_state.flush()
+        if segment is not None:
+            filtered_segments.append(frames_to_seconds(segment, frame_duration_ms))
+        state['finished'] = True
+
+    if f_name_output is not None:
+        state['output_size'] = _append_segments(f_name_output, state['output_size'], filtered_segments)
+    state['processed_bytes'] = min(processed_bytes, data_size)
+    state['trigger_state'] = trigger_state.get_state()
+    _write_state(f_name_state, state)
+    return filtered_segments
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Обработка датасета по манифесту (режим manifest интерфейса командной строки): список .wav аудиозаписей читается из манифеста JSONL
+или CSV, результаты VAD.filter() дописываются в выходной JSONL файл по одной записи на аудиозапись:
+    {"index": 0, "path": "data/1.wav", "segments": [[0.0, 1.23, true], ...], "error": null}
+Где index - номер аудиозаписи в манифесте (с 0), path - путь из манифеста, error - None или текст ошибки.
+
+Выходной файл одновременно является контрольной точкой: при повторном запуске аудиозаписи, для которых в нём уже есть запись без ошибки,
+не обрабатываются (аудиозаписи, при обработке которых была ошибка, обрабатываются повторно и для них дописывается новая запись), а неполная последняя строка (если обработка была прервана во время записи) удаляется. Манифест можно разделить на
+части для обработки на нескольких машинах (shard): часть i из N содержит аудиозаписи с index % N == i.
+
+Содержит функции process_manifest(), read_manifest(), read_completed() и parse_shard().
+'''
+
+import os
+import csv
+import json
+
+from .batch import filter_many, get_output_templates
+
+
+def read_manifest(f_name_manifest, column='path'):
+    ''' Прочитать список .wav аудиозаписей из манифеста. Относительные пути считаются относительно папки манифеста.
+    1. f_name_manifest - имя манифеста: .csv (с заголовком, путь в колонке column) или JSONL (по одному JSON объекту с полем column или
+       JSON строке с путём на строку, пустые строки пропускаются)
+    2. column - название колонки/поля с путём к .wav аудиозаписи
+    3. возвращает список кортежей (путь из манифеста, путь для открытия файла) '''
+
+    with open(f_name_manifest, 'r', encoding='utf-8', newline='') as f_manifest:
+        if f_name_manifest.lower().endswith('.csv'):
+            reader = csv.DictReader(f_manifest)
+            if reader.fieldnames is None or column not in reader.fieldnames:
+                raise ValueError("[E] В заголовке манифеста %s нет колонки '%s'" % (f_name_manifest, column))
+            paths = [row[column] for row in reader]
+        else:
+            paths = []
+            for line_number, line in enumerate(f_manifest, 1):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if isinstance(entry, dict):
+                    entry = entry.get(column)
+                if not isinstance(entry, str):
+                    raise ValueError("[E] В строке %i манифеста %s нет пути к аудиозаписи в поле '%s'" % (line_number, f_name_manifest, column))
+                paths.append(entry)
+
+    manifest_dir = os.path.dirname(os.path.abspath(f_name_manifest))
+    return [(path, os.path.join(manifest_dir, path)) for path in paths]
+
+
+def read_completed(f_name_output):
+    ''' Прочитать номера успешно обработанных аудиозаписей из выходного файла (записи с ошибкой не учитываются, что бы такие аудиозаписи
+    были обработаны повторно). Неполная последняя строка (обработка была прервана во время записи) удаляется из файла.
+    1. f_name_output - имя выходного JSONL файла (если не существует - возвращается пустое множество)
+    2. возвращает множество номеров аудиозаписей в манифесте '''
+
+    completed = set()
+    if not os.path.exists(f_name_output):
+        return completed
+
+    with open(f_name_output, 'rb+') as f_output:
+        valid_size = 0
+        for line_number, line in enumerate(f_output, 1):
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line.decode('utf-8'))
+                if record.get('error') is None:
+                    completed.add(record['index'])
+            except (ValueError, KeyError, TypeError):
+                raise ValueError('[E] Некорректная строка %i в выходном файле %s' % (line_number, f_name_output))
+            valid_size += len(line)
+        f_output.truncate(valid_size)
+    return completed
+
+
+def parse_shard(shard):
+    ''' Разобрать номер части манифеста в формате 'i/N' (i от 0 до N-1).
+    1. возвращает кортеж (i, N) '''
+
+    try:
+        shard_index, number_of_shards = [int(value) for value in shard.split('/')]
+    except ValueError:
+        raise ValueError("[E] 'shard' должен быть в формате i/N, например 0/4")
+    if number_of_shards < 1 or shard_index < 0 or shard_index >= number_of_shards:
+        raise ValueError("[E] Номер части 'shard' должен быть от 0 до %i" % (number_of_shards - 1))
+    return shard_index, number_of_shards
+
+
+def process_manifest(f_name_manifest, f_name_output, sensitivity_mode=3, workers=None, shard=(0, 1), output_dir=None, concatenate_segments=False,
+                     column='path', **filter_kwargs):
+    ''' Обработать аудиозаписи из манифеста в пуле процессов (через webrtcvad_wrapper.batch.filter_many()) и дописать результаты в выходной
+    файл. Уже обработанные аудиозаписи (есть в выходном файле запись без ошибки) пропускаются, поэтому прерванную обработку можно продолжить,
+    запустив её с теми же аргументами, аудиозаписи с ошибкой при этом обрабатываются повторно. Каждая запись сохраняется сразу после обработки аудиозаписи.
+
+    1. f_name_manifest - имя манифеста, подробнее в read_manifest()
+    2. f_name_output - имя выходного JSONL файла (создаётся, если не существует)
+    3. sensitivity_mode - целое число от 0 до 4, подробнее в VAD.set_mode()
+    4. workers - количество процессов (если None - по количеству ядер процессора, если 1 - обработка в текущем процессе без пула)
+    5. shard - кортеж (i, N): обрабатывать только аудиозаписи с номером в манифесте index % N == i
+    6. output_dir - папка для сохранения фрагментов с речью/звуком в формате <имя исходной аудиозаписи>_%i.wav с сохранением структуры
+       вложенных папок (если None - фрагменты не сохраняются)
+    7. concatenate_segments - True: сохранять фрагменты с речью/звуком каждой аудиозаписи одной аудиозаписью <имя исходной аудиозаписи>.wav
+    8. column - название колонки/поля манифеста с путём к .wav аудиозаписи
+    9. filter_kwargs - аргументы для VAD.filter() (frame_duration_ms, padding_duration_ms и т.д.)
+    10. возвращает генератор записей (словарей), дописанных в выходной файл, в порядке завершения обработки '''
+
+    shard_index, number_of_shards = shard
+    entries = read_manifest(f_name_manifest, column)
+    completed = read_completed(f_name_output)
+    indexes = [index for index in range(shard_index, len(entries), number_of_shards) if index not in completed]
+    if not indexes:
+        return
+
+    f_names_wav = [entries[index][1] for index in indexes]
+    f_names_output_templates = None
+    if output_dir is not None:
+        # Общая папка определяется по всему манифесту, что бы структура вложенных папок не зависела от shard
+        all_f_names_output_templates = get_output_templates([f_name_wav for _, f_name_wav in entries], output_dir)
+        f_names_output_templates = [all_f_names_output_templates[index] for index in indexes]
+
+    # filter_many() возвращает результаты в порядке завершения, поэтому номер в манифесте определяется по имени аудиозаписи
+    pending_indexes = {}
+    for index, f_name_wav in zip(indexes, f_names_wav):
+        pending_indexes.setdefault(f_name_wav, []).append(index)
+
+    with open(f_name_output, 'a', encoding='utf-8') as f_output:
+        for f_name_wav, filtered_segments, error in filter_many(f_names_wav, sensitivity_mode, workers, f_names_output_templates,
+                                                               concatenate_segments, **filter_kwargs):
+            index = pending_indexes[f_name_wav].pop(0)
+            record = {'index': index, 'path': entries[index][0], 'segments': filtered_segments, 'error': error}
+            f_output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f_output.flush()
+            yield record
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Получение решений WebRTC VAD для каждого канала многоканальной аудиозаписи PCM 16 бит за один проход (используется в
+VAD.filter_channels()): аудиоданные с чередующимися семплами каналов читаются блоками, каждый блок разделяется на каналы через
+представление NumPy с шагом (копируется только текущий блок, а не каналы целиком), и фреймы каждого канала передаются своему объекту
+webrtcvad.Vad. Результат для каждого канала совпадает с VAD.classify_frames() для этого канала, сохранённого отдельной моно аудиозаписью.
+
+Содержит функции classify_channels() и classify_channels_parallel().
+'''
+
+import os
+import concurrent.futures
+import webrtcvad
+import numpy as np
+
+from .webrtcvad_wrapper import FrameTable
+from .wav_reader import WavReader
+from .resampler import Resampler
+
+
+def _iter_blocks(audio, channels, sample_rate, frame_duration_ms, frames_per_block):
+    ''' Получить генератор блоков аудиоданных (массивы NumPy int16 с чередующимися семплами каналов) из байтовой строки или .wav
+    аудиозаписи (через WavReader.iter_blocks(), без загрузки в память целиком). '''
+
+    if isinstance(audio, str):
+        return WavReader(audio).iter_blocks(frame_duration_ms, frames_per_block)
+
+    samples = np.frombuffer(memoryview(audio).cast('B'), dtype=np.int16)
+    samples = samples[:len(samples) // channels * channels]
+    block_size = int(sample_rate * frame_duration_ms / 1000) * frames_per_block * channels
+    return (samples[start:start + block_size] for start in range(0, len(samples), block_size))
+
+
+def _classify_frames(vad, frames):
+    return np.fromiter((vad.is_speech(frame, frames.sample_rate) for frame in frames), dtype=bool, count=len(frames))
+
+
+def classify_channels(audio, channels, sample_rate, vad_sample_rate, frame_duration_ms=10, sensitivity_mode=3, channel_indexes=None,
+                      frames_per_block=1000):
+    ''' Получить решения WebRTC VAD для каждого фрейма каждого канала за один проход по аудиоданным.
+
+    Если sample_rate не равна vad_sample_rate, каждый канал приводится к vad_sample_rate потоковым полифазным фильтром
+    (webrtcvad_wrapper.resampler.Resampler) по мере чтения блоков. Неполный последний фрейм каждого канала дополняется нулями, как в VAD.filter().
+
+    1. audio - байтовая строка (или любой объект с поддержкой buffer protocol) с аудиоданными PCM 16 бит с чередующимися семплами каналов
+       (без заголовков wav) или имя .wav аудиозаписи PCM 16 бит
+    2. channels - количество каналов
+    3. sample_rate - частота дискретизации аудиоданных
+    4. vad_sample_rate - частота дискретизации для WebRTC VAD (поддерживается только 8, 16, 32 или 48кГц)
+    5. frame_duration_ms - длина фрейма в миллисекундах (поддерживается только 10, 20 и 30 мс)
+    6. sensitivity_mode - целое число от 0 до 3
+    7. channel_indexes - список номеров обрабатываемых каналов (с 0, если None - все каналы)
+    8. frames_per_block - количество фреймов в одном блоке (определяет размер используемой памяти)
+    9. возвращает список массивов NumPy из True/False (dtype=bool), по одному для каждого канала из channel_indexes '''
+
+    if channel_indexes is None:
+        channel_indexes = list(range(channels))
+    vads = [webrtcvad.Vad(sensitivity_mode) for _ in channel_indexes]
+    resamplers = None
+    if sample_rate != vad_sample_rate:
+        resamplers = [Resampler(sample_rate, vad_sample_rate) for _ in channel_indexes]
+    frame_length = int(vad_sample_rate * frame_duration_ms / 1000)
+
+    decisions = [[] for _ in channel_indexes]
+    remainders = [np.zeros(0, dtype=np.int16) for _ in channel_indexes]
+    for block in _iter_blocks(audio, channels, sample_rate, frame_duration_ms, frames_per_block):
+        # Представление блока в виде (семплы x каналы) без копирования, копируются только выбранные каналы этого блока
+        block_channels = np.ascontiguousarray(block.reshape(-1, channels)[:, channel_indexes].T)
+        for i, channel_data in enumerate(block_channels):
+            if resamplers is not None:
+                channel_data = resamplers[i].process(channel_data)
+            if len(remainders[i]) > 0:
+                channel_data = np.concatenate((remainders[i], channel_data))
+            num_full_samples = len(channel_data) // frame_length * frame_length
+            decisions[i].append(_classify_frames(vads[i], FrameTable(channel_data[:num_full_samples], vad_sample_rate, frame_duration_ms)))
+            remainders[i] = channel_data[num_full_samples:]
+
+    for i in range(len(channel_indexes)):
+        channel_data = remainders[i]
+        if resamplers is not None:
+            channel_data = np.concatenate((channel_data, resamplers[i].flush()))
+        decisions[i].append(_classify_frames(vads[i], FrameTable(channel_data, vad_sample_rate, frame_duration_ms)))
+    return [np.concatenate(channel_decisions) for channel_decisions in decisions]
+
+
+def classify_channels_parallel(audio, channels, sample_rate, vad_sample_rate, frame_duration_ms=10, sensitivity_mode=3, workers=1):
+    ''' То же, что classify_channels() для всех каналов, но каналы делятся между workers процессами (каждый процесс обрабатывает свои
+    каналы за один проход). Результат совпадает с classify_channels().
+
+    Если audio - имя .wav аудиозаписи, каждый процесс сам читает её блоками, иначе аудиоданные передаются в каждый процесс.
+
+    1. workers - количество процессов (если None - по количеству ядер процессора, но не больше количества каналов, если 1 - обработка
+       в текущем процессе)
+    2. остальные аргументы и возвращаемое значение аналогичны classify_channels() '''
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("[E] 'workers' должно быть больше 0")
+
+    workers = min(workers, channels)
+    if workers == 1:
+        return classify_channels(audio, channels, sample_rate, vad_sample_rate, frame_duration_ms, sensitivity_mode)
+
+    if not isinstance(audio, str):
+        audio = bytes(audio)
+    groups = [list(range(channels))[i::workers] for i in range(workers)]
+    decisions = [None] * channels
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(classify_channels, audio, channels, sample_rate, vad_sample_rate, frame_duration_ms, sensitivity_mode, group)
+                   for group in groups]
+        for group, future in zip(groups, futures):
+            for channel_index, channel_decisions in zip(group, future.result()):
+                decisions[channel_index] = channel_decisions
+    return decisions
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Параллельное получение решений WebRTC VAD для одной длинной аудиозаписи (используется в VAD.filter_parallel()).
+
+WebRTC VAD адаптирует внутреннюю модель (средние и дисперсии GMM для шума и речи) ко всей предшествующей аудиозаписи, и эта модель не
+сходится к одному и тому же состоянию у объекта webrtcvad.Vad, начавшего обработку с другого места аудиозаписи (даже через десятки секунд
+тишины отличаются средние и дисперсии GMM), а перенести её в другой процесс нельзя. Поэтому результат, точно совпадающий с
+последовательной обработкой (exact=True), можно получить только одним объектом webrtcvad.Vad, без разделения на части.
+
+Приближённый режим (exact=False): аудиозапись делится на части в самых тихих местах возле равных границ, каждая часть обрабатывается
+в отдельном процессе своим объектом webrtcvad.Vad (с "разогревом" на предшествующих аудиоданных), а решения на стыках частей сверяются
+в перекрытии: граница переносится на место, после которого решения соседних частей совпадают до конца перекрытия.
+
+Содержит функцию classify_frames_parallel().
+'''
+
+import os
+import concurrent.futures
+import webrtcvad
+import numpy as np
+
+from .webrtcvad_wrapper import FrameTable
+from .wav_reader import WavReader
+
+
+# Длина окна, по средней мощности в котором ищется самое тихое место для границы части, и максимальное смещение границы от равного
+# разделения (в миллисекундах)
+_SILENCE_WINDOW_MS = 1000
+_SPLIT_SEARCH_MS = 30000
+
+
+def _classify_bytes(audio_bytes, sample_rate, frame_duration_ms, sensitivity_mode, num_warmup_frames, sample_width=2):
+    ''' Получить решения WebRTC VAD для фреймов из audio_bytes, без первых num_warmup_frames фреймов. Неполный последний фрейм
+    дополняется нулями, как в VAD.filter(). '''
+
+    frames = FrameTable(audio_bytes, sample_rate, frame_duration_ms, sample_width)
+    vad = webrtcvad.Vad(sensitivity_mode)
+    decisions = np.fromiter((vad.is_speech(frame, sample_rate) for frame in frames), dtype=bool, count=len(frames))
+    return decisions[num_warmup_frames:]
+
+
+def _classify_wav_range(f_name_wav, start_byte, end_byte, sample_rate, frame_duration_ms, sensitivity_mode, num_warmup_frames):
+    ''' То же, что _classify_bytes(), но аудиоданные читаются процессом пула из .wav аудиозаписи (не передаются между процессами). '''
+
+    wav_reader = WavReader(f_name_wav)
+    with open(f_name_wav, 'rb') as f_wav:
+        f_wav.seek(wav_reader.data_offset + start_byte)
+        audio_bytes = f_wav.read(end_byte - start_byte)
+    return _classify_bytes(audio_bytes, sample_rate, frame_duration_ms, sensitivity_mode, num_warmup_frames)
+
+
+def _find_quiet_frame(samples, frame_samples, first_frame, last_frame, num_window_frames):
+    ''' Найти начало самого тихого окна из num_window_frames фреймов между фреймами first_frame и last_frame (по средней мощности
+    семплов). Читаются только семплы этого участка, поэтому для np.memmap поиск не загружает аудиозапись целиком.
+    1. возвращает номер фрейма в середине самого тихого окна '''
+
+    region = np.asarray(samples[first_frame * frame_samples:last_frame * frame_samples], dtype=np.float64)
+    num_region_frames = len(region) // frame_samples
+    if num_region_frames <= num_window_frames:
+        return (first_frame + last_frame) // 2
+    frame_powers = (region[:num_region_frames * frame_samples].reshape(-1, frame_samples) ** 2).sum(axis=1)
+    window_powers = np.convolve(frame_powers, np.ones(num_window_frames), mode='valid')
+    return first_frame + int(np.argmin(window_powers)) + num_window_frames // 2
+
+
+def _get_borders(samples, num_frames, workers, frame_samples, frame_duration_ms):
+    ''' Получить границы частей (номера фреймов): каждая граница переносится в самое тихое место в пределах _SPLIT_SEARCH_MS от
+    равного разделения. Если семплы недоступны (sample_width != 2), используется равное разделение. '''
+
+    borders = [num_frames * i // workers for i in range(workers + 1)]
+    if samples is None:
+        return borders
+    num_search_frames = int(_SPLIT_SEARCH_MS / frame_duration_ms)
+    num_window_frames = int(_SILENCE_WINDOW_MS / frame_duration_ms)
+    for i in range(1, workers):
+        first_frame = max(borders[i] - num_search_frames, borders[i - 1] + 1)
+        last_frame = min(borders[i] + num_search_frames, num_frames * (i + 1) // workers - 1)
+        borders[i] = _find_quiet_frame(samples, frame_samples, first_frame, last_frame, num_window_frames)
+    return borders
+
+
+def _stitch_decisions(chunks, borders):
+    ''' Объединить решения частей. Каждая часть, кроме последней, содержит решения и для перекрытия после своей границы. В перекрытии
+    граница переносится на фрейм, после которого решения обеих частей совпадают до конца перекрытия (если они не совпадают и на последнем
+    фрейме перекрытия - граница переносится в конец перекрытия). '''
+
+    decisions = chunks[0]
+    for chunk, border in zip(chunks[1:], borders[1:-1]):
+        num_overlap_frames = len(decisions) - border
+        mismatches = np.nonzero(decisions[border:] != chunk[:num_overlap_frames])[0]
+        moved_border = border + (int(mismatches[-1]) + 1 if len(mismatches) > 0 else 0)
+        decisions = np.concatenate([decisions[:moved_border], chunk[moved_border - border:]])
+    return decisions
+
+
+def classify_frames_parallel(audio, sample_rate, frame_duration_ms=10, sensitivity_mode=3, workers=None, warmup_duration_ms=3000,
+                             sample_width=2, exact=True):
+    ''' Получить решения WebRTC VAD для каждого фрейма длинной аудиозаписи.
+
+    При exact=True решения совпадают с последовательной обработкой (VAD.filter()): аудиозапись обрабатывается одним объектом
+    webrtcvad.Vad в текущем процессе (подробнее в описании модуля), workers не используется.
+
+    При exact=False аудиозапись делится на workers частей в самых тихих местах возле равных границ, и части обрабатываются в пуле
+    процессов. Каждой части сначала передаются warmup_duration_ms предшествующих аудиоданных (их решения отбрасываются), а каждая часть,
+    кроме последней, обрабатывает ещё warmup_duration_ms аудиоданных после своей границы: в этом перекрытии граница переносится туда,
+    где решения соседних частей совпадают (подробнее в _stitch_decisions()).
+
+    ВНИМАНИЕ! При exact=False результат не совпадает точно с последовательной обработкой: на тестовых аудиозаписях длиной 10 минут при
+    4-16 частях отличались решения для 1-4% фреймов, в основном возле границ речи/тишины. Совпадение решений в перекрытии не гарантирует
+    совпадения после него, так как внутренние модели WebRTC VAD обеих частей остаются разными.
+
+    1. audio - байтовая строка (или любой объект с поддержкой buffer protocol) с аудиоданными (без заголовков wav) или имя .wav
+       аудиозаписи PCM 16 бит, моно (тогда каждый процесс сам читает свою часть из файла)
+    2. sample_rate - частота дискретизации (поддерживается только 8, 16, 32 или 48кГц)
+    3. frame_duration_ms - длина фрейма в миллисекундах (поддерживается только 10, 20 и 30 мс)
+    4. sensitivity_mode - целое число от 0 до 3
+    5. workers - количество процессов и частей при exact=False (если None - по количеству ядер процессора, если 1 - обработка в текущем
+       процессе)
+    6. warmup_duration_ms - длина перекрытия частей до и после границы в миллисекундах (только при exact=False)
+    7. sample_width - ширина семпла в байтах
+    8. exact - True: результат совпадает с последовательной обработкой, False: приближённая обработка частей в пуле процессов
+    9. возвращает массив NumPy из True/False (dtype=bool) длиной в количество фреймов '''
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("[E] 'workers' должно быть больше 0")
+
+    frame_width = int(sample_rate * (frame_duration_ms / 1000.0) * sample_width)
+    if isinstance(audio, str):
+        wav_reader = WavReader(audio)
+        data_size = wav_reader.num_samples * sample_width
+    else:
+        audio = memoryview(audio).cast('B')
+        data_size = len(audio)
+    num_frames = -(-data_size // frame_width)
+    num_warmup_frames = int(warmup_duration_ms / frame_duration_ms)
+
+    workers = max(min(workers, num_frames), 1)
+    if exact or workers == 1:
+        if isinstance(audio, str):
+            return _classify_wav_range(audio, 0, data_size, sample_rate, frame_duration_ms, sensitivity_mode, 0)
+        return _classify_bytes(audio, sample_rate, frame_duration_ms, sensitivity_mode, 0, sample_width)
+
+    samples = None
+    if sample_width == 2:
+        samples = wav_reader.samples if isinstance(audio, str) else np.frombuffer(audio, dtype='<i2', count=data_size // 2)
+    borders = _get_borders(samples, num_frames, workers, frame_width // sample_width, frame_duration_ms)
+    tasks = []
+    for first_frame, last_frame in zip(borders[:-1], borders[1:]):
+        first_warmup_frame = max(first_frame - num_warmup_frames, 0)
+        tasks.append((first_warmup_frame * frame_width, min((last_frame + num_warmup_frames) * frame_width, data_size),
+                      first_frame - first_warmup_frame))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        if isinstance(audio, str):
+            futures = [executor.submit(_classify_wav_range, audio, start_byte, end_byte, sample_rate, frame_duration_ms, sensitivity_mode,
+                                       num_task_warmup_frames) for start_byte, end_byte, num_task_warmup_frames in tasks]
+        else:
+            futures = [executor.submit(_classify_bytes, audio[start_byte:end_byte].tobytes(), sample_rate, frame_duration_ms, sensitivity_mode,
+                                       num_task_warmup_frames, sample_width) for start_byte, end_byte, num_task_warmup_frames in tasks]
+        return _stitch_decisions([future.result() for future in futures], borders)
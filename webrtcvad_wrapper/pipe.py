@@ -0,0 +1,213 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Фильтрация потока аудиоданных (режим pipe интерфейса командной строки): аудиоданные PCM 16 бит, моно читаются из входного потока
+(например, stdin) частями по мере поступления и обрабатываются через StreamingVAD, а найденные сегменты записываются в выходной поток
+(например, stdout) сразу после их закрытия, по одному JSON объекту на строку (как в режиме сервера, webrtcvad_wrapper/server.py):
+    {"event": "segment", "start": 0.0, "end": 1.23, "is_speech": true}
+    {"event": "end"} - после конца входного потока и всех сегментов
+Вместо сегментов в выходной поток можно записывать только аудиоданные с речью/звуком (аудиозапись без тишины, PCM 16 бит без заголовков
+с исходной частотой дискретизации).
+
+Входной поток может содержать аудиоданные без заголовков или .wav аудиозапись (определяется по заголовку RIFF/WAVE, размер блока data
+не используется, аудиоданные читаются до конца потока). Используемая память не зависит от длины потока.
+
+Содержит функции filter_stream() и read_wav_header().
+'''
+
+import json
+import struct
+import numpy as np
+
+from .streaming import StreamingVAD
+from .resampler import Resampler, align_sample_rate
+from .wav_reader import WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE
+
+
+def _read_exactly(input_stream, size):
+    ''' Прочитать из потока size байт (меньше - только если поток закончился). '''
+
+    data = b''
+    while len(data) < size:
+        chunk = input_stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def read_wav_header(input_stream):
+    ''' Прочитать заголовок .wav аудиозаписи из начала потока (до начала аудиоданных блока data). Поддерживаются только аудиоданные
+    PCM 16 бит, моно.
+    1. input_stream - бинарный поток, открытый для чтения
+    2. возвращает кортеж (sample_rate, head), где sample_rate - частота дискретизации из заголовка (None, если поток не начинается
+       с заголовка RIFF/WAVE), head - уже прочитанное из потока начало аудиоданных (b'', если заголовок есть) '''
+
+    head = _read_exactly(input_stream, 12)
+    if len(head) < 12 or head[:4] != b'RIFF' or head[8:12] != b'WAVE':
+        return None, head
+
+    format_tag = None
+    while True:
+        chunk_header = _read_exactly(input_stream, 8)
+        if len(chunk_header) < 8:
+            raise ValueError('[E] Во входном потоке не найден блок с аудиоданными')
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+        if chunk_id == b'data':
+            if format_tag is None:
+                raise ValueError('[E] Во входном потоке блок fmt должен находиться перед блоком data')
+            if format_tag != WAVE_FORMAT_PCM or sample_width != 2 or channels != 1:
+                raise ValueError('[E] Поддерживаются только .wav аудиоданные PCM 16 бит, моно, входной поток имеет формат %i, ширину семпла %i '
+                                 'байт и %i каналов' % (format_tag, sample_width, channels))
+            return sample_rate, b''
+
+        chunk = _read_exactly(input_stream, chunk_size + chunk_size % 2)
+        if chunk_id == b'fmt ':
+            if len(chunk) < 16:
+                raise ValueError('[E] Во входном потоке блок fmt повреждён или обрезан (%i байт вместо минимум 16)' % len(chunk))
+            format_tag, channels, sample_rate, _, _, bits_per_sample = struct.unpack('<HHIIHH', chunk[:16])
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(chunk) >= 26:
+                format_tag = struct.unpack('<H', chunk[24:26])[0]
+            sample_width = (bits_per_sample + 7) // 8
+
+
+def _write_events(output_stream, filtered_segments):
+    for segment in filtered_segments:
+        event = {'event': 'segment', 'start': segment[0], 'end': segment[1], 'is_speech': segment[2]}
+        output_stream.write(json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n')
+    output_stream.flush()
+
+
+class _SpeechWriter:
+    ''' Запись в выходной поток только аудиоданных с речью/звуком. Хранит исходные аудиоданные начиная с первого семпла, который ещё может
+    войти в сегмент с речью/звуком: во время тишины - не больше длины окна сглаживания, во время речи/звука фреймы, которые уже не могут
+    перейти в следующий сегмент, записываются сразу, не дожидаясь закрытия сегмента. '''
+
+    def __init__(self, output_stream, stream_vad, sample_rate):
+        self.output_stream = output_stream
+        self.stream_vad = stream_vad
+        self.sample_rate = sample_rate
+        self.buffer = bytearray()
+        # Номер семпла, с которого начинается buffer, и номер фрейма, до которого аудиоданные уже записаны
+        self.buffer_start = 0
+        self.written_frame = 0
+
+
+    def push(self, chunk, filtered_segments):
+        self.buffer += chunk
+        self.__write_segments(filtered_segments)
+
+        # При смене состояния новый сегмент начинается не раньше, чем за num_padding_frames - 1 фреймов до текущего (подробнее
+        # в TriggerState.__switch()), поэтому более ранние фреймы уже не перейдут в другой сегмент
+        trigger_state = self.stream_vad.trigger_state
+        num_frames = trigger_state.segment_start + trigger_state.segment_length
+        committed_frame = min(max(num_frames - trigger_state.num_padding_frames + 1, 0), num_frames)
+        if trigger_state.triggered:
+            self.__write_frames(trigger_state.segment_start, committed_frame)
+            self.__discard(max(self.written_frame, trigger_state.segment_start))
+        else:
+            self.__discard(max(self.written_frame, committed_frame))
+
+
+    def finish(self, filtered_segments):
+        self.__write_segments(filtered_segments)
+
+
+    def __write_segments(self, filtered_segments):
+        frame_duration_s = self.stream_vad.frame_duration_ms / 1000
+        for segment in filtered_segments:
+            if segment[2]:
+                # Границы сегментов StreamingVAD кратны длине фрейма и округлены до 0.01 секунды, поэтому номер фрейма восстанавливается точно
+                self.__write_frames(int(round(segment[0] / frame_duration_s)), int(round(segment[1] / frame_duration_s)))
+
+
+    def __frame_to_sample(self, frame):
+        return frame * self.stream_vad.frame_duration_ms * self.sample_rate // 1000
+
+
+    def __write_frames(self, start_frame, end_frame):
+        start_frame = max(start_frame, self.written_frame)
+        if end_frame <= start_frame:
+            return
+        start = (self.__frame_to_sample(start_frame) - self.buffer_start) * 2
+        end = (self.__frame_to_sample(end_frame) - self.buffer_start) * 2
+        self.output_stream.write(self.buffer[start:end])
+        self.output_stream.flush()
+        self.written_frame = end_frame
+
+
+    def __discard(self, frame):
+        sample = self.__frame_to_sample(frame)
+        if sample > self.buffer_start:
+            del self.buffer[:(sample - self.buffer_start) * 2]
+            self.buffer_start = sample
+
+
+def filter_stream(input_stream, output_stream, sample_rate=16000, sensitivity_mode=3, frame_duration_ms=10, padding_duration_ms=50,
+                  threshold_voice_frames=0.9, speech_only_pcm=False, chunk_size=65536):
+    ''' Отфильтровать поток аудиоданных по наличию речи/звука и записывать результат в выходной поток по мере закрытия сегментов.
+    Сегменты совпадают с результатом VAD.filter() для тех же аудиоданных (при sensitivity_mode=0..3, для неподдерживаемой частоты
+    дискретизации - с VAD.resample_method='polyphase').
+
+    1. input_stream - бинарный поток для чтения с аудиоданными PCM 16 бит, моно без заголовков или .wav аудиозаписью (например, sys.stdin.buffer)
+    2. output_stream - бинарный поток для записи (например, sys.stdout.buffer), после каждой записи вызывается flush()
+    3. sample_rate - частота дискретизации аудиоданных без заголовков (для .wav аудиозаписи берётся из заголовка). Неподдерживаемая
+       WebRTC VAD частота дискретизации приводится к ближайшей поддерживаемой потоково через webrtcvad_wrapper.resampler.Resampler
+    4. sensitivity_mode - целое число от 0 до 3, чем больше - тем выше чувствительность
+    5. frame_duration_ms - длина фрейма в миллисекундах (поддерживается только 10, 20 и 30 мс)
+    6. padding_duration_ms - длина дополняемых спереди и сзади частей в миллисекундах
+    7. threshold_voice_frames - порог количества фреймов со звуком в окне
+    8. speech_only_pcm - True: записывать в выходной поток вместо событий JSON только аудиоданные с речью/звуком (PCM 16 бит без заголовков
+       с исходной частотой дискретизации)
+    9. chunk_size - максимальный размер части, читаемой из входного потока за один раз, в байтах
+    10. возвращает количество найденных сегментов с речью/звуком '''
+
+    wav_sample_rate, head = read_wav_header(input_stream)
+    if wav_sample_rate is not None:
+        sample_rate = wav_sample_rate
+
+    vad_sample_rate = sample_rate
+    resampler = None
+    if sample_rate not in [8000, 16000, 32000, 48000]:
+        vad_sample_rate = align_sample_rate(sample_rate)
+        resampler = Resampler(sample_rate, vad_sample_rate)
+
+    stream_vad = StreamingVAD(sensitivity_mode, vad_sample_rate, frame_duration_ms, padding_duration_ms, threshold_voice_frames)
+    speech_writer = _SpeechWriter(output_stream, stream_vad, sample_rate) if speech_only_pcm else None
+    number_of_speech_segments = 0
+
+    # read1() возвращает уже доступные аудиоданные, не дожидаясь заполнения всей части
+    read = getattr(input_stream, 'read1', input_stream.read)
+    incomplete_sample = b''
+    chunk = head
+    while True:
+        if chunk:
+            vad_chunk = chunk
+            if resampler is not None:
+                vad_chunk = incomplete_sample + chunk
+                incomplete_sample = vad_chunk[len(vad_chunk) // 2 * 2:]
+                vad_chunk = resampler.process(np.frombuffer(vad_chunk, dtype='<i2', count=len(vad_chunk) // 2))
+            filtered_segments = stream_vad.push(vad_chunk)
+            number_of_speech_segments += sum(segment[2] for segment in filtered_segments)
+            if speech_writer is not None:
+                speech_writer.push(chunk, filtered_segments)
+            else:
+                _write_events(output_stream, filtered_segments)
+
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+
+    filtered_segments = stream_vad.push(resampler.flush()) if resampler is not None else []
+    filtered_segments += stream_vad.flush()
+    number_of_speech_segments += sum(segment[2] for segment in filtered_segments)
+    if speech_writer is not None:
+        speech_writer.finish(filtered_segments)
+    else:
+        _write_events(output_stream, filtered_segments)
+        output_stream.write(b'{"event": "end"}\n')
+        output_stream.flush()
+    return number_of_speech_segments
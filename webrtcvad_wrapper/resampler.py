@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Потоковое изменение частоты дискретизации (полифазный FIR фильтр с рациональным коэффициентом up/down).
+
+Содержит класс Resampler и функции resample() и align_sample_rate(). Коэффициенты фильтра вычисляются один раз для каждой пары частот дискретизации и кэшируются.
+'''
+
+import math
+import functools
+import numpy as np
+
+
+# Количество пересечений нуля sinc-функции с каждой стороны от центра фильтра (определяет качество и количество коэффициентов)
+ZERO_CROSSINGS = 16
+# Параметр окна Кайзера
+KAISER_BETA = 8.6
+# Частота среза относительно частоты Найквиста меньшей из частот дискретизации
+ROLLOFF = 0.94
+
+
+def align_sample_rate(source_sample_rate):
+    ''' Приведение частоты дискретизации к ближайшей из поддерживаемых WebRTC VAD: 8, 16, 32 или 48кГц.
+    1. source_sample_rate - исходная частота дискретизации в Гц
+    2. возвращает исправленную частоту дискретизации '''
+
+    if source_sample_rate > 48000:
+        sample_rate = 48000
+    elif source_sample_rate > 32000 and source_sample_rate < 48000:
+        sample_rate = 32000
+    elif source_sample_rate > 16000 and source_sample_rate < 32000:
+        sample_rate = 16000
+    else:
+        sample_rate = 8000
+    return sample_rate
+
+
+@functools.lru_cache(maxsize=None)
+def get_polyphase_filter(source_sample_rate, target_sample_rate):
+    ''' Вычислить коэффициенты полифазного фильтра для пары частот дискретизации (результат кэшируется).
+    1. source_sample_rate - исходная частота дискретизации
+    2. target_sample_rate - требуемая частота дискретизации
+    3. возвращает кортеж (up, down, filters, delay), где:
+        up, down - коэффициенты увеличения и уменьшения частоты дискретизации (target_sample_rate / source_sample_rate = up / down)
+        filters - массив NumPy (up x taps) с коэффициентами фильтра для каждой фазы, в обратном порядке (для умножения на семплы по возрастанию)
+        delay - задержка фильтра в семплах с увеличенной частотой дискретизации '''
+
+    gcd = math.gcd(source_sample_rate, target_sample_rate)
+    up = target_sample_rate // gcd
+    down = source_sample_rate // gcd
+
+    max_factor = max(up, down)
+    delay = ZERO_CROSSINGS * max_factor
+    length = 2 * delay + 1
+    # Фильтр нижних частот с окном Кайзера, работающий на частоте source_sample_rate * up
+    cutoff = ROLLOFF / max_factor
+    time = np.arange(length) - delay
+    prototype = cutoff * np.sinc(cutoff * time) * np.kaiser(length, KAISER_BETA) * up
+
+    # Разбиение на фазы: фаза p использует коэффициенты p, p + up, p + 2*up, ...
+    taps = -(-length // up)
+    prototype = np.concatenate((prototype, np.zeros(taps * up - length)))
+    filters = prototype.reshape(taps, up).T[:, ::-1].copy()
+    filters.setflags(write=False)
+    return up, down, filters, delay
+
+
+class Resampler:
+    ''' Потоковое изменение частоты дискретизации моно аудиоданных int16. Аудиоданные передаются блоками произвольной длины, между
+    вызовами хранятся последние семплы, необходимые фильтру, и номер следующего выходного семпла, поэтому результат не зависит от
+    разбиения на блоки и совпадает с resample() для всей аудиозаписи.
+
+    1. source_sample_rate - исходная частота дискретизации
+    2. target_sample_rate - требуемая частота дискретизации '''
+
+    def __init__(self, source_sample_rate, target_sample_rate):
+        self.source_sample_rate = source_sample_rate
+        self.target_sample_rate = target_sample_rate
+        self.up, self.down, self.filters, self.delay = get_polyphase_filter(source_sample_rate, target_sample_rate)
+        self.taps = self.filters.shape[1]
+        self.reset()
+
+
+    def reset(self):
+        ''' Сброс состояния для обработки новой аудиозаписи. '''
+
+        # Семплы до начала аудиозаписи считаются нулевыми. history[0] соответствует входному семплу с номером history_start
+        self.history = np.zeros(self.taps - 1, dtype=np.float64)
+        self.history_start = -(self.taps - 1)
+        self.num_input_samples = 0
+        self.num_output_samples = 0
+
+
+    def process(self, audio_data):
+        ''' Обработать очередной блок аудиоданных.
+        1. audio_data - массив NumPy int16 (или байтовая строка с аудиоданными PCM 16 бит)
+        2. возвращает массив NumPy int16 с аудиоданными в новой частоте дискретизации (длина может отличаться от пропорциональной,
+           оставшиеся семплы будут возвращены при следующих вызовах или в flush()) '''
+
+        if not isinstance(audio_data, np.ndarray):
+            audio_data = np.frombuffer(audio_data, dtype=np.int16)
+        self.history = np.concatenate((self.history, audio_data))
+        self.num_input_samples += len(audio_data)
+        return self.__process(self.history_start + len(self.history))
+
+
+    def flush(self):
+        ''' Завершить поток: вернуть оставшиеся выходные семплы (всего ceil(количество входных семплов * up / down)) и сбросить состояние.
+        1. возвращает массив NumPy int16 '''
+
+        total_output_samples = -(-self.num_input_samples * self.up // self.down)
+        # Для последних выходных семплов фильтру нужны семплы после конца аудиозаписи, они считаются нулевыми
+        self.history = np.concatenate((self.history, np.zeros(self.delay // self.up + self.taps, dtype=np.float64)))
+        resampled = self.__process(self.history_start + len(self.history), total_output_samples)
+        self.reset()
+        return resampled
+
+
+    def __process(self, available_samples, max_output_samples=None):
+        ''' Вычислить все выходные семплы, для которых уже достаточно входных данных.
+        1. available_samples - номер входного семпла, следующего за последним доступным
+        2. max_output_samples - ограничение общего количества выходных семплов (используется в flush()) '''
+
+        # Выходной семпл m соответствует семплу m*down + delay с увеличенной частотой дискретизации, ему нужны входные семплы до n = (m*down + delay) // up
+        num_outputs = (available_samples * self.up - self.delay - 1) // self.down + 1 - self.num_output_samples
+        if max_output_samples is not None:
+            num_outputs = min(num_outputs, max_output_samples - self.num_output_samples)
+        num_outputs = max(num_outputs, 0)
+
+        # Выходные семплы m, m + up, m + 2*up, ... используют одну и ту же фазу фильтра, а их входные окна сдвинуты ровно на down семплов.
+        # Поэтому history представляется без копирования в виде строк длиной down + taps с шагом down, окна каждой фазы получаются
+        # срезом этого представления и умножаются на коэффициенты фазы одной операцией
+        values = np.empty(num_outputs, dtype=np.float64)
+        if num_outputs > 0:
+            history = np.concatenate((self.history, np.zeros(self.down + self.taps, dtype=np.float64)))
+            rows = np.lib.stride_tricks.as_strided(history, shape=((len(self.history) - 1) // self.down + 1, self.down + self.taps),
+                                                   strides=(self.down * history.strides[0], history.strides[0]), writeable=False)
+        for i in range(min(self.up, num_outputs)):
+            position = (self.num_output_samples + i) * self.down + self.delay
+            first_row, shift = divmod(position // self.up - self.taps + 1 - self.history_start, self.down)
+            windows = rows[first_row:first_row + len(range(i, num_outputs, self.up)), shift:shift + self.taps]
+            values[i::self.up] = windows @ self.filters[position % self.up]
+        resampled = np.clip(np.rint(values), -32768, 32767).astype(np.int16)
+        self.num_output_samples += num_outputs
+
+        # Удаление семплов, которые больше не понадобятся фильтру
+        next_first_input = (self.num_output_samples * self.down + self.delay) // self.up - self.taps + 1
+        next_first_input = min(next_first_input, self.history_start + len(self.history))
+        if next_first_input > self.history_start:
+            self.history = self.history[next_first_input - self.history_start:]
+            self.history_start = next_first_input
+        return resampled
+
+
+def resample(audio_data, source_sample_rate, target_sample_rate):
+    ''' Изменить частоту дискретизации всей аудиозаписи.
+    1. audio_data - массив NumPy int16 (или байтовая строка с аудиоданными PCM 16 бит)
+    2. source_sample_rate - исходная частота дискретизации
+    3. target_sample_rate - требуемая частота дискретизации
+    4. возвращает массив NumPy int16 '''
+
+    resampler = Resampler(source_sample_rate, target_sample_rate)
+    return np.concatenate((resampler.process(audio_data), resampler.flush()))
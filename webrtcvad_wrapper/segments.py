@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Компактное представление результата фильтрации: границы сегментов в семплах исходной аудиозаписи (без округления до 0.01 секунды).
+
+Содержит класс SegmentTable.
+'''
+
+import numpy as np
+
+
+SEGMENT_DTYPE = np.dtype([('start', np.int64), ('end', np.int64), ('is_speech', np.bool_)])
+
+
+class SegmentTable:
+    ''' Таблица сегментов в виде структурированного массива NumPy с полями start, end (номера семплов в исходной аудиозаписи, end не
+    включается) и is_speech (True: речь/звук, False: тишина). В отличие от списка [[0.00, 1.23, True/False], ...] не создаёт объект
+    Python на каждый сегмент и хранит точные границы, поэтому по ним можно получать участки исходных аудиоданных без копирования.
+
+    Поддерживает len(), индексацию (по номеру - кортеж (start, end, is_speech), по срезу или маске - новый SegmentTable) и итерацию.
+
+    1. data - структурированный массив NumPy с типом SEGMENT_DTYPE
+    2. sample_rate - частота дискретизации исходной аудиозаписи
+
+    Пример использования:
+        segment_table = vad.filter(audio, as_table=True)
+        for audio_segment in segment_table.speech().iter_slices(audio):
+            ... # audio_segment - memoryview на аудиоданные сегмента с речью/звуком '''
+
+    __slots__ = ('data', 'sample_rate')
+    def __init__(self, data, sample_rate):
+        if data.dtype != SEGMENT_DTYPE:
+            raise ValueError("[E] 'data' должен иметь тип SEGMENT_DTYPE")
+        self.data = data
+        self.sample_rate = sample_rate
+
+
+    @classmethod
+    def from_frames(cls, frame_segments, frame_duration_ms, sample_rate, num_samples):
+        ''' Создать таблицу из сегментов с границами в номерах фреймов (результат webrtcvad_wrapper.smoothing.smooth()).
+        1. frame_segments - список сегментов [start_frame, end_frame, True/False]
+        2. frame_duration_ms - длина фрейма в миллисекундах
+        3. sample_rate - частота дискретизации исходной аудиозаписи
+        4. num_samples - количество семплов в исходной аудиозаписи (конец последнего сегмента не может быть больше)
+        5. возвращает объект SegmentTable '''
+
+        data = np.zeros(len(frame_segments), dtype=SEGMENT_DTYPE)
+        if len(frame_segments) > 0:
+            start_frames, end_frames, is_speech = zip(*frame_segments)
+            # Целочисленное вычисление: граница не зависит от накопленной ошибки округления и от того, целая ли длина фрейма в семплах
+            data['start'] = np.minimum(np.array(start_frames, dtype=np.int64) * frame_duration_ms * sample_rate // 1000, num_samples)
+            data['end'] = np.minimum(np.array(end_frames, dtype=np.int64) * frame_duration_ms * sample_rate // 1000, num_samples)
+            data['is_speech'] = is_speech
+        return cls(data, sample_rate)
+
+
+    @classmethod
+    def from_speech_borders(cls, start_samples, end_samples, sample_rate, num_samples):
+        ''' Создать таблицу из границ сегментов с речью/звуком, дополнив их сегментами с тишиной до полного покрытия аудиозаписи.
+        1. start_samples - массив NumPy с номерами первых семплов сегментов с речью/звуком (по возрастанию)
+        2. end_samples - массив NumPy с номерами семплов, следующих за последними семплами сегментов с речью/звуком
+        3. sample_rate - частота дискретизации
+        4. num_samples - количество семплов в аудиозаписи
+        5. возвращает объект SegmentTable '''
+
+        if len(start_samples) == 0:
+            data = np.zeros(1, dtype=SEGMENT_DTYPE)
+            data[0] = (0, num_samples, False)
+            return cls(data, sample_rate)
+
+        # Сегменты с речью/звуком на чётных позициях, между ними - сегменты с тишиной
+        borders = np.empty(2 * len(start_samples) + 2, dtype=np.int64)
+        borders[0] = 0
+        borders[1:-1:2] = start_samples
+        borders[2:-1:2] = end_samples
+        borders[-1] = num_samples
+        is_speech = np.zeros(len(borders) - 1, dtype=bool)
+        is_speech[1::2] = True
+
+        # Сегменты с тишиной нулевой длины в начале и конце не добавляются
+        keep = np.ones(len(is_speech), dtype=bool)
+        keep[0] = borders[1] > 0
+        keep[-1] = borders[-2] < num_samples
+
+        data = np.zeros(np.count_nonzero(keep), dtype=SEGMENT_DTYPE)
+        data['start'] = borders[:-1][keep]
+        data['end'] = borders[1:][keep]
+        data['is_speech'] = is_speech[keep]
+        return cls(data, sample_rate)
+
+
+    def __len__(self):
+        return len(self.data)
+
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            segment = self.data[index]
+            return int(segment['start']), int(segment['end']), bool(segment['is_speech'])
+        return SegmentTable(self.data[index], self.sample_rate)
+
+
+    def __iter__(self):
+        return iter(zip(self.data['start'].tolist(), self.data['end'].tolist(), self.data['is_speech'].tolist()))
+
+
+    def __repr__(self):
+        return 'SegmentTable(%i сегментов, sample_rate=%i)' % (len(self.data), self.sample_rate)
+
+
+    @property
+    def starts(self):
+        return self.data['start']
+
+
+    @property
+    def ends(self):
+        return self.data['end']
+
+
+    @property
+    def is_speech(self):
+        return self.data['is_speech']
+
+
+    def speech(self):
+        ''' Получить таблицу только с сегментами с речью/звуком. '''
+
+        return SegmentTable(self.data[self.data['is_speech']], self.sample_rate)
+
+
+    def to_list(self):
+        ''' Перевести таблицу в список из списков в формате VAD.filter(): [[0.00, 1.23, True/False], ...] (границы в секундах, округлены
+        до 0.01 секунды). '''
+
+        starts = np.round(self.data['start'] / self.sample_rate, 2).tolist()
+        ends = np.round(self.data['end'] / self.sample_rate, 2).tolist()
+        return [list(segment) for segment in zip(starts, ends, self.data['is_speech'].tolist())]
+
+
+    def slice(self, audio, index, sample_width=2):
+        ''' Получить аудиоданные одного сегмента без копирования.
+        1. audio - байтовая строка (или любой объект с поддержкой buffer protocol, или объект pydub.AudioSegment) с исходными аудиоданными
+        2. index - номер сегмента
+        3. sample_width - ширина семпла в байтах
+        4. возвращает memoryview на аудиоданные сегмента '''
+
+        start, end, _ = self[index]
+        return _as_bytes(audio)[start * sample_width:end * sample_width]
+
+
+    def iter_slices(self, audio, sample_width=2):
+        ''' Последовательно получить аудиоданные всех сегментов таблицы без копирования (для сегментов только с речью/звуком
+        используйте speech().iter_slices()).
+        1. audio - байтовая строка (или любой объект с поддержкой buffer protocol, или объект pydub.AudioSegment) с исходными аудиоданными
+        2. sample_width - ширина семпла в байтах
+        3. возвращает генератор memoryview на аудиоданные сегментов '''
+
+        audio_bytes = _as_bytes(audio)
+        for start, end in zip(self.data['start'].tolist(), self.data['end'].tolist()):
+            yield audio_bytes[start * sample_width:end * sample_width]
+
+
+def _as_bytes(audio):
+    # У pydub.AudioSegment аудиоданные находятся в поле raw_data
+    return memoryview(getattr(audio, 'raw_data', audio)).cast('B')
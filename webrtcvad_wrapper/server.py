@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Сервер потокового VAD на TCP или Unix сокете (режим serve интерфейса командной строки) и клиент для него.
+
+Протокол:
+    1. Клиент отправляет заголовок (HEADER, 20 байт): b'WVAD', частота дискретизации (uint32), уровень чувствительности (uint8),
+       длина фрейма в мс (uint8), padding_duration_ms (uint16), threshold_voice_frames (float64), little-endian.
+    2. Клиент отправляет аудиоданные PCM 16 бит, моно частями: длина части в байтах (uint32) + аудиоданные. Часть нулевой длины
+       означает конец потока.
+    3. Сервер отправляет события по мере закрытия сегментов, по одному JSON объекту на строку:
+        {"event": "segment", "start": 0.0, "end": 1.23, "is_speech": true}
+        {"event": "end"} - после конца потока и всех сегментов
+        {"event": "error", "message": "..."} - при ошибке (после неё соединение закрывается)
+
+Содержит функции serve() и request_segments().
+'''
+
+import os
+import json
+import socket
+import struct
+import asyncio
+import threading
+
+from .async_vad import AsyncVAD
+
+
+HEADER = struct.Struct('<4sIBBHd')
+HEADER_MAGIC = b'WVAD'
+CHUNK_LENGTH = struct.Struct('<I')
+# Максимальный размер одной части аудиоданных (защита от некорректной длины в заголовке части)
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+async def _read_chunks(reader):
+    ''' Асинхронный генератор частей аудиоданных из соединения (до части нулевой длины). '''
+
+    while True:
+        chunk_size = CHUNK_LENGTH.unpack(await reader.readexactly(CHUNK_LENGTH.size))[0]
+        if chunk_size == 0:
+            return
+        if chunk_size > MAX_CHUNK_SIZE:
+            raise ProtocolError('[E] Размер части аудиоданных %i байт больше допустимого %i байт' % (chunk_size, MAX_CHUNK_SIZE))
+        yield await reader.readexactly(chunk_size)
+
+
+def _encode_event(event):
+    return json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+async def _handle_connection(async_vad, reader, writer):
+    ''' Обработать одно соединение: один поток аудиоданных со своим StreamingVAD (и своим объектом webrtcvad.Vad). '''
+
+    try:
+        magic, sample_rate, sensitivity_mode, frame_duration_ms, padding_duration_ms, threshold_voice_frames = \
+            HEADER.unpack(await reader.readexactly(HEADER.size))
+        if magic != HEADER_MAGIC:
+            raise ProtocolError('[E] Некорректный заголовок потока')
+
+        segments = async_vad.stream(_read_chunks(reader), sample_rate, frame_duration_ms, padding_duration_ms, threshold_voice_frames,
+                                    sensitivity_mode)
+        async for segment in segments:
+            writer.write(_encode_event({'event': 'segment', 'start': segment[0], 'end': segment[1], 'is_speech': segment[2]}))
+            await writer.drain()
+        writer.write(_encode_event({'event': 'end'}))
+    except asyncio.IncompleteReadError:
+        # Клиент закрыл соединение, не завершив поток
+        pass
+    except (ValueError, ConnectionError) as e:
+        writer.write(_encode_event({'event': 'error', 'message': str(e)}))
+    finally:
+        try:
+            await writer.drain()
+            writer.close()
+        except ConnectionError:
+            pass
+
+
+async def start_server(host='127.0.0.1', port=8765, unix_socket=None, sensitivity_mode=3, max_workers=None, max_concurrency=None):
+    ''' Запустить сервер в текущем цикле событий.
+    1. host - адрес для TCP сокета
+    2. port - порт для TCP сокета
+    3. unix_socket - путь к Unix сокету (если задан - используется вместо TCP)
+    4. sensitivity_mode - уровень чувствительности по умолчанию (в каждом потоке задаётся заголовком)
+    5. max_workers - количество потоков для обработки аудиоданных (если None - по количеству ядер процессора)
+    6. max_concurrency - максимальное количество частей аудиоданных, обрабатываемых одновременно (если None - равно max_workers)
+    7. возвращает кортеж (asyncio.Server, AsyncVAD) '''
+
+    async_vad = AsyncVAD(sensitivity_mode, max_workers, max_concurrency)
+
+    async def handle_connection(reader, writer):
+        await _handle_connection(async_vad, reader, writer)
+
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = await asyncio.start_unix_server(handle_connection, path=unix_socket)
+    else:
+        server = await asyncio.start_server(handle_connection, host, port)
+    return server, async_vad
+
+
+def serve(host='127.0.0.1', port=8765, unix_socket=None, sensitivity_mode=3, max_workers=None, max_concurrency=None):
+    ''' Запустить сервер и обрабатывать соединения до остановки процесса. Аргументы аналогичны start_server(). '''
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server, async_vad = loop.run_until_complete(start_server(host, port, unix_socket, sensitivity_mode, max_workers, max_concurrency))
+    print('Сервер запущен на %s' % (unix_socket if unix_socket is not None else '%s:%i' % (host, port)))
+    try:
+        loop.run_forever()
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        async_vad.close()
+        loop.close()
+
+
+def request_segments(audio_bytes, sample_rate, host='127.0.0.1', port=8765, unix_socket=None, sensitivity_mode=3, frame_duration_ms=10,
+                     padding_duration_ms=50, threshold_voice_frames=0.9, chunk_size=32000):
+    ''' Клиент: отправить аудиоданные на сервер частями и получить найденные сегменты.
+    1. audio_bytes - байтовая строка с аудиоданными PCM 16 бит, моно (без заголовков wav)
+    2. sample_rate - частота дискретизации (поддерживается только 8, 16, 32 или 48кГц)
+    3. host, port, unix_socket - адрес сервера (если unix_socket задан - используется вместо TCP)
+    4. sensitivity_mode, frame_duration_ms, padding_duration_ms, threshold_voice_frames - параметры VAD для этого потока
+    5. chunk_size - размер отправляемых частей в байтах
+    6. возвращает список из списков с границами сегментов в том же формате, что и VAD.filter() '''
+
+    if unix_socket is not None:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(unix_socket)
+    else:
+        client = socket.create_connection((host, port))
+
+    def send_audio():
+        try:
+            client.sendall(HEADER.pack(HEADER_MAGIC, sample_rate, sensitivity_mode, frame_duration_ms, padding_duration_ms, threshold_voice_frames))
+            for i in range(0, len(audio_bytes), chunk_size):
+                chunk = audio_bytes[i:i + chunk_size]
+                client.sendall(CHUNK_LENGTH.pack(len(chunk)) + chunk)
+            client.sendall(CHUNK_LENGTH.pack(0))
+        except OSError:
+            # Сервер закрыл соединение (например, после ошибки в заголовке), причина будет получена в событии error
+            pass
+
+    audio_bytes = memoryview(audio_bytes).cast('B')
+    filtered_segments = []
+    with client, client.makefile('rb') as events:
+        # Аудиоданные отправляются в отдельном потоке, что бы события читались одновременно с отправкой (иначе при большом количестве
+        # событий сервер и клиент могут заблокировать друг друга на заполненных буферах сокета)
+        sender = threading.Thread(target=send_audio, daemon=True)
+        sender.start()
+        for line in events:
+            event = json.loads(line.decode('utf-8'))
+            if event['event'] == 'segment':
+                filtered_segments.append([event['start'], event['end'], event['is_speech']])
+            elif event['event'] == 'error':
+                raise ValueError(event['message'])
+            else:
+                break
+        sender.join()
+    return filtered_segments
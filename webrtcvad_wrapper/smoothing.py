@@ -0,0 +1,271 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Сглаживание покадровых решений WebRTC VAD с помощью скользящего окна (триггерный алгоритм).
+
+Содержит класс TriggerState, который хранит состояние алгоритма между вызовами (используется в StreamingVAD), функцию smooth(),
+которая применяет тот же алгоритм сразу ко всему массиву решений (используется в VAD.filter()), и функцию smooth_many() для многих
+комбинаций параметров сглаживания (используется в VAD.sweep()).
+'''
+
+import collections
+import math
+import numpy as np
+
+
+class TriggerState:
+    ''' Состояние триггерного алгоритма сглаживания. Принимает решения WebRTC VAD по одному фрейму и возвращает сегменты по мере их закрытия.
+
+    Используется скользящее окно: если более threshold_voice_frames фреймов в окне содержат звук, то окно помечается как окно с речью
+    (переход в триггерное состояние), если более threshold_voice_frames фреймов в окне не содержат звук - как окно с тишиной.
+
+    Сегменты возвращаются в виде списка [start_frame, end_frame, True/False], где start_frame и end_frame - номера первого фрейма сегмента
+    и фрейма, следующего за последним.
+
+    1. num_padding_frames - длина окна во фреймах
+    2. threshold_voice_frames - порог количества фреймов со звуком в окне '''
+
+    def __init__(self, num_padding_frames, threshold_voice_frames=0.9):
+        if threshold_voice_frames > 1 or threshold_voice_frames < 0.01:
+            raise ValueError("[E] 'threshold_voice_frames' имеет недопустимое значение: " + str(threshold_voice_frames))
+
+        self.num_padding_frames = num_padding_frames
+        self.threshold_voice_frames = threshold_voice_frames
+        self.reset()
+
+
+    def reset(self):
+        ''' Сброс состояния в начальное (нетриггерное) состояние. '''
+
+        # Используется deque для буфера окна
+        self.window_buffer = collections.deque(maxlen=self.num_padding_frames)
+        self.num_voiced = 0
+        # Есть два состояния: триггерное и нетриггерное. В самом начале установлено нетриггерное состояние
+        self.triggered = False
+        self.segment_start = 0
+        self.segment_length = 0
+        self.num_closed_segments = 0
+
+
+    def push(self, is_speech):
+        ''' Обработать решение WebRTC VAD для очередного фрейма.
+        1. is_speech - True, если фрейм содержит речь/звук
+        2. возвращает закрытый сегмент [start_frame, end_frame, True/False] или None, если смены состояния не произошло '''
+
+        # Количество фреймов со звуком в окне поддерживается счётчиком, без пересчёта всего окна
+        if self.window_buffer.maxlen:
+            if len(self.window_buffer) == self.window_buffer.maxlen:
+                self.num_voiced -= self.window_buffer[0]
+            is_speech = bool(is_speech)
+            self.window_buffer.append(is_speech)
+            self.num_voiced += is_speech
+
+        if not self.triggered:
+            # Если больше 90% фреймов в окне содержат звук, то переход в триггерное состояние
+            if self.num_voiced > self.threshold_voice_frames * self.window_buffer.maxlen:
+                return self.__switch()
+        else:
+            # Если больше 90% фреймов в буфере не содержат звук, то переход в нетриггерное состояние
+            if len(self.window_buffer) - self.num_voiced > self.threshold_voice_frames * self.window_buffer.maxlen:
+                return self.__switch()
+        self.segment_length += 1
+        return None
+
+
+    def get_state(self):
+        ''' Получить состояние алгоритма в виде словаря из простых типов (например, для сохранения в JSON между запусками, используется
+        в webrtcvad_wrapper.follow). '''
+
+        return {'window_buffer': list(self.window_buffer), 'num_voiced': self.num_voiced, 'triggered': self.triggered,
+                'segment_start': self.segment_start, 'segment_length': self.segment_length, 'num_closed_segments': self.num_closed_segments}
+
+
+    def set_state(self, state):
+        ''' Восстановить состояние, полученное через get_state() (объект должен быть создан с теми же num_padding_frames и threshold_voice_frames). '''
+
+        self.window_buffer = collections.deque(state['window_buffer'], maxlen=self.num_padding_frames)
+        self.num_voiced = state['num_voiced']
+        self.triggered = state['triggered']
+        self.segment_start = state['segment_start']
+        self.segment_length = state['segment_length']
+        self.num_closed_segments = state['num_closed_segments']
+
+
+    def flush(self):
+        ''' Закрыть текущий сегмент (вызывается после последнего фрейма).
+        1. возвращает последний сегмент [start_frame, end_frame, True/False] или None, если он пустой '''
+
+        return self.__close_segment(self.segment_length)
+
+
+    def __switch(self):
+        ''' Смена состояния: текущий сегмент обрезается на длину окна, а фреймы из окна начинают новый сегмент. '''
+
+        # Повторяет срез frames[:len(frames)-window_buffer.maxlen+1] из исходной реализации, включая поведение при отрицательном индексе
+        cut = self.segment_length - self.window_buffer.maxlen + 1
+        if cut < 0:
+            cut = max(self.segment_length + cut, 0)
+        segment = self.__close_segment(min(cut, self.segment_length))
+
+        self.triggered = not self.triggered
+        self.segment_length = len(self.window_buffer)
+        self.window_buffer.clear()
+        self.num_voiced = 0
+        return segment
+
+
+    def __close_segment(self, length):
+        ''' Закрыть текущий сегмент с заданной длиной. Пустой первый сегмент отбрасывается. '''
+
+        segment = [self.segment_start, self.segment_start + length, self.triggered]
+        self.segment_start += length
+        self.num_closed_segments += 1
+        if length == 0 and self.num_closed_segments == 1:
+            return None
+        return segment
+
+
+def smooth(decisions, num_padding_frames, threshold_voice_frames=0.9):
+    ''' Применить триггерный алгоритм сглаживания ко всему массиву решений WebRTC VAD. Результат идентичен последовательной обработке
+    решений через TriggerState.push() и TriggerState.flush().
+
+    Вместо обработки каждого фрейма выполняется поиск следующей смены состояния: по накопленным суммам фреймов со звуком/тишиной
+    бинарным поиском находится первый фрейм, на котором количество фреймов со звуком (или тишиной) в окне превышает порог. Поэтому
+    время работы зависит от количества сегментов, но не от длины окна.
+
+    1. decisions - массив NumPy (или список) из True/False: решения WebRTC VAD для каждого фрейма
+    2. num_padding_frames - длина окна во фреймах
+    3. threshold_voice_frames - порог количества фреймов со звуком в окне
+    4. возвращает список сегментов [start_frame, end_frame, True/False] '''
+
+    _check_smoothing_params(num_padding_frames, threshold_voice_frames)
+    decisions = np.asarray(decisions, dtype=bool)
+    cumsum_voiced, cumsum_unvoiced = _get_cumsums(decisions)
+    return _smooth(cumsum_voiced, cumsum_unvoiced, _get_voiced_in_window(cumsum_voiced, num_padding_frames), num_padding_frames,
+                   threshold_voice_frames)
+
+
+def smooth_many(decisions, num_padding_frames_list, thresholds_voice_frames):
+    ''' Применить smooth() к одному массиву решений для всех комбинаций длины окна и порога. Накопленные суммы вычисляются один раз,
+    количество фреймов со звуком в окне - один раз для каждой длины окна, а пороги, которые для данной длины окна дают одинаковое
+    минимальное количество фреймов со звуком, обрабатываются один раз.
+
+    1. decisions - массив NumPy (или список) из True/False: решения WebRTC VAD для каждого фрейма
+    2. num_padding_frames_list - список длин окна во фреймах
+    3. thresholds_voice_frames - список порогов количества фреймов со звуком в окне
+    4. возвращает словарь {(num_padding_frames, threshold_voice_frames): список сегментов [start_frame, end_frame, True/False]} '''
+
+    for num_padding_frames in num_padding_frames_list:
+        for threshold_voice_frames in thresholds_voice_frames:
+            _check_smoothing_params(num_padding_frames, threshold_voice_frames)
+
+    decisions = np.asarray(decisions, dtype=bool)
+    cumsum_voiced, cumsum_unvoiced = _get_cumsums(decisions)
+    results = {}
+    for num_padding_frames in sorted(set(num_padding_frames_list)):
+        voiced_in_window = _get_voiced_in_window(cumsum_voiced, num_padding_frames)
+        segments_by_min_count = {}
+        for threshold_voice_frames in thresholds_voice_frames:
+            min_count = _get_min_count(num_padding_frames, threshold_voice_frames)
+            if min_count not in segments_by_min_count:
+                segments_by_min_count[min_count] = _smooth(cumsum_voiced, cumsum_unvoiced, voiced_in_window, num_padding_frames,
+                                                           threshold_voice_frames)
+            results[(num_padding_frames, threshold_voice_frames)] = [list(segment) for segment in segments_by_min_count[min_count]]
+    return results
+
+
+def _check_smoothing_params(num_padding_frames, threshold_voice_frames):
+    if threshold_voice_frames > 1 or threshold_voice_frames < 0.01:
+        raise ValueError("[E] 'threshold_voice_frames' имеет недопустимое значение: " + str(threshold_voice_frames))
+    if num_padding_frames < 0:
+        raise ValueError("[E] 'num_padding_frames' не может быть отрицательным")
+
+
+def _get_min_count(num_padding_frames, threshold_voice_frames):
+    # Условие "количество > threshold_voice_frames * длина окна" для целых количеств эквивалентно "количество >= min_count"
+    return int(math.floor(threshold_voice_frames * num_padding_frames)) + 1
+
+
+def _get_cumsums(decisions):
+    ''' Накопленные суммы фреймов со звуком и с тишиной (обе неубывающие). '''
+
+    cumsum_voiced = np.zeros(len(decisions) + 1, dtype=np.int64)
+    np.cumsum(decisions, out=cumsum_voiced[1:])
+    cumsum_unvoiced = np.arange(len(decisions) + 1, dtype=np.int64) - cumsum_voiced
+    return cumsum_voiced, cumsum_unvoiced
+
+
+def _get_voiced_in_window(cumsum_voiced, num_padding_frames):
+    ''' Количество фреймов со звуком в каждом полном окне (num_padding_frames фреймов), окно заканчивается на фрейме i + num_padding_frames - 1. '''
+
+    if num_padding_frames == 0 or len(cumsum_voiced) - 1 < num_padding_frames:
+        return np.zeros(0, dtype=np.int64)
+    return cumsum_voiced[num_padding_frames:] - cumsum_voiced[:-num_padding_frames]
+
+
+def _smooth(cumsum_voiced, cumsum_unvoiced, voiced_in_window, num_padding_frames, threshold_voice_frames):
+    ''' Триггерный алгоритм сглаживания по накопленным суммам (подробнее в smooth()). '''
+
+    num_frames = len(cumsum_voiced) - 1
+    if num_frames == 0:
+        return []
+    if num_padding_frames == 0:
+        return [[0, num_frames, False]]
+
+    min_count = _get_min_count(num_padding_frames, threshold_voice_frames)
+
+    # Номера фреймов, на которых полное окно (num_padding_frames фреймов) удовлетворяет условию смены состояния
+    switch_frames_voiced = np.flatnonzero(voiced_in_window >= min_count) + num_padding_frames - 1
+    switch_frames_unvoiced = np.flatnonzero(num_padding_frames - voiced_in_window >= min_count) + num_padding_frames - 1
+
+    filtered_segments = []
+    # Пустой первый сегмент отбрасывается
+    is_first_segment = True
+    triggered = False
+    segment_start = 0
+    segment_length = 0
+    window_start = 0
+    while True:
+        if triggered:
+            cumsum, switch_frames = cumsum_unvoiced, switch_frames_unvoiced
+        else:
+            cumsum, switch_frames = cumsum_voiced, switch_frames_voiced
+
+        # Пока окно заполнено не полностью, оно содержит все фреймы начиная с window_start
+        i = int(np.searchsorted(cumsum, cumsum[window_start] + min_count, side='left')) - 1
+        if i >= window_start + num_padding_frames - 1:
+            k = np.searchsorted(switch_frames, window_start + num_padding_frames - 1, side='left')
+            i = int(switch_frames[k]) if k < len(switch_frames) else num_frames
+        if i >= num_frames:
+            break
+
+        # Смена состояния на фрейме i: текущий сегмент обрезается так же, как в TriggerState, фреймы окна начинают новый сегмент
+        length = segment_length + i - window_start
+        cut = length - num_padding_frames + 1
+        if cut < 0:
+            cut = max(length + cut, 0)
+        cut = min(cut, length)
+        if cut > 0 or not is_first_segment:
+            filtered_segments.append([segment_start, segment_start + cut, triggered])
+        segment_start += cut
+        is_first_segment = False
+
+        triggered = not triggered
+        segment_length = min(num_padding_frames, i - window_start + 1)
+        window_start = i + 1
+
+    length = segment_length + num_frames - window_start
+    if length > 0 or not is_first_segment:
+        filtered_segments.append([segment_start, segment_start + length, triggered])
+    return filtered_segments
+
+
+def frames_to_seconds(segment, frame_duration_ms):
+    ''' Перевод границ сегмента из номеров фреймов во временные метки.
+    1. segment - сегмент [start_frame, end_frame, True/False]
+    2. frame_duration_ms - длина фрейма в миллисекундах
+    3. возвращает сегмент [0.00, 1.23, True/False], где границы округлены до 0.01 секунды '''
+
+    return [round(segment[0] * frame_duration_ms / 1000, 2), round(segment[1] * frame_duration_ms / 1000, 2), segment[2]]
@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Статистика работы VAD.filter(): время каждой стадии обработки, количество фреймов, доля фреймов с речью/звуком, события приведения
+частоты дискретизации и количество скопированных байт. Заполняется только если запрошена (VAD.filter(..., with_stats=True)) или
+у объекта VAD есть обработчики стадий (VAD.add_stage_callback()), иначе время не измеряется.
+
+Содержит класс FilterStats.
+'''
+
+import time
+
+
+class FilterStats:
+    ''' Статистика одного вызова VAD.filter().
+
+    Поля:
+        durations - словарь {название стадии: время в секундах} в порядке выполнения стадий. Стадии:
+            'resample' - приведение частоты дискретизации (только если она не поддерживается WebRTC VAD)
+            'get_frames' - разбиение на фреймы
+            'energy_gate' - вычисление средней мощности фреймов для энергетического порога (только если он включён, VAD.set_energy_gate())
+            'is_speech' - вызовы WebRTC VAD для каждого фрейма (sensitivity_mode=0..3)
+            'smooth' - сглаживание решений и перевод в сегменты (sensitivity_mode=0..3)
+            'features' - вычисление RMS и ZCR (sensitivity_mode=4)
+            'thresholding' - пороговая фильтрация RMS/ZCR и перевод в сегменты (sensitivity_mode=4)
+        num_frames - количество фреймов
+        num_voiced_frames - количество фреймов с речью/звуком (до сглаживания)
+        num_skipped_frames - количество фреймов, помеченных как тишина энергетическим порогом без вызова WebRTC VAD
+        num_segments - количество найденных сегментов (с речью/звуком и с тишиной)
+        resample_events - список кортежей (исходная частота, новая частота, способ) для каждого приведения частоты дискретизации
+        bytes_copied - количество байт аудиоданных, скопированных при обработке (приведение массива NumPy с плавающей
+                       точкой или с шагом к PCM 16 бит, приведение частоты дискретизации, дополнение последнего фрейма нулями)
+        audio_duration_s - длина аудиозаписи в секундах
+
+    1. callbacks - список функций callback(stage, elapsed_time), вызываемых после завершения каждой стадии (stage - название стадии,
+       elapsed_time - время её выполнения в секундах) '''
+
+    __slots__ = ('durations', 'num_frames', 'num_voiced_frames', 'num_skipped_frames', 'num_segments', 'resample_events', 'bytes_copied',
+                 'audio_duration_s', 'callbacks')
+    def __init__(self, callbacks=()):
+        self.durations = {}
+        self.num_frames = 0
+        self.num_voiced_frames = 0
+        self.num_skipped_frames = 0
+        self.num_segments = 0
+        self.resample_events = []
+        self.bytes_copied = 0
+        self.audio_duration_s = 0.0
+        self.callbacks = callbacks
+
+
+    def finish_stage(self, stage, start_time):
+        ''' Завершить стадию: сохранить время её выполнения и вызвать обработчики.
+        1. stage - название стадии
+        2. start_time - значение time.perf_counter() в начале стадии
+        3. возвращает текущее значение time.perf_counter() (начало следующей стадии) '''
+
+        end_time = time.perf_counter()
+        elapsed_time = end_time - start_time
+        self.durations[stage] = self.durations.get(stage, 0.0) + elapsed_time
+        for callback in self.callbacks:
+            callback(stage, elapsed_time)
+        return end_time
+
+
+    @property
+    def total_duration(self):
+        return sum(self.durations.values())
+
+
+    @property
+    def voiced_ratio(self):
+        ''' Доля фреймов с речью/звуком (от 0 до 1). '''
+
+        return self.num_voiced_frames / self.num_frames if self.num_frames > 0 else 0.0
+
+
+    @property
+    def rtf(self):
+        ''' Real-time factor: отношение общего времени обработки к длине аудиозаписи. '''
+
+        return self.total_duration / self.audio_duration_s if self.audio_duration_s > 0 else 0.0
+
+
+    def to_dict(self):
+        ''' Перевести статистику в словарь из простых типов (например, для сохранения в JSON или передачи в систему метрик). '''
+
+        return {'durations': dict(self.durations), 'total_duration': self.total_duration, 'num_frames': self.num_frames,
+                'num_voiced_frames': self.num_voiced_frames, 'voiced_ratio': self.voiced_ratio,
+                'num_skipped_frames': self.num_skipped_frames, 'num_segments': self.num_segments,
+                'resample_events': [list(event) for event in self.resample_events], 'bytes_copied': self.bytes_copied,
+                'audio_duration_s': self.audio_duration_s, 'rtf': self.rtf}
+
+
+    def __repr__(self):
+        durations = ', '.join('%s=%.4f' % (stage, elapsed_time) for stage, elapsed_time in self.durations.items())
+        return 'FilterStats(%s, фреймов: %i, с речью/звуком: %.1f%%, сегментов: %i)' % (durations, self.num_frames, self.voiced_ratio * 100,
+                                                                                       self.num_segments)
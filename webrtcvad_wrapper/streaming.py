@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Потоковый (инкрементальный) VAD: принимает аудиоданные частями и возвращает сегменты по мере их закрытия.
+
+Содержит класс StreamingVAD.
+'''
+
+import webrtcvad
+
+from .smoothing import TriggerState, frames_to_seconds
+
+
+class StreamingVAD:
+    ''' Потоковая версия VAD.filter() для sensitivity_mode=0..3. Хранит между вызовами состояние триггерного алгоритма (окно, флаг
+    триггерного состояния, открытый сегмент), объект webrtcvad.Vad и неполный фрейм, оставшийся от предыдущей части.
+
+    Каждый сегмент возвращается сразу после его закрытия, т.е. с задержкой не более длины окна (padding_duration_ms) плюс один фрейм.
+    Результат совпадает с результатом VAD.filter() для той же аудиозаписи.
+
+    ВНИМАНИЕ! Поддерживаются только моно аудиоданные с шириной семпла 2 байта (без заголовков wav).
+
+    1. sensitivity_mode - целое число от 0 до 3, чем больше - тем выше чувствительность
+    2. sample_rate - частота дискретизации (поддерживается только 8, 16, 32 или 48кГц)
+    3. frame_duration_ms - длина фрейма в миллисекундах (поддерживается только 10, 20 и 30 мс)
+    4. padding_duration_ms - длина дополняемых спереди и сзади частей в миллисекундах
+    5. threshold_voice_frames - порог количества фреймов со звуком в окне
+
+    Пример использования:
+        stream_vad = StreamingVAD(3, sample_rate=16000)
+        for chunk in chunks:
+            for segment in stream_vad.push(chunk):
+                print(segment)
+        for segment in stream_vad.flush():
+            print(segment) '''
+
+    sample_width = 2
+    def __init__(self, sensitivity_mode=3, sample_rate=16000, frame_duration_ms=10, padding_duration_ms=50, threshold_voice_frames=0.9):
+        if sensitivity_mode not in [0, 1, 2, 3]:
+            raise ValueError("[E] 'sensitivity_mode' для StreamingVAD может быть только 0, 1, 2 и 3")
+
+        if frame_duration_ms not in [10, 20, 30]:
+            raise ValueError("[E] 'frame_duration_ms' может быть только 10, 20 и 30 миллисекунд")
+
+        if sample_rate not in [8000, 16000, 32000, 48000]:
+            raise ValueError("[E] 'sample_rate' может быть только 8000, 16000, 32000 и 48000 Гц")
+
+        self.sensitivity_mode = sensitivity_mode
+        self.sample_rate = sample_rate
+        self.frame_duration_ms = frame_duration_ms
+        self.padding_duration_ms = padding_duration_ms
+        self.threshold_voice_frames = threshold_voice_frames
+        self.frame_width = int(sample_rate * (frame_duration_ms / 1000.0) * self.sample_width)
+
+        self.trigger_state = TriggerState(int(padding_duration_ms / frame_duration_ms), threshold_voice_frames)
+        self.reset()
+
+
+    def reset(self):
+        ''' Сброс состояния для обработки новой аудиозаписи. '''
+
+        # Новый объект webrtcvad.Vad() создаётся по той же причине, что и в VAD.filter()
+        self.vad = webrtcvad.Vad(self.sensitivity_mode)
+        self.trigger_state.reset()
+        self.remainder = b''
+
+
+    def push(self, chunk):
+        ''' Обработать очередную часть аудиозаписи.
+        1. chunk - байтовая строка (или любой объект с поддержкой buffer protocol) с аудиоданными (без заголовков wav), длина может быть любой
+        2. возвращает список закрытых сегментов следующего формата:
+        [
+            [0.00, 1.23, True/False],
+            ...
+        ]
+        Где:
+            0.00 - начало сегмента (в секундах от начала потока)
+            1.23 - конец сегмента (в секундах от начала потока)
+            True/False - True: речь/звук, False: тишина '''
+
+        chunk = memoryview(chunk).cast('B')
+        filtered_segments = []
+        offset = 0
+        # Неполный фрейм от предыдущей части дополняется началом текущей, остальные фреймы берутся из chunk без копирования
+        if self.remainder:
+            offset = self.frame_width - len(self.remainder)
+            if offset > len(chunk):
+                self.remainder += chunk.tobytes()
+                return filtered_segments
+            self.__process_frame(self.remainder + chunk[:offset].tobytes(), filtered_segments)
+
+        while offset + self.frame_width <= len(chunk):
+            self.__process_frame(chunk[offset:offset + self.frame_width], filtered_segments)
+            offset += self.frame_width
+        self.remainder = chunk[offset:].tobytes()
+        return filtered_segments
+
+
+    def flush(self):
+        ''' Завершить поток: дополнить неполный последний фрейм нулями (как в VAD.filter()) и закрыть текущий сегмент.
+        После вызова состояние сбрасывается и объект можно использовать для новой аудиозаписи.
+        1. возвращает список оставшихся сегментов в том же формате, что и push() '''
+
+        filtered_segments = []
+        if self.remainder:
+            self.__process_frame(self.remainder + b'\x00'*(self.frame_width-len(self.remainder)), filtered_segments)
+
+        segment = self.trigger_state.flush()
+        if segment is not None:
+            filtered_segments.append(frames_to_seconds(segment, self.frame_duration_ms))
+        self.reset()
+        return filtered_segments
+
+
+    def __process_frame(self, frame_bytes, filtered_segments):
+        segment = self.trigger_state.push(self.vad.is_speech(frame_bytes, self.sample_rate))
+        if segment is not None:
+            filtered_segments.append(frames_to_seconds(segment, self.frame_duration_ms))
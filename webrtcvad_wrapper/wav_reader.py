@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# OS: GNU/Linux, Author: Klim V. O.
+
+'''
+Чтение .wav аудиозаписей PCM 16 бит без загрузки в память целиком: аудиоданные отображаются в память (np.memmap) для произвольного
+доступа или последовательно читаются блоками по мере обработки.
+
+Содержит класс WavReader.
+'''
+
+import os
+import struct
+import numpy as np
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Размер блока data, который записывают некоторые программы до завершения записи (аудиоданные продолжаются до конца файла)
+_UNKNOWN_DATA_SIZE = 0xFFFFFFFF
+
+
+class WavReader:
+    ''' Отображение аудиоданных .wav аудиозаписи в память без их копирования. Разбирает заголовок RIFF/WAVE и предоставляет аудиоданные
+    в виде np.memmap (поле samples), из которого семплы читаются с диска только при обращении к ним.
+
+    Если размер блока data в заголовке больше реального (например, аудиозапись ещё записывается), используются только реально
+    записанные данные. Размер блока data 0 или 0xFFFFFFFF (так его записывают некоторые программы записи до её завершения) означает,
+    что аудиоданные продолжаются до конца файла.
+
+    Поддерживаются только аудиозаписи PCM 16 бит (для остальных форматов используйте VAD.read_wav()).
+
+    1. f_name_wav - имя .wav аудиозаписи
+
+    Поля:
+        sample_rate - частота дискретизации
+        channels - количество каналов
+        sample_width - ширина семпла в байтах
+        data_offset - смещение начала аудиоданных в файле в байтах
+        num_samples - количество семплов (в одном канале)
+        samples - np.memmap (int16) с аудиоданными, для нескольких каналов семплы чередуются '''
+
+    def __init__(self, f_name_wav):
+        self.f_name_wav = f_name_wav
+        self.__read_header()
+
+        if self.format_tag != WAVE_FORMAT_PCM or self.sample_width != 2:
+            raise ValueError("[E] Поддерживаются только .wav аудиозаписи PCM 16 бит, '%s' имеет формат %i и ширину семпла %i байт" % \
+                             (f_name_wav, self.format_tag, self.sample_width))
+
+        self.num_samples = self.data_size // (self.sample_width * self.channels)
+        if self.num_samples > 0:
+            self.samples = np.memmap(f_name_wav, dtype='<i2', mode='r', offset=self.data_offset, shape=(self.num_samples * self.channels,))
+        else:
+            self.samples = np.zeros(0, dtype='<i2')
+
+
+    def __read_header(self):
+        ''' Разбор заголовка RIFF/WAVE: поиск блоков fmt и data. '''
+
+        file_size = os.path.getsize(self.f_name_wav)
+        with open(self.f_name_wav, 'rb') as f_wav:
+            riff_header = f_wav.read(12)
+            if len(riff_header) < 12 or riff_header[:4] != b'RIFF' or riff_header[8:12] != b'WAVE':
+                raise ValueError("[E] '%s' не является .wav аудиозаписью" % self.f_name_wav)
+
+            self.format_tag = None
+            while True:
+                chunk_header = f_wav.read(8)
+                if len(chunk_header) < 8:
+                    raise ValueError("[E] В '%s' не найден блок с аудиоданными" % self.f_name_wav)
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+                if chunk_id == b'fmt ':
+                    fmt_chunk = f_wav.read(chunk_size)
+                    if len(fmt_chunk) < 16:
+                        raise ValueError("[E] В '%s' блок fmt повреждён или обрезан (%i байт вместо минимум 16)" % (self.f_name_wav, len(fmt_chunk)))
+                    self.format_tag, self.channels, self.sample_rate, _, _, bits_per_sample = struct.unpack('<HHIIHH', fmt_chunk[:16])
+                    if self.format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt_chunk) >= 26:
+                        self.format_tag = struct.unpack('<H', fmt_chunk[24:26])[0]
+                    self.sample_width = (bits_per_sample + 7) // 8
+                    if chunk_size % 2:
+                        f_wav.seek(1, os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    if self.format_tag is None:
+                        raise ValueError("[E] В '%s' блок fmt должен находиться перед блоком data" % self.f_name_wav)
+                    self.data_offset = f_wav.tell()
+                    if chunk_size in (0, _UNKNOWN_DATA_SIZE):
+                        chunk_size = file_size - self.data_offset
+                    self.data_size = min(chunk_size, file_size - self.data_offset)
+                    return
+                else:
+                    f_wav.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+    def iter_blocks(self, frame_duration_ms=10, frames_per_block=1000):
+        ''' Последовательно прочитать аудиоданные блоками, кратными длине фрейма. Каждый блок читается из файла отдельно и освобождается после
+        обработки, поэтому используемая память определяется размером блока и не зависит от длины аудиозаписи (в отличие от обхода samples,
+        при котором прочитанные страницы файла остаются отображёнными в память процесса).
+        1. frame_duration_ms - длина фрейма в миллисекундах
+        2. frames_per_block - количество фреймов в блоке
+        3. возвращает генератор блоков (массивы NumPy int16, для нескольких каналов семплы чередуются) '''
+
+        block_size = int(self.sample_rate * frame_duration_ms / 1000) * frames_per_block * self.channels * self.sample_width
+        remaining_size = self.num_samples * self.channels * self.sample_width
+        with open(self.f_name_wav, 'rb') as f_wav:
+            f_wav.seek(self.data_offset)
+            while remaining_size > 0:
+                block = f_wav.read(min(block_size, remaining_size))
+                if not block:
+                    break
+                remaining_size -= len(block)
+                yield np.frombuffer(block, dtype='<i2')
+
+
+    def close(self):
+        ''' Закрыть отображение файла в память. '''
+
+        self.samples = np.zeros(0, dtype='<i2')
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
@@ -8,33 +8,179 @@
 
 Содержит класс VAD. Подробнее в https://github.com/Desklop/WebRTCVAD_Wrapper.
 
-Зависимости: pydub, librosa, webrtcvad.
+Зависимости: pydub, numpy, webrtcvad.
+
+pydub загружается только при первом использовании (read_wav(), write_wav_from_bytes()), кэш результатов (sqlite3) - только при вызове
+set_cache(), поэтому при работе с байтовыми строками эти зависимости не загружаются.
 '''
 
-import collections
-from pydub import AudioSegment
+import sys
+import time
+import itertools
 import webrtcvad
-import librosa
 import numpy as np
 
+from .smoothing import smooth, smooth_many, frames_to_seconds
+from .features import frame_rms, frame_zcr, frame_power, frame_rms_max, iter_frame_features
+from .streaming import StreamingVAD
+from .wav_reader import WavReader
+from .resampler import Resampler, resample, align_sample_rate
+from .segments import SegmentTable
+from .export import write_segments, write_concatenated_segments
+from .stats import FilterStats
+
 
 __version__ = 1.4
 
 
-class Frame(object):
-    ''' Представление фрейма в аудиозаписи. Содержит поля bytes, timestamp и duration. '''
-    def __init__(self, bytes_data, timestamp, duration):
-        self.bytes = bytes_data
-        self.timestamp = timestamp
-        self.duration = duration
+def _is_audio_segment(audio):
+    ''' Проверить, является ли audio объектом pydub.AudioSegment, не загружая pydub: если pydub ещё не был загружен, то и объектов
+    pydub.AudioSegment быть не может. '''
+
+    pydub = sys.modules.get('pydub')
+    return pydub is not None and isinstance(audio, pydub.AudioSegment)
+
+
+# Количество семплов в блоке при приведении аудиоданных с плавающей точкой к int16
+_FLOAT_BLOCK_SIZE = 65536
+
+
+def _as_pcm_buffer(audio, stats=None):
+    ''' Получить аудиоданные PCM 16 бит из массива NumPy или объекта с поддержкой buffer protocol в виде memoryview (формат 'B').
+
+    Байтовые строки, bytearray и memoryview с форматом 'B' считаются аудиоданными PCM 16 бит и не копируются, как и непрерывные массивы
+    NumPy int16 (в том числе np.memmap) и буферы с форматом 'h' (например, array.array('h')). Массивы с плавающей точкой (значения от -1 до 1)
+    приводятся к int16 один раз, блоками, без промежуточного массива с плавающей точкой на всю длину.
+
+    1. audio - байтовая строка, массив NumPy (одномерный или с одним столбцом) или любой объект с поддержкой buffer protocol
+    2. stats - объект webrtcvad_wrapper.FilterStats, в bytes_copied которого добавляется размер скопированных аудиоданных (если None - не
+       учитывается)
+    3. возвращает memoryview на аудиоданные PCM 16 бит '''
+
+    if isinstance(audio, np.ndarray):
+        samples = audio
+    else:
+        try:
+            buffer = memoryview(audio)
+        except TypeError:
+            raise ValueError("[E] 'audio' может быть только AudioSegment, массивом NumPy или объектом с поддержкой buffer protocol (bytes, "
+                             "memoryview и т.д.), а не %s" % type(audio).__name__)
+        if buffer.format in ['B', 'b', 'c'] and buffer.c_contiguous:
+            return buffer.cast('B')
+        samples = np.asarray(buffer)
+
+    if samples.ndim == 2 and samples.shape[1] == 1:
+        samples = samples.reshape(-1)
+    if samples.ndim != 1:
+        raise ValueError("[E] Поддерживаются только моно аудиоданные: массив 'audio' должен быть одномерным, а не размером %s" % (samples.shape,))
+
+    # Копируется только массив с плавающей точкой и массив с шагом (например, один канал многоканального массива)
+    is_copied = samples.dtype.kind == 'f' or not samples.flags.c_contiguous
+    if samples.dtype.kind == 'f':
+        samples = _float_to_int16(samples)
+    elif samples.dtype != np.dtype('<i2'):
+        raise ValueError("[E] Массив 'audio' может иметь только тип int16 или float (значения от -1 до 1), а не %s" % samples.dtype)
+    if stats is not None and is_copied:
+        stats.bytes_copied += samples.nbytes
+    return memoryview(np.ascontiguousarray(samples)).cast('B')
+
+
+def _float_to_int16(samples):
+    ''' Привести семплы с плавающей точкой (от -1 до 1) к int16 с округлением и ограничением диапазона. Вычисления выполняются блоками
+    в одном небольшом буфере, на всю длину создаётся только результирующий массив int16. '''
+
+    result = np.empty(len(samples), dtype=np.int16)
+    block = np.empty(min(len(samples), _FLOAT_BLOCK_SIZE), dtype=np.result_type(samples.dtype, np.float32))
+    for start in range(0, len(samples), _FLOAT_BLOCK_SIZE):
+        block_samples = samples[start:start + _FLOAT_BLOCK_SIZE]
+        block_data = block[:len(block_samples)]
+        np.multiply(block_samples, 32768, out=block_data)
+        np.rint(block_data, out=block_data)
+        np.clip(block_data, -32768, 32767, out=block_data)
+        result[start:start + len(block_samples)] = block_data
+    return result
+
+
+class FrameTable:
+    ''' Компактное представление фреймов аудиозаписи без копирования аудиоданных. Вместо отдельного объекта на каждый фрейм хранит один
+    memoryview на исходный буфер и общий заголовок: частоту дискретизации, длину фрейма в миллисекундах и в байтах.
+
+    Неполный последний фрейм дополняется нулями один раз при создании и хранится отдельно (копируется только он).
+
+    Поддерживает len(), индексацию и итерацию: каждый фрейм возвращается как memoryview на соответствующий участок исходного буфера.
+
+    1. audio_bytes - байтовая строка (или любой объект с поддержкой buffer protocol) с аудиоданными (без заголовков wav)
+    2. sample_rate - частота дискретизации
+    3. frame_duration_ms - длина фрейма в миллисекундах
+    4. sample_width - ширина семпла в байтах '''
+
+    __slots__ = ('data', 'last_frame', 'num_frames', 'sample_rate', 'frame_duration_ms', 'frame_width')
+    def __init__(self, audio_bytes, sample_rate, frame_duration_ms, sample_width=2):
+        self.sample_rate = sample_rate
+        self.frame_duration_ms = frame_duration_ms
+        self.frame_width = int(sample_rate * (frame_duration_ms / 1000.0) * sample_width)
+
+        audio_bytes = memoryview(audio_bytes).cast('B')
+        num_full_frames = len(audio_bytes) // self.frame_width
+        self.data = audio_bytes[:num_full_frames * self.frame_width]
+
+        self.last_frame = None
+        len_tail = len(audio_bytes) - len(self.data)
+        if len_tail > 0:
+            last_frame = bytearray(self.frame_width)
+            last_frame[:len_tail] = audio_bytes[len(self.data):]
+            self.last_frame = bytes(last_frame)
+        self.num_frames = num_full_frames + (self.last_frame is not None)
+
+
+    def __len__(self):
+        return self.num_frames
+
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.num_frames
+        if index < 0 or index >= self.num_frames:
+            raise IndexError('[E] Номер фрейма вне допустимого диапазона')
+        offset = index * self.frame_width
+        if offset < len(self.data):
+            return self.data[offset:offset + self.frame_width]
+        return memoryview(self.last_frame)
+
+
+    def __iter__(self):
+        data = self.data
+        frame_width = self.frame_width
+        for offset in range(0, len(data), frame_width):
+            yield data[offset:offset + frame_width]
+        if self.last_frame is not None:
+            yield memoryview(self.last_frame)
+
+
+    def samples(self):
+        ''' Получить полные фреймы в виде двумерного массива NumPy (фреймы x семплы) без копирования данных. Дополненный последний
+        фрейм (если есть) не входит в массив и доступен через поле last_frame. '''
+
+        return np.frombuffer(self.data, dtype=np.int16).reshape(-1, self.frame_width // 2)
 
 
 class VAD:
     ''' Предоставляет методы для упрощения работы с WebRTC VAD:
     - read_wav(): загрузка .wav аудиозаписи и приведение её в поддерживаемый формат
     - write_wav(): сохранение .wav аудиозаписи
+    - write_segments(), write_concatenated_segments(): сохранение найденных сегментов напрямую из исходного буфера
     - filter(): разбиение аудиозаписи на фреймы и их фильтрация по наличию речи/звука
+    - add_stage_callback(): добавление обработчика, получающего время каждой стадии filter() (например, для системы метрик)
+    - filter_wav(): фильтрация .wav аудиозаписи блоками без загрузки в память целиком (для PCM 16 бит)
+    - filter_many(): параллельная загрузка и фильтрация многих .wav аудиозаписей в пуле процессов
+    - filter_parallel(): фильтрация одной длинной аудиозаписи с получением решений WebRTC VAD частями в пуле процессов
+    - filter_channels(): фильтрация каждого канала многоканальной аудиозаписи за один проход (без разделения на моно аудиозаписи)
+    - classify_frames(): получение решений WebRTC VAD для каждого фрейма (первая стадия filter())
+    - smooth(): сглаживание решений WebRTC VAD и перевод их в сегменты (вторая стадия filter())
+    - sweep(): фильтрация со всеми комбинациями параметров с однократной загрузкой аудиозаписи и получением решений WebRTC VAD
     - set_mode(): установка чувствительности WebRTC VAD и включение дополнительного агрессивного режима
+    - set_cache(): включение постоянного кэша результатов filter() и filter_wav() в базе SQLite
+    - set_energy_gate(): пропуск вызовов WebRTC VAD для заведомо тихих фреймов в filter() и classify_frames()
 
     1. sensitivity_mode - целое число от 0 до 4, чем больше - тем выше чувствительность
 
@@ -48,8 +194,17 @@ class VAD:
 
     sample_width = 2
     channels = 1
+    # Способ приведения частоты дискретизации к поддерживаемой: 'pydub' - AudioSegment.set_frame_rate() (вся аудиозапись за один раз,
+    # по умолчанию, результат совпадает с версиями до 1.4), 'polyphase' - webrtcvad_wrapper.resampler (блоками, с кэшированными
+    # коэффициентами фильтра: меньше памяти, но больше времени процессора, а границы сегментов могут немного отличаться)
+    resample_method = 'pydub'
+    # Энергетический порог в dBFS и защитный интервал в мс (подробнее в set_energy_gate()), None - порог отключён
+    energy_gate_dbfs = None
+    energy_gate_guard_ms = 150
     def __init__(self, sensitivity_mode=3):
         self.set_mode(sensitivity_mode)
+        self.stage_callbacks = []
+        self.cache = None
 
 
     def set_mode(self, sensitivity_mode=3):
@@ -64,7 +219,63 @@ class VAD:
         self.sensitivity_mode = sensitivity_mode
 
 
-    def filter(self, audio, frame_duration_ms=10, sample_rate=None, padding_duration_ms=50, threshold_voice_frames=0.9, threshold_rms=0.1, threshold_zcr=0.5):
+    def set_cache(self, cache, max_size_mb=1024):
+        ''' Включить постоянный кэш результатов filter() и filter_wav(): результат для тех же аудиоданных и параметров (включая
+        sensitivity_mode, resample_method и версию библиотеки) берётся из кэша без повторной фильтрации. Для filter_wav() файл не читается
+        повторно, если не изменились его путь, размер и время изменения. Результаты filter(..., with_stats=True) не кэшируются (filter()
+        с with_stats=True всегда выполняет фильтрацию и не использует кэш). При получении результата из кэша фильтрация не выполняется,
+        поэтому обработчики, добавленные через add_stage_callback(), не вызываются.
+        1. cache - имя файла базы SQLite, объект webrtcvad_wrapper.cache.ResultCache или None (отключить кэш)
+        2. max_size_mb - максимальный размер кэша в МБ (только если cache - имя файла), подробнее в ResultCache '''
+
+        if isinstance(cache, str):
+            from .cache import ResultCache
+            cache = ResultCache(cache, max_size_mb)
+        self.cache = cache
+
+
+    def set_energy_gate(self, floor_dbfs=-60, guard_ms=150):
+        ''' Включить энергетический порог: средняя мощность фреймов вычисляется векторно за один проход, и фреймы тише floor_dbfs
+        помечаются как тишина без вызова WebRTC VAD. Используется в filter() и classify_frames() при sensitivity_mode=0..3 (не используется
+        в filter_wav() для PCM 16 бит, filter_parallel(), sweep() и StreamingVAD). Количество пропущенных вызовов доступно в
+        FilterStats.num_skipped_frames (filter(..., with_stats=True)).
+
+        Фрейм пропускается, только если он и все фреймы за предшествующие guard_ms тоже тише порога: WebRTC VAD продолжает выдавать True
+        некоторое время после окончания речи (и на первых фреймах аудиозаписи), поэтому первые guard_ms каждого тихого участка
+        и аудиозаписи всегда передаются в WebRTC VAD.
+
+        ВНИМАНИЕ! Результат может незначительно отличаться от результата без порога: WebRTC VAD адаптирует внутреннюю модель шума
+        к каждому переданному фрейму, а пропущенные фреймы ему не передаются. На тестовых аудиозаписях (16 кГц, фреймы 10 мс, порог -60 dBFS,
+        guard_ms=150, пропущено 20-35% фреймов) отличались решения для 0-0.1% фреймов при sensitivity_mode=3 и до 2% фреймов при
+        sensitivity_mode=0, в основном на коротких фрагментах шума рядом с тихими участками. Чем ниже порог и больше guard_ms - тем меньше
+        расхождение и тем меньше пропускается фреймов.
+
+        1. floor_dbfs - порог средней мощности фрейма в dBFS (0 dBFS - максимальная амплитуда int16) или None (отключить порог)
+        2. guard_ms - защитный интервал в миллисекундах '''
+
+        if guard_ms < 0:
+            raise ValueError("[E] 'guard_ms' не может быть меньше 0")
+        self.energy_gate_dbfs = floor_dbfs
+        self.energy_gate_guard_ms = guard_ms
+
+
+    def add_stage_callback(self, callback):
+        ''' Добавить обработчик, который вызывается после каждой стадии filter() (например, для передачи времени стадий в систему метрик).
+        Пока нет ни одного обработчика и не запрошена статистика (with_stats=True), время стадий не измеряется.
+        1. callback - функция callback(stage, elapsed_time): stage - название стадии (подробнее в webrtcvad_wrapper.FilterStats),
+           elapsed_time - время её выполнения в секундах '''
+
+        self.stage_callbacks.append(callback)
+
+
+    def remove_stage_callback(self, callback):
+        ''' Удалить обработчик, добавленный через add_stage_callback(). '''
+
+        self.stage_callbacks.remove(callback)
+
+
+    def filter(self, audio, frame_duration_ms=10, sample_rate=None, padding_duration_ms=50, threshold_voice_frames=0.9, threshold_rms=0.1, threshold_zcr=0.5,
+               as_table=False, with_stats=False):
         ''' Разбить аудиозапись на фреймы и отфильтровать их по наличию речи/звука.
         
         Если sensitivity_mode=0..3:\n
@@ -86,16 +297,24 @@ class VAD:
 
         ВНИМАНИЕ! Поддерживаются только моно аудиозаписи с шириной семпла 2 байта.
 
-        1. audio - объект pydub.AudioSegment с аудиозаписью или байтовая строка с аудиоданными (без заголовков wav)
+        1. audio - объект pydub.AudioSegment с аудиозаписью, байтовая строка с аудиоданными (без заголовков wav), массив NumPy int16 или
+           float (значения от -1 до 1) или любой объект с поддержкой buffer protocol (bytearray, memoryview, array.array('h') и т.д.).
+           Аудиоданные int16 и байтовые буферы не копируются, аудиоданные с плавающей точкой приводятся к int16 один раз
         2. frame_duration_ms - длина фрейма в миллисекундах (поддерживается только 10, 20 и 30 мс)
         3. sample_rate - частота дискретизации (поддерживается только 8, 16, 32 или 48кГц):
             когда audio - объект pydub.AudioSegment и частота дискретизации None или не поддерживается - будет приведена к ближайшей из поддерживаемых
-            когда audio - байтовая строка, частота дискретизации должна быть задана и поддерживаться
+              (через AudioSegment.set_frame_rate() или полифазным фильтром из webrtcvad_wrapper.resampler, способ задаётся полем resample_method)
+            когда audio - байтовая строка или массив NumPy, частота дискретизации должна быть задана и поддерживаться
         4. padding_duration_ms - длина дополняемых спереди и сзади частей в миллисекундах
         5. threshold_voice_frames - порог количества фреймов со звуком в окне
         6. threshold_rms - порог определения речи (порог RMS) (только когда sensitivity_mode=4)
         7. threshold_zcr - порог определения тишины (порог ZRC) (только когда sensitivity_mode=4)
-        8. возвращает список из списков с границами сегментов следующего формата:
+        8. as_table - True: вернуть объект webrtcvad_wrapper.SegmentTable с точными границами сегментов в семплах исходной аудиозаписи
+           (без округления, с методами для получения аудиоданных сегментов без копирования)
+        9. with_stats - True: вернуть кортеж (filtered_segments, stats), где stats - объект webrtcvad_wrapper.FilterStats со временем
+           каждой стадии, количеством фреймов, долей фреймов с речью/звуком, событиями приведения частоты дискретизации и количеством
+           скопированных байт
+        10. возвращает (если as_table=False) список из списков с границами сегментов следующего формата:
         [
             [0.00, 1.23, True/False],
             ...
@@ -109,27 +328,342 @@ class VAD:
             padding_duration_ms - 50 мс
             frame_duration_ms - 10 мс '''
 
+        if self.cache is None or with_stats:
+            return self.__filter(audio, frame_duration_ms, sample_rate, padding_duration_ms, threshold_voice_frames, threshold_rms, threshold_zcr,
+                                 as_table, with_stats)
+
+        if not _is_audio_segment(audio):
+            audio = _as_pcm_buffer(audio)
+
+        from .cache import get_content_hash
+        if _is_audio_segment(audio):
+            content_hash = get_content_hash(audio.raw_data)
+            params = self.__get_cache_params(audio.frame_rate, audio.sample_width, audio.channels, frame_duration_ms, padding_duration_ms,
+                                             threshold_voice_frames, threshold_rms, threshold_zcr, as_table)
+        else:
+            content_hash = get_content_hash(audio)
+            params = self.__get_cache_params(sample_rate, self.sample_width, self.channels, frame_duration_ms, padding_duration_ms,
+                                             threshold_voice_frames, threshold_rms, threshold_zcr, as_table)
+        cache_key = self.cache.get_key(content_hash, 'filter', params)
+        filtered_segments = self.cache.get(cache_key)
+        if filtered_segments is None:
+            filtered_segments = self.__filter(audio, frame_duration_ms, sample_rate, padding_duration_ms, threshold_voice_frames, threshold_rms,
+                                              threshold_zcr, as_table)
+            self.cache.put(cache_key, filtered_segments, content_hash)
+        return filtered_segments
+
+
+    def __filter(self, audio, frame_duration_ms=10, sample_rate=None, padding_duration_ms=50, threshold_voice_frames=0.9, threshold_rms=0.1,
+                 threshold_zcr=0.5, as_table=False, with_stats=False):
+        ''' Фильтрация без кэша (аргументы и возвращаемое значение аналогичны filter()). '''
+
+        # Статистика собирается только если она запрошена или есть обработчики стадий, иначе время стадий не измеряется
+        stats = None
+        if with_stats or self.stage_callbacks:
+            stats = FilterStats(self.stage_callbacks)
+        # Приведение к PCM 16 бит выполняется здесь, что бы копирование аудиоданных (например, массива с плавающей точкой) учитывалось
+        # в статистике
+        if not _is_audio_segment(audio):
+            audio = _as_pcm_buffer(audio, stats)
+
         if self.sensitivity_mode < 4:
-            frames = self.__get_frames(audio, frame_duration_ms, sample_rate)
-            filtered_segments = self.__filter_frames(frames, padding_duration_ms, threshold_voice_frames)
+            frames = self.__get_frames(audio, frame_duration_ms, sample_rate, stats)
+            if not as_table and stats is None:
+                return self.__filter_frames(frames, padding_duration_ms, threshold_voice_frames)
+
+            decisions = self.__classify_frames(frames, stats)
+            if _is_audio_segment(audio):
+                sample_rate = audio.frame_rate
+                audio = audio.raw_data
+            if stats is not None:
+                start_time = time.perf_counter()
+            filtered_segments = self.__smooth_decisions(decisions, frame_duration_ms, padding_duration_ms, threshold_voice_frames, as_table,
+                                                        sample_rate, len(audio) // self.sample_width)
+            if stats is not None:
+                stats.finish_stage('smooth', start_time)
         else:
-            filtered_segments = self.rough_filter(audio, frame_duration_ms, sample_rate, threshold_rms, threshold_zcr)
+            filtered_segments = self.rough_filter(audio, frame_duration_ms, sample_rate, threshold_rms, threshold_zcr, as_table, stats)
+
+        if not with_stats:
+            return filtered_segments
+        stats.num_segments = len(filtered_segments)
+        return filtered_segments, stats
+
+
+    def filter_many(self, f_names_wav, workers=None, frame_duration_ms=10, padding_duration_ms=50, threshold_voice_frames=0.9, threshold_rms=0.1,
+                    threshold_zcr=0.5):
+        ''' Загрузить и отфильтровать много .wav аудиозаписей параллельно в пуле процессов (по одному объекту VAD на процесс).
+
+        Результаты возвращаются по мере готовности, в порядке завершения обработки. Ошибка при обработке одной аудиозаписи не прерывает
+        обработку остальных. Если включён кэш (set_cache()), он используется во всех процессах. Энергетический порог (set_energy_gate())
+        и resample_method передаются в каждый процесс, поэтому результат совпадает с filter_wav() этого объекта.
+
+        1. f_names_wav - список (или любой итерируемый объект) с именами .wav аудиозаписей
+        2. workers - количество процессов (если None - по количеству ядер процессора, если 1 - обработка в текущем процессе без пула)
+        3. остальные аргументы аналогичны filter()
+        4. возвращает генератор кортежей (f_name_wav, filtered_segments, error), где:
+            f_name_wav - имя аудиозаписи
+            filtered_segments - результат filter() или None при ошибке
+            error - None или текст ошибки '''
+
+        from .batch import filter_many
+        cache_args = None
+        if self.cache is not None:
+            cache_args = (self.cache.f_name_db, self.cache.max_size / 1024 / 1024)
+        vad_settings = {'resample_method': self.resample_method, 'energy_gate_dbfs': self.energy_gate_dbfs,
+                        'energy_gate_guard_ms': self.energy_gate_guard_ms}
+        return filter_many(f_names_wav, self.sensitivity_mode, workers, cache_args=cache_args, vad_settings=vad_settings,
+                           frame_duration_ms=frame_duration_ms,
+                           padding_duration_ms=padding_duration_ms, threshold_voice_frames=threshold_voice_frames, threshold_rms=threshold_rms,
+                           threshold_zcr=threshold_zcr)
+
+
+    def filter_parallel(self, audio, workers=None, frame_duration_ms=10, sample_rate=None, padding_duration_ms=50, threshold_voice_frames=0.9,
+                        warmup_duration_ms=3000, as_table=False, exact=True):
+        ''' Отфильтровать одну длинную аудиозапись по наличию речи/звука, получая решения WebRTC VAD частями в пуле процессов.
+
+        При exact=True (по умолчанию) результат совпадает с filter() (без энергетического порога, set_energy_gate() здесь не используется)
+        при любом workers: WebRTC VAD адаптируется ко всей предшествующей
+        аудиозаписи, и это состояние не сходится у частей, обработанных отдельно, поэтому решения получаются последовательно одним объектом
+        webrtcvad.Vad (без чтения аудиозаписи целиком через pydub, если это .wav аудиозапись PCM 16 бит с поддерживаемой частотой).
+
+        При exact=False аудиозапись делится на workers частей в самых тихих местах, решения WebRTC VAD для каждой части получаются
+        в отдельном процессе (каждому процессу сначала передаются warmup_duration_ms аудиоданных перед его частью, их решения отбрасываются),
+        а на стыках граница переносится туда, где решения соседних частей совпадают. Затем решения всех частей объединяются и сглаживаются
+        целиком, как в filter(), поэтому на границах частей не появляется разрезанных или повторяющихся сегментов. Время работы уменьшается
+        пропорционально количеству процессов, но часть решений после каждой границы может отличаться от filter() (подробнее
+        в webrtcvad_wrapper.parallel.classify_frames_parallel()).
+
+        При sensitivity_mode=4 выполняется обычный filter() (RMS/ZCR вычисляются векторно и быстро без пула процессов).
+
+        1. audio - объект pydub.AudioSegment с аудиозаписью, байтовая строка или массив NumPy с аудиоданными (как в filter()) или имя .wav аудиозаписи
+           (если она в формате PCM 16 бит, моно, с поддерживаемой частотой дискретизации - каждый процесс сам читает свою часть из файла,
+           иначе она загружается через read_wav())
+        2. workers - количество процессов при exact=False (если None - по количеству ядер процессора)
+        3. warmup_duration_ms - длина перекрытия частей до и после границы в миллисекундах (только при exact=False)
+        4. exact - True: результат совпадает с filter(), False: приближённая обработка частей в пуле процессов
+        5. остальные аргументы и возвращаемое значение аналогичны filter() '''
+
+        from .parallel import classify_frames_parallel
+
+        if isinstance(audio, str):
+            try:
+                wav_reader = WavReader(audio)
+            except ValueError:
+                wav_reader = None
+            if wav_reader is not None and wav_reader.channels == self.channels and self.sensitivity_mode < 4 and \
+               wav_reader.sample_rate in [8000, 16000, 32000, 48000] and frame_duration_ms in [10, 20, 30]:
+                with wav_reader:
+                    sample_rate = wav_reader.sample_rate
+                    num_samples = wav_reader.num_samples
+                decisions = classify_frames_parallel(audio, sample_rate, frame_duration_ms, self.sensitivity_mode, workers, warmup_duration_ms,
+                                                     exact=exact)
+                return self.__smooth_decisions(decisions, frame_duration_ms, padding_duration_ms, threshold_voice_frames, as_table, sample_rate,
+                                               num_samples)
+            audio = self.read_wav(audio)
+        elif not _is_audio_segment(audio):
+            audio = _as_pcm_buffer(audio)
+
+        if self.sensitivity_mode > 3:
+            return self.filter(audio, frame_duration_ms, sample_rate, padding_duration_ms, threshold_voice_frames, as_table=as_table)
+
+        audio_bytes, frames_sample_rate = self.__get_audio_bytes(audio, frame_duration_ms, sample_rate)
+        decisions = classify_frames_parallel(audio_bytes, frames_sample_rate, frame_duration_ms, self.sensitivity_mode, workers, warmup_duration_ms,
+                                             self.sample_width, exact)
+        if _is_audio_segment(audio):
+            sample_rate = audio.frame_rate
+            audio = audio.raw_data
+        return self.__smooth_decisions(decisions, frame_duration_ms, padding_duration_ms, threshold_voice_frames, as_table, sample_rate,
+                                       len(audio) // self.sample_width)
+
+
+    def filter_channels(self, audio, frame_duration_ms=10, sample_rate=None, channels=None, padding_duration_ms=50, threshold_voice_frames=0.9,
+                        threshold_rms=0.1, threshold_zcr=0.5, workers=1):
+        ''' Отфильтровать каждый канал многоканальной аудиозаписи (например, стерео записи разговора, где собеседники записаны в разные
+        каналы) по наличию речи/звука. Результат для каждого канала совпадает с filter(..., as_table=True) для этого канала, сохранённого
+        отдельной моно аудиозаписью (при неподдерживаемой частоте дискретизации - с resample_method='polyphase').
+
+        При sensitivity_mode=0..3 аудиоданные читаются один раз блоками, каждый блок разделяется на каналы через представление NumPy
+        с шагом (копируется только текущий блок), фреймы каждого канала передаются своему объекту webrtcvad.Vad (подробнее
+        в webrtcvad_wrapper.multichannel). Неподдерживаемая частота дискретизации приводится к ближайшей поддерживаемой полифазным фильтром
+        (независимо от resample_method). При sensitivity_mode=4 RMS/ZCR вычисляются для каждого канала по представлению с шагом.
+
+        Энергетический порог (set_energy_gate()) и кэш (set_cache()) в этом методе не используются.
+
+        1. audio - объект pydub.AudioSegment с аудиозаписью, байтовая строка с аудиоданными PCM 16 бит с чередующимися семплами каналов
+           (без заголовков wav), массив NumPy int16 или float (семплы x каналы или одномерный с чередующимися семплами) или имя .wav
+           аудиозаписи (если она в формате PCM 16 бит - читается блоками без загрузки в память целиком)
+        2. frame_duration_ms - длина фрейма в миллисекундах (при sensitivity_mode=0..3 поддерживается только 10, 20 и 30 мс)
+        3. sample_rate - частота дискретизации, только если audio - байтовая строка или массив NumPy
+        4. channels - количество каналов, только если audio - байтовая строка или одномерный массив NumPy
+        5. workers - количество процессов, между которыми делятся каналы (если None - по количеству ядер процессора, но не больше количества
+           каналов, если 1 - обработка в текущем процессе, только для sensitivity_mode=0..3). Вызовы WebRTC VAD не освобождают GIL,
+           поэтому используются процессы, а не потоки
+        6. остальные аргументы аналогичны filter()
+        7. возвращает список объектов webrtcvad_wrapper.SegmentTable, по одному для каждого канала '''
+
+        if isinstance(audio, str):
+            try:
+                wav_reader = WavReader(audio)
+            except ValueError:
+                wav_reader = None
+            if wav_reader is None:
+                from pydub import AudioSegment
+                audio = AudioSegment.from_wav(audio)
+            else:
+                with wav_reader:
+                    sample_rate = wav_reader.sample_rate
+                    channels = wav_reader.channels
+                    num_samples = wav_reader.num_samples
+                    if self.sensitivity_mode == 4:
+                        return [self.__rough_filter_blocks(wav_reader.samples[i::channels], sample_rate, frame_duration_ms, threshold_rms, threshold_zcr,
+                                                           True) for i in range(channels)]
+                return self.__filter_channels(audio, frame_duration_ms, sample_rate, channels, num_samples, padding_duration_ms,
+                                              threshold_voice_frames, workers)
+
+        if _is_audio_segment(audio):
+            if audio.sample_width != self.sample_width:
+                audio = audio.set_sample_width(self.sample_width)
+            sample_rate = audio.frame_rate
+            channels = audio.channels
+            audio = audio.raw_data
+        elif isinstance(audio, np.ndarray) and audio.ndim == 2:
+            if sample_rate is None:
+                raise ValueError("[E] Когда audio - массив NumPy, 'sample_rate' не может быть None")
+            # Массив (семплы x каналы): в непрерывном массиве семплы каналов уже чередуются
+            channels = audio.shape[1]
+            audio = _as_pcm_buffer(np.ascontiguousarray(audio).reshape(-1))
+        else:
+            if sample_rate is None or channels is None:
+                raise ValueError("[E] Когда audio - байтовая строка или массив NumPy, 'sample_rate' и 'channels' не могут быть None")
+            audio = _as_pcm_buffer(audio)
+
+        num_samples = len(audio) // (self.sample_width * channels)
+        if self.sensitivity_mode == 4:
+            samples = np.frombuffer(audio, dtype=np.int16)[:num_samples * channels]
+            return [self.__rough_filter_samples(samples[i::channels], sample_rate, frame_duration_ms, threshold_rms, threshold_zcr, True)
+                    for i in range(channels)]
+        return self.__filter_channels(audio, frame_duration_ms, sample_rate, channels, num_samples, padding_duration_ms, threshold_voice_frames,
+                                      workers)
+
+
+    def __filter_channels(self, audio, frame_duration_ms, sample_rate, channels, num_samples, padding_duration_ms, threshold_voice_frames, workers):
+        ''' Фильтрация каналов при sensitivity_mode=0..3 (аргументы аналогичны filter_channels()). '''
+
+        from .multichannel import classify_channels_parallel
+
+        if frame_duration_ms not in [10, 20, 30]:
+            raise ValueError("[E] 'frame_duration_ms' может быть только 10, 20 и 30 миллисекунд")
+
+        vad_sample_rate = sample_rate
+        if sample_rate not in [8000, 16000, 32000, 48000]:
+            vad_sample_rate = self.__align_sample_rate(sample_rate)
+        decisions = classify_channels_parallel(audio, channels, sample_rate, vad_sample_rate, frame_duration_ms, self.sensitivity_mode, workers)
+        return [self.__smooth_decisions(channel_decisions, frame_duration_ms, padding_duration_ms, threshold_voice_frames, True, sample_rate,
+                                        num_samples) for channel_decisions in decisions]
+
+
+    def filter_wav(self, f_name_wav, frame_duration_ms=10, padding_duration_ms=50, threshold_voice_frames=0.9, threshold_rms=0.1, threshold_zcr=0.5):
+        ''' Загрузить .wav аудиозапись и отфильтровать её по наличию речи/звука. Результат совпадает с filter(read_wav(f_name_wav)).
+
+        Если аудиозапись в формате PCM 16 бит, моно, то она не загружается в память целиком: аудиоданные отображаются в память с помощью
+        webrtcvad_wrapper.WavReader и обрабатываются блоками (при sensitivity_mode=0..3 - через StreamingVAD, неподдерживаемая частота
+        дискретизации приводится к ближайшей поддерживаемой блоками через webrtcvad_wrapper.resampler.Resampler, если resample_method='polyphase').
+        Используемая память в этом случае не зависит от длины аудиозаписи. Остальные аудиозаписи загружаются через read_wav() и приводятся в поддерживаемый формат.
+
+        1. f_name_wav - имя .wav аудиозаписи
+        2. остальные аргументы аналогичны filter()
+        3. возвращает список из списков с границами сегментов в том же формате, что и filter() '''
+
+        if self.cache is None:
+            return self.__filter_wav(f_name_wav, frame_duration_ms, padding_duration_ms, threshold_voice_frames, threshold_rms, threshold_zcr)
+
+        params = self.__get_cache_params(None, None, None, frame_duration_ms, padding_duration_ms, threshold_voice_frames, threshold_rms,
+                                         threshold_zcr, False)
+        content_hash = self.cache.get_file_hash(f_name_wav)
+        cache_key = self.cache.get_key(content_hash, 'filter_wav', params)
+        filtered_segments = self.cache.get(cache_key)
+        if filtered_segments is None:
+            filtered_segments = self.__filter_wav(f_name_wav, frame_duration_ms, padding_duration_ms, threshold_voice_frames, threshold_rms,
+                                                  threshold_zcr)
+            self.cache.put(cache_key, filtered_segments, content_hash)
+        return filtered_segments
+
+
+    def follow_wav(self, f_name_wav, f_name_state=None, f_name_output=None, frame_duration_ms=10, padding_duration_ms=50, threshold_voice_frames=0.9,
+                   warmup_duration_ms=3000, finish=False):
+        ''' Отфильтровать только аудиоданные, дописанные в растущую .wav аудиозапись (например, которая ещё записывается) после предыдущего
+        вызова, и вернуть закрытые за это время сегменты. Номер первого необработанного байта и состояние сглаживания хранятся между вызовами
+        в файле состояния, поэтому время работы зависит только от длины новых аудиоданных. Только для sensitivity_mode=0..3.
+
+        ВНИМАНИЕ! Результат может немного отличаться от filter_wav() для всей аудиозаписи: внутреннее состояние WebRTC VAD нельзя
+        сохранить, поэтому при каждом вызове он "разогревается" на warmup_duration_ms предшествующих аудиоданных.
+
+        1. f_name_wav - имя .wav аудиозаписи PCM 16 бит, моно с частотой дискретизации 8, 16, 32 или 48кГц
+        2. f_name_state - имя файла состояния (если None - <имя аудиозаписи>.vad.json)
+        3. f_name_output - имя JSONL файла, в который дописываются новые сегменты (если None - сегменты только возвращаются)
+        4. warmup_duration_ms - длина аудиоданных перед новыми аудиоданными, передаваемых WebRTC VAD для "разогрева", в миллисекундах
+        5. finish - True: аудиозапись завершена, закрыть последний сегмент
+        6. остальные аргументы аналогичны filter()
+        7. возвращает список новых сегментов в формате filter(), подробнее в webrtcvad_wrapper.follow.follow_wav() '''
+
+        from .follow import follow_wav
+
+        return follow_wav(f_name_wav, f_name_state, f_name_output, self.sensitivity_mode, frame_duration_ms, padding_duration_ms,
+                          threshold_voice_frames, warmup_duration_ms, finish)
+
+
+    def __filter_wav(self, f_name_wav, frame_duration_ms=10, padding_duration_ms=50, threshold_voice_frames=0.9, threshold_rms=0.1,
+                     threshold_zcr=0.5):
+        ''' Фильтрация .wav аудиозаписи без кэша (аргументы и возвращаемое значение аналогичны filter_wav()). '''
+
+        try:
+            wav_reader = WavReader(f_name_wav)
+        except ValueError:
+            wav_reader = None
+
+        if wav_reader is None or wav_reader.channels != self.channels or (self.sensitivity_mode < 4 and self.resample_method == 'pydub' and \
+           wav_reader.sample_rate not in [8000, 16000, 32000, 48000]):
+            audio = self.read_wav(f_name_wav)
+            return self.__filter(audio, frame_duration_ms, None, padding_duration_ms, threshold_voice_frames, threshold_rms, threshold_zcr)
+
+        with wav_reader:
+            if self.sensitivity_mode == 4:
+                return self.__rough_filter_blocks(wav_reader.samples, wav_reader.sample_rate, frame_duration_ms, threshold_rms, threshold_zcr)
+
+            sample_rate = wav_reader.sample_rate
+            resampler = None
+            if sample_rate not in [8000, 16000, 32000, 48000]:
+                sample_rate = self.__align_sample_rate(sample_rate)
+                resampler = Resampler(wav_reader.sample_rate, sample_rate)
+
+            stream_vad = StreamingVAD(self.sensitivity_mode, sample_rate, frame_duration_ms, padding_duration_ms, threshold_voice_frames)
+            filtered_segments = []
+            for block in wav_reader.iter_blocks(frame_duration_ms):
+                if resampler is not None:
+                    block = resampler.process(block)
+                filtered_segments += stream_vad.push(block)
+            if resampler is not None:
+                filtered_segments += stream_vad.push(resampler.flush())
+            filtered_segments += stream_vad.flush()
         return filtered_segments
 
 
-    def rough_filter(self, audio, frame_duration_ms=10, sample_rate=None, threshold_rms=0.1, threshold_zcr=0.5):
+    def rough_filter(self, audio, frame_duration_ms=10, sample_rate=None, threshold_rms=0.1, threshold_zcr=0.5, as_table=False, stats=None):
         ''' Разбить аудиозапись на фреймы и отфильтровать их по наличию речи/звука. Метод агрессивный, часто игнорирует вообще всё, кроме
         гласных и звонких согласных звуков в речи (или просто громких звуков).
         
         Фильтрация работает так: на основе RMS (root-mean-square, отражает мощность звуковой волны) и ZCR (zero-crossing rate, частоты пересечения нуля)
         по заданным порогам фильтруются фреймы, которые затем переводятся во временные метки в исходной аудиозаписи.
 
-        1. audio - объект pydub.AudioSegment с аудиозаписью или байтовая строка с аудиоданными (без заголовков wav)
+        1. audio - объект pydub.AudioSegment с аудиозаписью, байтовая строка или массив NumPy с аудиоданными (как в filter())
         2. frame_duration_ms - длина фрейма в миллисекундах (рекомендуются значения 10, 20 или 30 мс)
-        3. sample_rate - частота дискретизации, только если audio - байтовая строка
+        3. sample_rate - частота дискретизации, только если audio - байтовая строка или массив NumPy
         4. threshold_rms - порог определения речи (порог RMS)
         5. threshold_zcr - порог определения тишины (порог ZCR)
-        6. возвращает список из списков с границами сегментов следующего формата:
+        6. as_table - True: вернуть объект webrtcvad_wrapper.SegmentTable с точными границами сегментов в семплах (подробнее в filter())
+        7. stats - объект webrtcvad_wrapper.FilterStats, который нужно заполнить статистикой (стадии 'features' и 'thresholding')
+        8. возвращает (если as_table=False) список из списков с границами сегментов следующего формата:
         [
             [0.00, 1.23, True/False],
             ...
@@ -137,35 +671,124 @@ class VAD:
         Где:
             0.00 - начало сегмента
             1.23 - конец сегмента
-            True/False - True: речь/звук, False: тишина '''
+            True/False - True: речь/звук, False: тишина
 
-        if isinstance(audio, AudioSegment):
-            audio_data = np.array(audio.get_array_of_samples())
-            audio_data = audio_data.astype(np.float64)
-            audio_data = librosa.util.normalize(audio_data, axis=0)
+        Если речь/звук не найдены, возвращается один сегмент с тишиной на всю длину аудиозаписи. '''
+
+        audio_data, sample_rate = self.__get_samples(audio, sample_rate, stats)
+        return self.__rough_filter_samples(audio_data, sample_rate, frame_duration_ms, threshold_rms, threshold_zcr, as_table, stats)
+
+
+    def __get_samples(self, audio, sample_rate=None, stats=None):
+        ''' Получить семплы аудиозаписи для вычисления RMS/ZCR (аргументы аналогичны rough_filter()). Если задан stats, в нём учитывается
+        копирование аудиоданных при приведении к PCM 16 бит.
+        1. возвращает кортеж (audio_data, sample_rate), где audio_data - одномерный массив NumPy с семплами '''
+
+        # Нормализация исходного сигнала не выполняется: значения RMS всё равно нормализуются ниже, а ZCR зависит только от знака семплов
+        if _is_audio_segment(audio):
+            if audio.sample_width == 2:
+                audio_data = np.frombuffer(audio.raw_data, dtype=np.int16)
+            else:
+                audio_data = np.array(audio.get_array_of_samples())
             sample_rate = audio.frame_rate
-        elif isinstance(audio, bytes):
+        else:
             if self.sample_width != 2:
-                raise ValueError("[E] Когда type(audio) == bytes, 'sample_width' должен быть равен 2 байтам (16 бит)")
-            audio_data = np.frombuffer(audio, dtype=np.int16)
-            audio_data = audio_data.astype(np.float64)
-            audio_data = librosa.util.normalize(audio_data, axis=0)
+                raise ValueError("[E] Когда audio - байтовая строка или массив NumPy, 'sample_width' должен быть равен 2 байтам (16 бит)")
+            audio_data = np.frombuffer(_as_pcm_buffer(audio, stats), dtype=np.int16)
             if sample_rate is None:
-                raise ValueError("[E] Когда type(audio) == bytes, 'sample_rate' не может быть None")
-        else:
-            raise ValueError("[E] 'audio' может быть только AudioSegment или bytes")
+                raise ValueError("[E] Когда audio - байтовая строка или массив NumPy, 'sample_rate' не может быть None")
+        return audio_data, sample_rate
+
+
+    def __rough_filter_samples(self, audio_data, sample_rate, frame_duration_ms=10, threshold_rms=0.1, threshold_zcr=0.5, as_table=False,
+                               stats=None):
+        ''' Фильтрация аудиозаписи на основе RMS и ZCR (подробнее в rough_filter()).
+        1. audio_data - одномерный массив NumPy (int16, float32, np.memmap и т.д.) с семплами аудиозаписи
+        2. sample_rate - частота дискретизации
+        3. остальные аргументы и возвращаемое значение аналогичны rough_filter() '''
+
+        if stats is not None:
+            stats.audio_duration_s = len(audio_data) / sample_rate
+            start_time = time.perf_counter()
+
+        rms, zcr, frame_shift = self.__rough_features(audio_data, sample_rate, frame_duration_ms)
+        if stats is None:
+            return self.__rough_filter_segments(rms, zcr, frame_shift, len(audio_data), sample_rate, threshold_rms, threshold_zcr, as_table)
+
+        start_time = stats.finish_stage('features', start_time)
+        filtered_segments = self.__rough_filter_segments(rms, zcr, frame_shift, len(audio_data), sample_rate, threshold_rms, threshold_zcr,
+                                                         as_table, stats)
+        stats.finish_stage('thresholding', start_time)
+        return filtered_segments
+
+
+    def __rough_features(self, audio_data, sample_rate, frame_duration_ms=10):
+        ''' Вычислить RMS и ZCR фреймов (первая стадия __rough_filter_samples()). Фреймы длиной frame_duration_ms идут с шагом в половину длины.
+        1. audio_data - одномерный массив NumPy с семплами аудиозаписи
+        2. sample_rate - частота дискретизации
+        3. frame_duration_ms - длина фрейма в миллисекундах
+        4. возвращает кортеж (rms, zcr, frame_shift), где rms - нормализованные значения RMS, frame_shift - шаг фреймов в семплах '''
 
         frame_len = int(frame_duration_ms * sample_rate / 1000)
         frame_shift = int(frame_duration_ms / 2 * sample_rate / 1000)
 
         # Вычисление RMS (отражает мощность звуковой волны)
-        rms = librosa.feature.rms(y=audio_data, frame_length=frame_len, hop_length=frame_shift)
-        rms = rms[0]
-        rms = librosa.util.normalize(rms, axis=0)
+        rms = frame_rms(audio_data, frame_len, frame_shift)
+        rms_max = rms.max()
+        if rms_max >= np.finfo(rms.dtype).tiny:
+            rms /= rms_max
 
         # Вычисление частот пересечения нуля
-        zcr = librosa.feature.zero_crossing_rate(audio_data, frame_length=frame_len, hop_length=frame_shift, threshold=0)
-        zcr = zcr[0]
+        zcr = frame_zcr(audio_data, frame_len, frame_shift)
+        return rms, zcr, frame_shift
+
+
+    def __rough_filter_blocks(self, audio_data, sample_rate, frame_duration_ms=10, threshold_rms=0.1, threshold_zcr=0.5, as_table=False):
+        ''' Фильтрация аудиозаписи на основе RMS и ZCR в два прохода по блокам фреймов (используется для длинных аудиозаписей, например
+        отображённых в память через WavReader). Результат совпадает с __rough_filter_samples(), но значения RMS и ZCR не хранятся для всей
+        аудиозаписи: первый проход вычисляет только максимальное значение RMS для нормализации, второй - вычисляет RMS и ZCR каждого блока,
+        фильтрует фреймы блока по порогам и объединяет участки с речью/звуком на границах блоков. Используемая память определяется размером
+        блока и количеством найденных сегментов.
+        1. audio_data - одномерный массив NumPy (int16, float32, np.memmap и т.д.) с семплами аудиозаписи
+        2. sample_rate - частота дискретизации
+        3. остальные аргументы и возвращаемое значение аналогичны rough_filter() '''
+
+        frame_len = int(frame_duration_ms * sample_rate / 1000)
+        frame_shift = int(frame_duration_ms / 2 * sample_rate / 1000)
+        rms_max = frame_rms_max(audio_data, frame_len, frame_shift)
+
+        start_voice_frame_numbers = []
+        end_voice_frame_numbers = []
+        for first_frame, rms, zcr in iter_frame_features(audio_data, frame_len, frame_shift):
+            if rms_max >= np.finfo(rms.dtype).tiny:
+                rms /= rms_max
+            block_start_numbers, block_end_numbers = self.__get_voice_borders(np.flatnonzero((rms > threshold_rms) | (zcr > threshold_zcr)) + first_frame)
+            if len(block_start_numbers) == 0:
+                continue
+
+            # Участок с речью/звуком, который продолжается с предыдущего блока
+            if end_voice_frame_numbers and end_voice_frame_numbers[-1][-1] + 1 == block_start_numbers[0]:
+                end_voice_frame_numbers[-1][-1] = block_end_numbers[0]
+                block_start_numbers = block_start_numbers[1:]
+                block_end_numbers = block_end_numbers[1:]
+            if len(block_start_numbers) > 0:
+                start_voice_frame_numbers.append(block_start_numbers)
+                end_voice_frame_numbers.append(block_end_numbers)
+
+        if not start_voice_frame_numbers:
+            return self.__rough_borders_to_segments([], [], frame_shift, len(audio_data), sample_rate, as_table)
+        return self.__rough_borders_to_segments(np.concatenate(start_voice_frame_numbers), np.concatenate(end_voice_frame_numbers), frame_shift,
+                                                len(audio_data), sample_rate, as_table)
+
+
+    def __rough_filter_segments(self, rms, zcr, frame_shift, num_samples, sample_rate, threshold_rms=0.1, threshold_zcr=0.5, as_table=False,
+                                stats=None):
+        ''' Пороговая фильтрация RMS и ZCR фреймов и перевод фреймов с речью/звуком в сегменты (вторая стадия __rough_filter_samples()).
+        1. rms - массив NumPy с нормализованными значениями RMS фреймов
+        2. zcr - массив NumPy со значениями ZCR фреймов
+        3. frame_shift - шаг фреймов в семплах
+        4. num_samples - количество семплов в аудиозаписи
+        5. остальные аргументы и возвращаемое значение аналогичны rough_filter() '''
 
         # Фильтрация значений RMS и ZRC по заданным порогам и сохранение номеров фреймов, содержащих речь/звук
         # Идентично этому:
@@ -173,58 +796,206 @@ class VAD:
         # for i in range(0,len(rms)):
         #     if ((rms[i] > threshold_rms) | (zrc[i] > threshold_zcr)):
         #          ff.append(i)
-        voice_frame_numbers = np.where((rms > threshold_rms) | (zcr > threshold_zcr))[0]
+        voice_frame_numbers = np.flatnonzero((rms > threshold_rms) | (zcr > threshold_zcr))
+        if stats is not None:
+            stats.num_frames = len(rms)
+            stats.num_voiced_frames = len(voice_frame_numbers)
 
-        # Определение границ речи/звука
-        start_voice_frame_numbers = [voice_frame_numbers[0]]
-        end_voice_frame_numbers = []
+        start_voice_frame_numbers, end_voice_frame_numbers = self.__get_voice_borders(voice_frame_numbers)
+        return self.__rough_borders_to_segments(start_voice_frame_numbers, end_voice_frame_numbers, frame_shift, num_samples, sample_rate, as_table)
 
-        shapeofidxs = np.shape(voice_frame_numbers)
-        for i in range(shapeofidxs[0]-1):
-            if (voice_frame_numbers[i + 1] - voice_frame_numbers[i]) != 1:
-                end_voice_frame_numbers.append(voice_frame_numbers[i])
-                start_voice_frame_numbers.append(voice_frame_numbers[i+1])
-        end_voice_frame_numbers.append(voice_frame_numbers[-1])
 
-        # Удаление последней границы, если её начало совпадает с концом
-        if end_voice_frame_numbers[-1] == start_voice_frame_numbers[-1]:
-            end_voice_frame_numbers.pop()
-            start_voice_frame_numbers.pop()
-        if len(start_voice_frame_numbers) != len(end_voice_frame_numbers):
-            raise ValueError('[E] Найденные границы с речью/звуком не совпадают')
+    def __get_voice_borders(self, voice_frame_numbers):
+        ''' Определить границы речи/звука: граница проходит там, где номера соседних фреймов с речью/звуком отличаются больше чем на 1.
+        1. voice_frame_numbers - возрастающий массив NumPy с номерами фреймов с речью/звуком
+        2. возвращает кортеж массивов NumPy (номера первых фреймов, номера последних фреймов) '''
 
-        # Перевод номеров фреймов во временные метки
-        start_voice_frame_numbers = np.array(start_voice_frame_numbers)
-        end_voice_frame_numbers = np.array(end_voice_frame_numbers)
+        if len(voice_frame_numbers) == 0:
+            return voice_frame_numbers, voice_frame_numbers
+        breaks = np.flatnonzero(np.diff(voice_frame_numbers) != 1)
+        start_voice_frame_numbers = voice_frame_numbers[np.concatenate(([0], breaks + 1))]
+        end_voice_frame_numbers = voice_frame_numbers[np.concatenate((breaks, [len(voice_frame_numbers) - 1]))]
+        return start_voice_frame_numbers, end_voice_frame_numbers
 
-        start_borders = start_voice_frame_numbers * frame_shift / sample_rate
-        end_borders = end_voice_frame_numbers * frame_shift / sample_rate
 
-        segments_with_voice = [[round(start_border, 2), round(end_border, 2), True] for start_border, end_border in zip(start_borders, end_borders)]
-        len_audio = round(len(audio_data) / sample_rate, 2)
+    def __rough_borders_to_segments(self, start_voice_frame_numbers, end_voice_frame_numbers, frame_shift, num_samples, sample_rate, as_table=False):
+        ''' Перевести границы речи/звука в номерах фреймов в сегменты (последняя стадия __rough_filter_segments()).
+        1. start_voice_frame_numbers - массив NumPy с номерами первых фреймов участков с речью/звуком
+        2. end_voice_frame_numbers - массив NumPy с номерами последних фреймов участков с речью/звуком
+        3. остальные аргументы и возвращаемое значение аналогичны __rough_filter_segments() '''
 
-        # Дополнение временных меток с голосом/звуком остальными участками аудиозаписи
-        filtered_segments_spans = []
-        if segments_with_voice[0][0] != 0.00:
-            filtered_segments_spans.append([0.00, segments_with_voice[0][0], False])
+        len_audio = round(num_samples / sample_rate, 2)
 
-        for j in range(len(segments_with_voice)-1):
-            filtered_segments_spans.append(segments_with_voice[j])
-            filtered_segments_spans.append([segments_with_voice[j][1], segments_with_voice[j+1][0], False])
-        filtered_segments_spans.append(segments_with_voice[-1])
+        # Если речь/звук не найдены - вся аудиозапись является тишиной
+        if len(start_voice_frame_numbers) == 0:
+            if as_table:
+                return SegmentTable.from_speech_borders([], [], sample_rate, num_samples)
+            return [[0.00, len_audio, False]]
 
+        # Удаление последней границы, если её начало совпадает с концом
+        if end_voice_frame_numbers[-1] == start_voice_frame_numbers[-1]:
+            start_voice_frame_numbers = start_voice_frame_numbers[:-1]
+            end_voice_frame_numbers = end_voice_frame_numbers[:-1]
+
+        if as_table:
+            return SegmentTable.from_speech_borders(start_voice_frame_numbers * frame_shift, end_voice_frame_numbers * frame_shift, sample_rate,
+                                                    num_samples)
+
+        if len(start_voice_frame_numbers) == 0:
+            return [[0.00, len_audio, False]]
+
+        # Перевод номеров фреймов во временные метки (np.round() округляет так же, как round() для np.float64)
+        start_borders = np.round(start_voice_frame_numbers * frame_shift / sample_rate, 2)
+        end_borders = np.round(end_voice_frame_numbers * frame_shift / sample_rate, 2)
+
+        # Дополнение временных меток с голосом/звуком остальными участками аудиозаписи: между сегментами с речью/звуком вставляются
+        # сегменты с тишиной от конца предыдущего до начала следующего
+        number_of_segments = 2 * len(start_borders) - 1
+        starts = np.empty(number_of_segments, dtype=np.float64)
+        ends = np.empty(number_of_segments, dtype=np.float64)
+        is_speech = np.zeros(number_of_segments, dtype=bool)
+        starts[0::2] = start_borders
+        starts[1::2] = end_borders[:-1]
+        ends[0::2] = end_borders
+        ends[1::2] = start_borders[1:]
+        is_speech[0::2] = True
+
+        filtered_segments_spans = [list(segment) for segment in zip(starts.tolist(), ends.tolist(), is_speech.tolist())]
+        if filtered_segments_spans[0][0] != 0.00:
+            filtered_segments_spans.insert(0, [0.00, filtered_segments_spans[0][0], False])
         if filtered_segments_spans[-1][1] != len_audio:
-            filtered_segments_spans.append([segments_with_voice[-1][1], len_audio, False])
+            filtered_segments_spans.append([filtered_segments_spans[-1][1], len_audio, False])
 
         return filtered_segments_spans
 
 
+    def classify_frames(self, audio, frame_duration_ms=10, sample_rate=None):
+        ''' Разбить аудиозапись на фреймы и получить решение WebRTC VAD для каждого фрейма (без сглаживания). Первая стадия фильтрации
+        в filter() при sensitivity_mode=0..3, результат можно передать в smooth().
+
+        1. audio - объект pydub.AudioSegment с аудиозаписью, байтовая строка или массив NumPy с аудиоданными (как в filter())
+        2. frame_duration_ms - длина фрейма в миллисекундах (поддерживается только 10, 20 и 30 мс)
+        3. sample_rate - частота дискретизации (поддерживается только 8, 16, 32 или 48кГц), подробнее в filter()
+        4. возвращает массив NumPy из True/False (dtype=bool) длиной в количество фреймов: True - фрейм содержит речь/звук '''
+
+        if self.sensitivity_mode > 3:
+            raise ValueError("[E] 'sensitivity_mode' для classify_frames() может быть только 0, 1, 2 и 3")
+
+        frames = self.__get_frames(audio, frame_duration_ms, sample_rate)
+        return self.__classify_frames(frames)
+
+
+    def smooth(self, decisions, frame_duration_ms=10, padding_duration_ms=50, threshold_voice_frames=0.9):
+        ''' Сгладить решения WebRTC VAD скользящим окном и перевести их в сегменты. Вторая стадия фильтрации в filter() при
+        sensitivity_mode=0..3, принимает результат classify_frames().
+
+        Время работы зависит от количества найденных сегментов, а не от padding_duration_ms.
+
+        1. decisions - массив NumPy (или список) из True/False: решения WebRTC VAD для каждого фрейма
+        2. frame_duration_ms - длина фрейма в миллисекундах, с которой были получены decisions
+        3. padding_duration_ms - длина дополняемых спереди и сзади частей в миллисекундах
+        4. threshold_voice_frames - порог количества фреймов со звуком в окне
+        5. возвращает список из списков с границами сегментов в том же формате, что и filter() '''
+
+        num_padding_frames = int(padding_duration_ms / frame_duration_ms)
+        filtered_segments = smooth(decisions, num_padding_frames, threshold_voice_frames)
+        return [frames_to_seconds(segment, frame_duration_ms) for segment in filtered_segments]
+
+
+    def sweep(self, audio, sensitivity_modes=None, frame_durations_ms=(10,), padding_durations_ms=(50,), thresholds_voice_frames=(0.9,),
+              thresholds_rms=(0.1,), thresholds_zcr=(0.5,), sample_rate=None):
+        ''' Отфильтровать аудиозапись со всеми комбинациями параметров (для подбора параметров). Результат для каждой комбинации совпадает
+        с filter() с теми же параметрами, но аудиозапись загружается и приводится к поддерживаемой частоте дискретизации один раз, разбивается
+        на фреймы один раз для каждой длины фрейма, решения WebRTC VAD получаются один раз для каждого уровня чувствительности и длины
+        фрейма, а RMS/ZCR (sensitivity_mode=4) - один раз для каждой длины фрейма. Для каждой комбинации выполняется только сглаживание
+        (sensitivity_mode=0..3, через webrtcvad_wrapper.smoothing.smooth_many()) или пороговая фильтрация RMS/ZCR (sensitivity_mode=4).
+
+        1. audio - объект pydub.AudioSegment с аудиозаписью, байтовая строка или массив NumPy с аудиоданными (как в filter()) или имя .wav аудиозаписи
+        2. sensitivity_modes - список уровней чувствительности от 0 до 4 (если None - только текущий sensitivity_mode)
+        3. frame_durations_ms - список длин фрейма в миллисекундах
+        4. padding_durations_ms - список длин окна сглаживания в миллисекундах (только для sensitivity_mode=0..3)
+        5. thresholds_voice_frames - список порогов количества фреймов со звуком в окне (только для sensitivity_mode=0..3)
+        6. thresholds_rms - список порогов RMS (только для sensitivity_mode=4)
+        7. thresholds_zcr - список порогов ZCR (только для sensitivity_mode=4)
+        8. sample_rate - частота дискретизации, подробнее в filter()
+        9. возвращает список словарей, по одному на комбинацию параметров:
+            {'sensitivity_mode': 3, 'frame_duration_ms': 10, 'padding_duration_ms': 50, 'threshold_voice_frames': 0.9, 'threshold_rms': None,
+             'threshold_zcr': None, 'filtered_segments': [[0.00, 1.23, True/False], ...], 'num_speech_segments': 5, 'speech_duration': 12.34}\n
+            Где параметры, которые не используются данным уровнем чувствительности, равны None, filtered_segments - результат filter(),
+            speech_duration - суммарная длина сегментов с речью/звуком в секундах '''
+
+        if isinstance(audio, str):
+            audio = self.read_wav(audio)
+        elif not _is_audio_segment(audio):
+            audio = _as_pcm_buffer(audio)
+        if sensitivity_modes is None:
+            sensitivity_modes = [self.sensitivity_mode]
+
+        results = []
+        webrtcvad_modes = [sensitivity_mode for sensitivity_mode in sensitivity_modes if sensitivity_mode < 4]
+        if webrtcvad_modes:
+            audio_bytes, vad_sample_rate = self.__get_audio_bytes(audio, frame_durations_ms[0], sample_rate)
+            for frame_duration_ms in frame_durations_ms:
+                if frame_duration_ms not in [10, 20, 30]:
+                    raise ValueError("[E] 'frame_duration_ms' может быть только 10, 20 и 30 миллисекунд")
+                frames = FrameTable(audio_bytes, vad_sample_rate, frame_duration_ms, self.sample_width)
+                num_padding_frames_list = [int(padding_duration_ms / frame_duration_ms) for padding_duration_ms in padding_durations_ms]
+                for sensitivity_mode in webrtcvad_modes:
+                    vad = webrtcvad.Vad(sensitivity_mode)
+                    decisions = np.fromiter((vad.is_speech(frame, vad_sample_rate) for frame in frames), dtype=bool, count=len(frames))
+                    frame_segments = smooth_many(decisions, num_padding_frames_list, thresholds_voice_frames)
+                    for padding_duration_ms, num_padding_frames in zip(padding_durations_ms, num_padding_frames_list):
+                        for threshold_voice_frames in thresholds_voice_frames:
+                            filtered_segments = [frames_to_seconds(segment, frame_duration_ms)
+                                                 for segment in frame_segments[(num_padding_frames, threshold_voice_frames)]]
+                            results.append(self.__get_sweep_result(filtered_segments, sensitivity_mode, frame_duration_ms, padding_duration_ms,
+                                                                   threshold_voice_frames, None, None))
+
+        if 4 in sensitivity_modes:
+            audio_data, samples_sample_rate = self.__get_samples(audio, sample_rate)
+            for frame_duration_ms in frame_durations_ms:
+                rms, zcr, frame_shift = self.__rough_features(audio_data, samples_sample_rate, frame_duration_ms)
+                for threshold_rms in thresholds_rms:
+                    for threshold_zcr in thresholds_zcr:
+                        filtered_segments = self.__rough_filter_segments(rms, zcr, frame_shift, len(audio_data), samples_sample_rate, threshold_rms,
+                                                                         threshold_zcr)
+                        results.append(self.__get_sweep_result(filtered_segments, 4, frame_duration_ms, None, None, threshold_rms, threshold_zcr))
+        return results
+
+
+    def __get_sweep_result(self, filtered_segments, sensitivity_mode, frame_duration_ms, padding_duration_ms, threshold_voice_frames, threshold_rms,
+                           threshold_zcr):
+        speech_segments = [segment for segment in filtered_segments if segment[-1]]
+        return {'sensitivity_mode': sensitivity_mode, 'frame_duration_ms': frame_duration_ms, 'padding_duration_ms': padding_duration_ms,
+                'threshold_voice_frames': threshold_voice_frames, 'threshold_rms': threshold_rms, 'threshold_zcr': threshold_zcr,
+                'filtered_segments': filtered_segments, 'num_speech_segments': len(speech_segments),
+                'speech_duration': round(sum(segment[1] - segment[0] for segment in speech_segments), 2)}
+
+
+    def __get_cache_params(self, sample_rate, sample_width, channels, frame_duration_ms, padding_duration_ms, threshold_voice_frames, threshold_rms,
+                           threshold_zcr, as_table):
+        ''' Получить кортеж из всех параметров, от которых зависит результат фильтрации (для ключа в кэше). '''
+
+        return (__version__, self.sensitivity_mode, self.resample_method, self.energy_gate_dbfs, self.energy_gate_guard_ms, sample_rate, sample_width,
+                channels, frame_duration_ms, padding_duration_ms, threshold_voice_frames, threshold_rms, threshold_zcr, as_table)
+
+
+    def __smooth_decisions(self, decisions, frame_duration_ms, padding_duration_ms, threshold_voice_frames, as_table, sample_rate, num_samples):
+        ''' Сгладить решения WebRTC VAD и вернуть сегменты в формате filter(): список или (если as_table=True) объект SegmentTable
+        с границами в семплах исходной аудиозаписи (до приведения частоты дискретизации) с частотой sample_rate и длиной num_samples. '''
+
+        if not as_table:
+            return self.smooth(decisions, frame_duration_ms, padding_duration_ms, threshold_voice_frames)
+        frame_segments = smooth(decisions, int(padding_duration_ms / frame_duration_ms), threshold_voice_frames)
+        return SegmentTable.from_frames(frame_segments, frame_duration_ms, sample_rate, num_samples)
+
+
     def __filter_frames(self, frames, padding_duration_ms=50, threshold_voice_frames=0.9):
         ''' Фильтрация фреймов по наличию речи или каких-либо звуков. Использует скользящее окно для фильтрации: если более 90%
         фреймов в окне содержат звук, то данное окно помечается как окно с речью. Окно дополняется спереди и сзади на padding_duration_ms,
         что бы обеспечить небольшую тишину в начале и конце или что бы отрывок речи был полным.
 
-        1. frames - список объектов webrtcvad_wrapper.Frame
+        1. frames - объект webrtcvad_wrapper.FrameTable с фреймами аудиозаписи
         2. padding_duration_ms - длина дополняемых спереди и сзади частей в миллисекундах
         3. threshold_voice_frames - порог количества фреймов со звуком в окне
         4. возвращает список из списков с границами сегментов следующего формата:
@@ -239,102 +1010,127 @@ class VAD:
 
         Оптимальное значение padding_duration_ms для качественных данных без шумов с высокой громкостью речи - 50 мс. '''
 
-        validations_sample_rate = [int(1 / frame.duration * len(frame.bytes) / 2) for frame in frames]
-        if not validations_sample_rate[1:] == validations_sample_rate[:-1]:
-            raise ValueError("[E] 'frames' имеют разный sample_rate")
-        sample_rate = validations_sample_rate[0]
+        decisions = self.__classify_frames(frames)
+        return self.smooth(decisions, frames.frame_duration_ms, padding_duration_ms, threshold_voice_frames)
 
-        validations_frame_duration = [int(frame.duration * 1000) for frame in frames]
-        if not validations_frame_duration[1:] == validations_frame_duration[:-1]:
-            raise ValueError("[E] 'frames' имеют разную длину")
-        frame_duration_ms = validations_frame_duration[0]
 
-        if threshold_voice_frames > 1 or threshold_voice_frames < 0.01:
-            raise ValueError("[E] 'threshold_voice_frames' имеет недопустимое значение: " + str(threshold_voice_frames))
+    def __classify_frames(self, frames, stats=None):
+        ''' Получить решения WebRTC VAD для каждого фрейма (с учётом энергетического порога, если он включён).
+        1. frames - объект webrtcvad_wrapper.FrameTable с фреймами аудиозаписи
+        2. stats - объект webrtcvad_wrapper.FilterStats, который нужно заполнить статистикой (стадии 'energy_gate' и 'is_speech')
+        3. возвращает массив NumPy из True/False (dtype=bool) '''
 
-        num_padding_frames = int(padding_duration_ms / frame_duration_ms)
-        # Используется deque для буфера окна
-        window_buffer = collections.deque(maxlen=num_padding_frames)
+        if stats is not None:
+            start_time = time.perf_counter()
+
+        active_frames = None
+        if self.energy_gate_dbfs is not None:
+            active_frames = self.__get_active_frames(frames)
+            if stats is not None:
+                start_time = stats.finish_stage('energy_gate', start_time)
 
         # Это костыль. Если не создать объект webrtcvad.Vad() каждый раз заново или не 'обновлять' уровень чувствительности, то в следующие первые
         # несколько (обычно 2-15) вызовов vad.is_speech() выдаёт True вне зависимости от переданных данных (даже если подать нулевые байты)
         # Занимает по времени примерно 5-10*10^-6 сек (0.000005-0.00001 сек)
         vad = webrtcvad.Vad(self.sensitivity_mode)
 
-        # Есть два состояния: триггерное и нетриггерное. В самом начале установлено нетриггерное состояние
-        triggered = False
-        filtered_segments = []
-        filtered_segments.append([triggered, []])
-        for frame in frames:
-            is_speech = vad.is_speech(frame.bytes, sample_rate)
-            if not triggered:
-                window_buffer.append((frame, is_speech))
-                num_voiced = len([frame for frame, speech in window_buffer if speech])
-                # Если больше 90% фреймов в окне содержат звук, то переход в триггерное состояние
-                if num_voiced > threshold_voice_frames * window_buffer.maxlen:
-                    triggered = True
-                    filtered_segments[-1][1] = filtered_segments[-1][1][:len(filtered_segments[-1][1])-window_buffer.maxlen+1]
-                    filtered_segments.append([triggered, [window_frame[0] for window_frame in window_buffer]])
-                    window_buffer.clear()
-                else:
-                    filtered_segments[-1][1].append(frame)
-            else:
-                # Триггерное состояние. Заполнение буфера фреймами
-                window_buffer.append((frame, is_speech))
-                num_unvoiced = len([f for f, speech in window_buffer if not speech])
-                # Если больше 90% фреймов в буфере не содержат звук, то переход в нетриггерное состояние
-                if num_unvoiced > threshold_voice_frames * window_buffer.maxlen:
-                    triggered = False
-                    filtered_segments[-1][1] = filtered_segments[-1][1][:len(filtered_segments[-1][1])-window_buffer.maxlen+1]
-                    filtered_segments.append([triggered, [window_frame[0] for window_frame in window_buffer]])
-                    window_buffer.clear()
-                else:
-                    filtered_segments[-1][1].append(frame)
-        if len(filtered_segments[0][1]) == 0:
-            del filtered_segments[0]
-
-        filtered_segments_spans = []
-        for i in range(len(filtered_segments)):
-            len_segment = len(filtered_segments[i][1]) * filtered_segments[i][1][0].duration
-            if i == 0:
-                start = 0.0
-                end = len_segment
-            else:
-                start = filtered_segments_spans[-1][1]
-                end = start + len_segment
-            filtered_segments_spans.append([round(start, 2), round(end, 2), filtered_segments[i][0]])
-
+        sample_rate = frames.sample_rate
+        if active_frames is None:
+            decisions = np.fromiter((vad.is_speech(frame, sample_rate) for frame in frames), dtype=bool, count=len(frames))
+            num_skipped_frames = 0
+        else:
+            num_active_frames = int(np.count_nonzero(active_frames))
+            decisions = np.zeros(len(frames), dtype=bool)
+            decisions[active_frames] = np.fromiter((vad.is_speech(frame, sample_rate) for frame in itertools.compress(frames, active_frames)),
+                                                   dtype=bool, count=num_active_frames)
+            num_skipped_frames = len(frames) - num_active_frames
         del vad
-        return filtered_segments_spans
-
 
-    def __get_frames(self, audio, frame_duration_ms=10, sample_rate=None):
+        if stats is not None:
+            stats.finish_stage('is_speech', start_time)
+            stats.num_frames = len(decisions)
+            stats.num_voiced_frames = int(np.count_nonzero(decisions))
+            stats.num_skipped_frames = num_skipped_frames
+        return decisions
+
+
+    def __get_active_frames(self, frames):
+        ''' Получить маску фреймов, которые нужно передать в WebRTC VAD при включённом энергетическом пороге (подробнее в set_energy_gate()).
+        1. frames - объект webrtcvad_wrapper.FrameTable с фреймами аудиозаписи
+        2. возвращает массив NumPy из True/False (dtype=bool): False - фрейм и все фреймы защитного интервала перед ним тише порога '''
+
+        power = frame_power(frames.samples())
+        if frames.last_frame is not None:
+            power = np.append(power, frame_power(np.frombuffer(frames.last_frame, dtype=np.int16).reshape(1, -1)))
+        floor_power = 32768.0 ** 2 * 10 ** (self.energy_gate_dbfs / 10.0)
+        quiet_frames = power < floor_power
+
+        # Фрейм пропускается, если тихие он и num_guard_frames предшествующих фреймов (первые num_guard_frames фреймов не пропускаются никогда)
+        num_guard_frames = -(-int(self.energy_gate_guard_ms) // frames.frame_duration_ms)
+        cumsum_quiet = np.zeros(len(quiet_frames) + 1, dtype=np.int64)
+        np.cumsum(quiet_frames, out=cumsum_quiet[1:])
+        skipped_frames = np.zeros(len(quiet_frames), dtype=bool)
+        if len(quiet_frames) > num_guard_frames:
+            skipped_frames[num_guard_frames:] = cumsum_quiet[num_guard_frames + 1:] - cumsum_quiet[:len(quiet_frames) - num_guard_frames] == \
+                                                num_guard_frames + 1
+        return ~skipped_frames
+
+
+    def __get_frames(self, audio, frame_duration_ms=10, sample_rate=None, stats=None):
         ''' Получить фреймы из аудиозаписи.
         
         ВНИМАНИЕ! Если длина аудиозаписи не кратна размеру 1 фрейма - она будет дополнена нулями до необходимой длины.
 
-        1. audio - объект pydub.AudioSegment с аудиозаписью или байтовая строка с аудиоданными (без заголовков wav)
+        1. audio - объект pydub.AudioSegment с аудиозаписью, байтовая строка или массив NumPy с аудиоданными (как в filter())
         2. frame_duration_ms - длина фрейма в миллисекундах (поддерживается только 10, 20 и 30 мс)
         3. sample_rate - частота дискретизации (поддерживается только 8, 16, 32 или 48кГц):
             когда audio - объект pydub.AudioSegment и частота дискретизации None или не поддерживается - будет приведена к ближайшей из поддерживаемых
-            когда audio - байтовая строка, частота дискретизации должна быть задана и поддерживаться
-        4. возвращает список из фреймов webrtcvad_wrapper.Frame заданной длины
+            когда audio - байтовая строка или массив NumPy, частота дискретизации должна быть задана и поддерживаться
+        4. stats - объект webrtcvad_wrapper.FilterStats, который нужно заполнить статистикой (стадии 'resample' и 'get_frames')
+        5. возвращает объект webrtcvad_wrapper.FrameTable с фреймами заданной длины
 
         Оптимальное значение frame_duration_ms для качественных данных без шумов с высокой громкостью речи - 10 мс. '''
 
-        if isinstance(audio, AudioSegment):
+        audio_bytes, sample_rate = self.__get_audio_bytes(audio, frame_duration_ms, sample_rate, stats)
+        if stats is None:
+            return FrameTable(audio_bytes, sample_rate, frame_duration_ms, self.sample_width)
+
+        start_time = time.perf_counter()
+        frames = FrameTable(audio_bytes, sample_rate, frame_duration_ms, self.sample_width)
+        stats.finish_stage('get_frames', start_time)
+        if frames.last_frame is not None:
+            stats.bytes_copied += len(frames.last_frame)
+        return frames
+
+
+    def __get_audio_bytes(self, audio, frame_duration_ms=10, sample_rate=None, stats=None):
+        ''' Получить аудиоданные в поддерживаемом WebRTC VAD формате (аргументы аналогичны __get_frames()).
+        1. возвращает кортеж (audio_bytes, sample_rate) '''
+
+        if _is_audio_segment(audio):
             sample_rate = audio.frame_rate
-            if sample_rate not in [8000, 16000, 32000, 48000]:
-                sample_rate = self.__align_sample_rate(sample_rate)
-                audio = audio.set_frame_rate(sample_rate)
-                sample_rate = audio.frame_rate
             audio_bytes = audio.raw_data
-        elif isinstance(audio, bytes):
-            audio_bytes = audio
-            if sample_rate is None:
-                raise ValueError("[E] Когда type(audio) == bytes, 'sample_rate' не может быть None")
+            if stats is not None:
+                stats.audio_duration_s = len(audio_bytes) / (self.sample_width * sample_rate)
+            if sample_rate not in [8000, 16000, 32000, 48000]:
+                if stats is not None:
+                    start_time = time.perf_counter()
+                target_sample_rate = self.__align_sample_rate(sample_rate)
+                if self.resample_method == 'pydub':
+                    audio_bytes = audio.set_frame_rate(target_sample_rate).raw_data
+                else:
+                    audio_bytes = resample(np.frombuffer(audio_bytes, dtype=np.int16), sample_rate, target_sample_rate)
+                if stats is not None:
+                    stats.finish_stage('resample', start_time)
+                    stats.resample_events.append((sample_rate, target_sample_rate, self.resample_method))
+                    stats.bytes_copied += memoryview(audio_bytes).nbytes
+                sample_rate = target_sample_rate
         else:
-            raise ValueError("[E] 'audio' может быть только AudioSegment или bytes")
+            audio_bytes = _as_pcm_buffer(audio)
+            if sample_rate is None:
+                raise ValueError("[E] Когда audio - байтовая строка или массив NumPy, 'sample_rate' не может быть None")
+            if stats is not None:
+                stats.audio_duration_s = len(audio_bytes) / (self.sample_width * sample_rate)
 
         if frame_duration_ms not in [10, 20, 30]:
             raise ValueError("[E] 'frame_duration_ms' может быть только 10, 20 и 30 миллисекунд")
@@ -342,18 +1138,7 @@ class VAD:
         if sample_rate not in [8000, 16000, 32000, 48000]:
             raise ValueError("[E] 'sample_rate' может быть только 8000, 16000, 32000 и 48000 Гц")
 
-        frame_width = int(sample_rate * (frame_duration_ms / 1000.0) * 2)
-        offset = 0
-        timestamp = 0.0
-        duration = (float(frame_width) / sample_rate) / 2.0
-        frames = []
-        while offset + frame_width <= len(audio_bytes):
-            frames.append(Frame(audio_bytes[offset:offset + frame_width], timestamp, duration))
-            timestamp += duration
-            offset += frame_width
-        if len(audio_bytes) % frame_width != 0 and offset + frame_width > len(audio_bytes):
-            frames.append(Frame(audio_bytes[offset:]+b'\x00'*(offset+frame_width-len(audio_bytes)), timestamp, duration))
-        return frames
+        return audio_bytes, sample_rate
 
 
     def __align_sample_rate(self, source_sample_rate):
@@ -361,15 +1146,7 @@ class VAD:
         1. source_sample_rate - исходная частота дискретизации в Гц
         2. возвращает исправленную частоту дискретизации '''
 
-        if source_sample_rate > 48000:
-            sample_rate = 48000
-        elif source_sample_rate > 32000 and source_sample_rate < 48000:
-            sample_rate = 32000
-        elif source_sample_rate > 16000 and source_sample_rate < 32000:
-            sample_rate = 16000
-        else:
-            sample_rate = 8000
-        return sample_rate
+        return align_sample_rate(source_sample_rate)
 
 
     def read_wav(self, f_name_wav, sample_rate=None):
@@ -382,6 +1159,7 @@ class VAD:
         if isinstance(f_name_wav, str) and f_name_wav.rfind('.wav') == -1:
             raise ValueError("[E] 'f_name_wav' должна содержать имя .wav аудиозаписи")
 
+        from pydub import AudioSegment
         audio = AudioSegment.from_wav(f_name_wav)
 
         if sample_rate is not None:
@@ -403,7 +1181,7 @@ class VAD:
             когда audio_data - байтовая строка, должна соответствовать реальной частоте дискретизации аудиозаписи
             в остальных случаях частота дискретизации будет приведена к указанной (если None - не менять частоту дискретизации) '''
 
-        if isinstance(audio_data, AudioSegment):
+        if _is_audio_segment(audio_data):
             self.write_wav_from_audiosegment(f_name_wav, audio_data, sample_rate)
         elif isinstance(audio_data, bytes):
             if sample_rate is None:
@@ -433,6 +1211,7 @@ class VAD:
         3. sample_rate - частота дискретизации
         4. desired_sample_rate - желаемая частота дискретизации (если None - не менять частоту дискретизации) '''
 
+        from pydub import AudioSegment
         audio = AudioSegment(data=audio_bytes, sample_width=self.sample_width, frame_rate=sample_rate, channels=self.channels)
         if desired_sample_rate is not None and desired_sample_rate != sample_rate:
             audio = audio.set_frame_rate(desired_sample_rate)
@@ -440,6 +1219,30 @@ class VAD:
         audio.export(f_name_wav, format='wav')
 
 
+    def write_segments(self, f_name_template, audio, filtered_segments, sample_rate=None, speech_only=True):
+        ''' Сохранить найденные сегменты в отдельные .wav аудиозаписи с именами f_name_template_%i.wav (нумерация с 1). Аудиоданные
+        сегментов записываются напрямую из исходного буфера (без создания pydub.AudioSegment на каждый сегмент и без копирования),
+        результат совпадает с write_wav(name, audio[segment[0]*1000:segment[1]*1000]).
+        1. f_name_template - шаблонное имя (если оканчивается на .wav - расширение отбрасывается)
+        2. audio - объект pydub.AudioSegment с аудиозаписью или байтовая строка с аудиоданными (без заголовков wav)
+        3. filtered_segments - результат filter() (список сегментов или объект webrtcvad_wrapper.SegmentTable)
+        4. sample_rate - частота дискретизации, только если audio - байтовая строка
+        5. speech_only - True: сохранять только сегменты с речью/звуком
+        6. возвращает список имён сохранённых .wav аудиозаписей '''
+
+        return write_segments(f_name_template, audio, filtered_segments, sample_rate, speech_only, self.sample_width, self.channels)
+
+
+    def write_concatenated_segments(self, f_name_wav, audio, filtered_segments, sample_rate=None, speech_only=True):
+        ''' Сохранить найденные сегменты, объединённые в одну .wav аудиозапись (например, для очистки аудиозаписи от тишины). Сегменты
+        не объединяются в памяти, файл записывается напрямую из исходного буфера.
+        1. f_name_wav - имя .wav аудиозаписи
+        2. остальные аргументы аналогичны write_segments()
+        3. возвращает длительность сохранённой аудиозаписи в секундах '''
+
+        return write_concatenated_segments(f_name_wav, audio, filtered_segments, sample_rate, speech_only, self.sample_width, self.channels)
+
+
 
 
 def main():
@@ -449,23 +1252,16 @@ def main():
     audio = vad.read_wav(f_name_audio)
     filtered_segments = vad.filter(audio)
 
-    segments_with_voice = [[filtered_segment[0], filtered_segment[1]] for filtered_segment in filtered_segments if filtered_segment[-1]]
-    for i, segment in enumerate(segments_with_voice):
-        f_name_segment = 'segment1_%002d.wav' % (i + 1)
+    for f_name_segment in vad.write_segments('segment1', audio, filtered_segments):
         print('Сохранение %s' % (f_name_segment))
-        vad.write_wav(f_name_segment, audio[segment[0]*1000:segment[1]*1000])
 
     # Тест дополнительного агрессивного режима (sensitivity_mode=4)
     vad.set_mode(4)
     filtered_segments = vad.filter(audio.raw_data, sample_rate=audio.frame_rate)
 
-    segments_with_voice = [[filtered_segment[0], filtered_segment[1]] for filtered_segment in filtered_segments if filtered_segment[-1]]
-    audio_without_silence = audio[segments_with_voice[0][0]*1000:segments_with_voice[0][1]*1000]
-    for segment in segments_with_voice[1:]:
-        audio_without_silence += audio[segment[0]*1000:segment[1]*1000]
     f_name_segment = 'segment_without_silence.wav'
     print('Сохранение %s' % f_name_segment)
-    vad.write_wav(f_name_segment, audio_without_silence)
+    vad.write_concatenated_segments(f_name_segment, audio, filtered_segments)
 
     # Тест корректности работы WebRTC VAD
     f_name_audio = 'test_audio/test_vad_2.wav'
@@ -473,11 +1269,8 @@ def main():
     audio = vad.read_wav(f_name_audio)
     filtered_segments = vad.filter(audio)
 
-    segments_with_voice = [[filtered_segment[0], filtered_segment[1]] for filtered_segment in filtered_segments if filtered_segment[-1]]
-    for i, segment in enumerate(segments_with_voice):
-        f_name_segment = 'segment2_%002d.wav' % (i + 1)
+    for f_name_segment in vad.write_segments('segment2', audio, filtered_segments):
         print('Сохранение %s' % (f_name_segment))
-        vad.write_wav(f_name_segment, audio[segment[0]*1000:segment[1]*1000])
 
 
 if __name__ == '__main__':